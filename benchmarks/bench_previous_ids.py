@@ -0,0 +1,70 @@
+"""
+Benchmark of the PREVIOUS_* identifier columns built with --pid.
+
+Compares the row-wise join used before with build_previous_ids on random
+summary statistics, e.g.:
+
+    python benchmarks/bench_previous_ids.py --rows 1000000 10000000 50000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from gwaspipe.order_alleles import build_previous_ids
+
+
+def make_sumstats(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    alleles = pd.Categorical.from_codes(rng.integers(0, 4, n_rows), categories=["A", "C", "G", "T"])
+    return pd.DataFrame(
+        {
+            "CHR": rng.integers(1, 23, n_rows),
+            "POS": rng.integers(1, 250_000_000, n_rows),
+            "EA": alleles,
+            "NEA": pd.Categorical.from_codes(rng.integers(0, 4, n_rows), categories=["A", "C", "G", "T"]),
+        }
+    )
+
+
+def rowwise_previous_ids(sumstats):
+    """Previous implementation, building the SNPID twice with a row-wise join."""
+    previous_ids = {}
+    previous_ids["PREVIOUS_ID_GWASLAB"] = sumstats[["CHR", "POS", "EA", "NEA"]].astype(str).agg(":".join, axis=1)
+    previous_ids["PREVIOUS_ID"] = sumstats[["CHR", "POS", "EA", "NEA"]].astype(str).agg(":".join, axis=1)
+    return previous_ids
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument("--threads", type=int, default=1, help="Threads used by build_previous_ids")
+    parser.add_argument(
+        "--rowwise-max-rows",
+        type=int,
+        default=10_000_000,
+        help="Skip the row-wise implementation above this number of rows",
+    )
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'row-wise (s)':>14} {'vectorized (s)':>15} {'speedup':>8}")
+    for n_rows in args.rows:
+        sumstats = make_sumstats(n_rows)
+        vectorized = timed(build_previous_ids, sumstats, n_threads=args.threads)
+        if n_rows <= args.rowwise_max_rows:
+            rowwise = timed(rowwise_previous_ids, sumstats)
+            print(f"{n_rows:>12} {rowwise:>14.2f} {vectorized:>15.2f} {rowwise / vectorized:>7.1f}x")
+        else:
+            print(f"{n_rows:>12} {'-':>14} {vectorized:>15.2f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
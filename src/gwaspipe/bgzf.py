@@ -0,0 +1,117 @@
+"""
+Multithreaded BGZF compression.
+
+BGZF is a series of gzip members of at most 64 KiB each, with the compressed size of
+the member in a gzip extra field, so any gzip reader decompresses it and tabix can
+index it. The members are independent, so they are compressed on a thread pool:
+zlib releases the GIL while compressing.
+"""
+
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Uncompressed bytes per block, as in htslib
+BLOCK_SIZE = 0xFF00
+
+DEFAULT_LEVEL = 6
+
+# Empty block marking the end of the file
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+_HEADER = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+
+
+def compress_block(data, level=DEFAULT_LEVEL):
+    """Return the BGZF block of at most BLOCK_SIZE bytes of data."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = len(_HEADER) + 2 + len(cdata) + 8
+    return b"".join(
+        (
+            _HEADER,
+            struct.pack("<H", block_size - 1),
+            cdata,
+            struct.pack("<II", zlib.crc32(data), len(data)),
+        )
+    )
+
+
+class BgzfWriter:
+    """
+    Write a BGZF file, compressing the blocks on a thread pool.
+
+    The data passed to write is buffered and split into blocks. Each call to write
+    compresses its complete blocks while the caller prepares the next data, and waits
+    for the blocks of the previous call, so at most two calls are held in memory.
+
+    Parameters
+    ----------
+    path : str
+        Output path
+    mode : str, default="wb"
+        "wb" to create the file, "ab" to append blocks to an existing BGZF file
+    level : int, default=6
+        zlib compression level
+    threads : int, default=1
+        Number of compression threads
+
+    Attributes
+    ----------
+    block_offsets : list
+        Offset in the file of each block written, followed by the offset of the end-of-file
+        block once closed. The block holding the byte ``u`` of the data written is
+        ``block_offsets[u // BLOCK_SIZE]``
+    """
+
+    def __init__(self, path, mode="wb", level=DEFAULT_LEVEL, threads=1):
+        self.level = level
+        self._file = open(path, mode)
+        self._file.seek(0, 2)
+        self._offset = self._file.tell()
+        self.block_offsets = []
+        self._executor = ThreadPoolExecutor(max_workers=max(1, threads))
+        self._buffer = b""
+        self._pending = None
+
+    def write(self, data):
+        """Buffer data, compress its complete blocks and write the blocks of the previous call."""
+        data = self._buffer + data
+        n_complete = len(data) // BLOCK_SIZE * BLOCK_SIZE
+        self._buffer = data[n_complete:]
+        blocks = [data[i : i + BLOCK_SIZE] for i in range(0, n_complete, BLOCK_SIZE)]
+        self._flush_pending()
+        self._pending = self._executor.map(compress_block, blocks, [self.level] * len(blocks))
+
+    def _flush_pending(self):
+        if self._pending is None:
+            return
+        for block in self._pending:
+            self._write_block(block)
+        self._pending = None
+
+    def _write_block(self, block):
+        self.block_offsets.append(self._offset)
+        self._file.write(block)
+        self._offset += len(block)
+
+    def close(self):
+        """Write the remaining data and the end-of-file block."""
+        if self._file.closed:
+            return
+        try:
+            self._flush_pending()
+            if self._buffer:
+                self._write_block(compress_block(self._buffer, self.level))
+                self._buffer = b""
+            self.block_offsets.append(self._offset)
+            self._file.write(EOF_BLOCK)
+        finally:
+            self._executor.shutdown()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,251 @@
+"""
+Sampled inference of the genome build.
+
+GWASLab infers the build by matching the positions of all the variants with the
+HapMap3 SNPs of hg19 and hg38. The positions are matched here on a stratified
+random sample instead, one variant drawn from each of equal blocks of rows, with a
+sample four times larger at each round until the difference between the hg19 and
+hg38 matches is significant. When the sample reaches half the table without a
+significant difference, all the variants are matched, as GWASLab does. The build
+and the STATUS codes are then set as by GWASLab.
+
+With a BuildCache, the HapMap3 positions are stored once as sorted NumPy codes,
+memory-mapped by the later runs, and the inferred build is stored in a sidecar keyed
+on the input file and the build it is loaded with, so later runs on the same input
+skip the inference.
+"""
+
+import importlib.metadata
+import json
+import os
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from gwaslab.info.g_Log import Log
+from gwaslab.info.g_vchange_status import vchange_status
+from gwaslab.util.util_in_filter_value import _get_hapmap_df_polars
+
+from gwaspipe.step_cache import _digest
+
+DEFAULT_SAMPLE_SIZE = 4096
+
+# Standard score of the difference between the hg19 and hg38 matches deciding the build
+DEFAULT_Z_SCORE = 5.0
+
+BUILDS = ("19", "38")
+
+# Version of the layout of the cache entries
+CACHE_FORMAT = 1
+
+
+def position_codes(chrom, pos):
+    """Return the 64-bit codes of chromosome and position pairs, the pairs with missing values are dropped."""
+    chrom, pos = (
+        v.to_numpy(dtype="float64", na_value=np.nan) if hasattr(v, "to_numpy") else np.asarray(v, dtype="float64")
+        for v in (chrom, pos)
+    )
+    valid = ~(np.isnan(chrom) | np.isnan(pos))
+    return (chrom[valid].astype(np.int64) << 32) | pos[valid].astype(np.int64)
+
+
+def _hapmap_codes(build):
+    hapmap = _get_hapmap_df_polars(build)
+    return np.unique(position_codes(hapmap["CHR"].to_numpy(), hapmap["POS"].to_numpy()))
+
+
+_cached_hapmap_codes = cache(_hapmap_codes)
+
+
+def count_matches(codes, hapmap):
+    """Return the number of codes matching the HapMap3 positions of each build."""
+    counts = []
+    for build in BUILDS:
+        reference = hapmap[build]
+        i = np.searchsorted(reference, codes).clip(0, max(len(reference) - 1, 0))
+        counts.append(int((reference[i] == codes).sum()) if len(reference) else 0)
+    return counts
+
+
+def decide(counts):
+    """Return the build with the most matches, Unknown if they are equal."""
+    if counts[0] > counts[1]:
+        return "19"
+    if counts[0] < counts[1]:
+        return "38"
+    return "Unknown"
+
+
+def conclusive(counts, z_score=DEFAULT_Z_SCORE):
+    """Return whether the difference between the matches of the two builds is significant."""
+    total = counts[0] + counts[1]
+    return total > 0 and abs(counts[0] - counts[1]) >= z_score * np.sqrt(total)
+
+
+def sample_rows(n, size, rng):
+    """Return one random row of each of size equal blocks of n rows."""
+    bounds = np.linspace(0, n, size + 1).astype(np.int64)
+    return bounds[:-1] + (rng.random(size) * np.diff(bounds)).astype(np.int64)
+
+
+def infer_build(
+    data,
+    hapmap,
+    chrom="CHR",
+    pos="POS",
+    sample_size=DEFAULT_SAMPLE_SIZE,
+    z_score=DEFAULT_Z_SCORE,
+    seed=0,
+):
+    """
+    Infer the genome build from a stratified sample of the positions.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Sumstats
+    hapmap : dict
+        Sorted HapMap3 position codes by build, see position_codes
+    sample_size : int, default=4096
+        Number of variants of the first sample
+    z_score : float, default=5.0
+        Standard score of the difference between the matches deciding the build
+    seed : int, default=0
+        Seed of the random sample
+
+    Returns
+    -------
+    tuple
+        Build, "19", "38" or "Unknown", the hg19 and hg38 matches and the number of variants tested
+    """
+    n = len(data)
+    rng = np.random.default_rng(seed)
+    counts = [0, 0]
+    tested = 0
+    size = sample_size
+    while size <= n // 2:
+        rows = sample_rows(n, size, rng)
+        sample = data.iloc[rows]
+        sample_counts = count_matches(position_codes(sample[chrom], sample[pos]), hapmap)
+        counts = [c + s for c, s in zip(counts, sample_counts)]
+        tested += size
+        if conclusive(counts, z_score):
+            return decide(counts), counts, tested
+        size *= 4
+    counts = count_matches(position_codes(data[chrom], data[pos]), hapmap)
+    return decide(counts), counts, n
+
+
+def _change_digit(status, digit, before, after):
+    power = 10 ** (7 - digit)
+    return np.where((status // power) % 10 == before, status + (after - before) * power, status)
+
+
+def set_inferred_build(sumstats_obj, build, status="STATUS"):
+    """Set the inferred build and the STATUS codes of the sumstats, as GWASLab infer_build does."""
+    data = sumstats_obj.data
+    changes = {"19": [(1, 9, 1)], "38": [(1, 9, 3), (2, 9, 8)]}.get(build, [])
+    if changes and data[status].hasnans:
+        for digit, before, after in changes:
+            data[status] = vchange_status(data[status], digit, str(before), str(after))
+    elif changes:
+        codes = data[status].to_numpy(dtype=np.int64)
+        for digit, before, after in changes:
+            codes = _change_digit(codes, digit, before, after)
+        data[status] = pd.Series(codes, index=data.index).astype(data[status].dtype)
+    sumstats_obj.data = data
+    sumstats_obj.build = build
+
+
+def input_key(input_path, genome_build):
+    """Return the key of the inferred build of an input file loaded with a genome build."""
+    stat = os.stat(input_path)
+    identity = (os.path.realpath(input_path), stat.st_size, stat.st_mtime_ns)
+    gwaslab_version = importlib.metadata.version("gwaslab")
+    return _digest(identity, genome_build, gwaslab_version, CACHE_FORMAT)
+
+
+class BuildCache:
+    """Directory of the HapMap3 positions and of the inferred builds, shared between runs."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def hapmap(self):
+        """Return the HapMap3 position codes by build, stored once in the cache."""
+        gwaslab_version = importlib.metadata.version("gwaslab")
+        codes = {}
+        for build in BUILDS:
+            path = Path(self.path, f"hapmap3_hg{build}.{gwaslab_version}.npy")
+            if not path.exists():
+                self.path.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp.npy")
+                np.save(tmp_path, _hapmap_codes(build))
+                os.replace(tmp_path, path)
+            codes[build] = np.load(path, mmap_mode="r")
+        return codes
+
+    def get(self, key):
+        """Return the inferred build of a key, None if it is not cached."""
+        path = Path(self.path, f"{key}.json")
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)["build"]
+
+    def put(self, key, build, counts, tested):
+        """Store the inferred build of a key in its sidecar."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = Path(self.path, f"{key}.json")
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"build": build, "hg19": counts[0], "hg38": counts[1], "tested": tested}, f)
+        os.replace(tmp_path, path)
+
+
+def infer_sumstats_build(
+    sumstats_obj,
+    sample_size=DEFAULT_SAMPLE_SIZE,
+    build_cache=None,
+    input_path=None,
+    log=Log(),
+    verbose=True,
+):
+    """
+    Infer and set the genome build of the sumstats from a sample of the positions.
+
+    Parameters
+    ----------
+    sumstats_obj : gl.Sumstats
+        Sumstats
+    sample_size : int, default=4096
+        Number of variants of the first sample
+    build_cache : BuildCache, optional
+        Cache of the HapMap3 positions and of the inferred builds
+    input_path : str, optional
+        Input file of the sumstats, the key of the inferred build in build_cache
+
+    Returns
+    -------
+    str
+        Inferred build
+    """
+    key = None
+    if build_cache is not None and input_path is not None:
+        key = input_key(input_path, sumstats_obj.meta["gwaslab"]["genome_build"])
+        build = build_cache.get(key)
+        if build is not None:
+            log.write(f" -Genome build inferred by a previous run: {build}", verbose=verbose)
+            set_inferred_build(sumstats_obj, build)
+            return build
+    hapmap = build_cache.hapmap() if build_cache is not None else {b: _cached_hapmap_codes(b) for b in BUILDS}
+    build, counts, tested = infer_build(sumstats_obj.data, hapmap, sample_size=sample_size)
+    log.write(
+        f" -Matching variants in a sample of {tested}: num_hg19 = {counts[0]}, num_hg38 = {counts[1]}", verbose=verbose
+    )
+    log.write(f" -Inferred genome build: {build}", verbose=verbose)
+    set_inferred_build(sumstats_obj, build)
+    if key is not None:
+        build_cache.put(key, build, counts, tested)
+    return build
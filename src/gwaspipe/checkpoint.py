@@ -0,0 +1,111 @@
+"""
+Step-level checkpoints of the in-memory run sequence.
+
+After each checkpointed step the Sumstats object is written to a columnar file, see
+gwaspipe.columnar. A run started with ``--resume`` restores the latest checkpoint and
+continues after its step, if the input file and the configuration are unchanged.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from gwaspipe import columnar
+
+# Steps checkpointed when checkpoint is set to True in the configuration
+DEFAULT_CHECKPOINT_STEPS = ("basic_check", "harmonize", "liftover", "sort_alphabetically", "check_ambiguous_snps")
+
+STATE_FILENAME = "state.json"
+DATA_FILENAME = "sumstats.feather"
+
+
+def resolve_checkpoint_steps(checkpoint):
+    """Return the checkpointed steps for the checkpoint configuration value: a list, True for the defaults, or None."""
+    if checkpoint is True:
+        return DEFAULT_CHECKPOINT_STEPS
+    if not checkpoint:
+        return ()
+    return tuple(checkpoint)
+
+
+def run_fingerprint(input_path, config, **options):
+    """
+    Return a fingerprint of the run inputs.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the input file, its size and modification time are part of the fingerprint
+    config : dict
+        Run configuration
+    **options
+        Command line options, e.g. the input format
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest
+    """
+    stat = Path(input_path).stat()
+    run = {
+        "input": [str(Path(input_path).resolve()), stat.st_size, stat.st_mtime_ns],
+        "config": config,
+        "options": options,
+    }
+    return hashlib.sha256(json.dumps(run, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replace(path, write):
+    # Write to a temporary file first, so that an interrupted save keeps the previous file
+    tmp_path = Path(path.parent, f".{path.name}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_sumstats(sumstats, path):
+    """Save a Sumstats object in a directory."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    columnar.dump_sumstats(sumstats, Path(path, DATA_FILENAME))
+
+
+def load_sumstats(path):
+    """Load a Sumstats object saved by save_sumstats."""
+    return columnar.load_sumstats(Path(path, DATA_FILENAME))
+
+
+class Checkpoint:
+    """Latest checkpoint of a run, stored in a directory."""
+
+    def __init__(self, path, fingerprint, steps=DEFAULT_CHECKPOINT_STEPS):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.steps = tuple(steps)
+
+    def save(self, sumstats, step):
+        """Save the Sumstats object after step."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        Path(self.path, STATE_FILENAME).unlink(missing_ok=True)
+        save_sumstats(sumstats, self.path)
+        state = {"fingerprint": self.fingerprint, "step": step}
+        _replace(Path(self.path, STATE_FILENAME), lambda tmp_path: tmp_path.write_text(json.dumps(state)))
+
+    def completed_step(self):
+        """Return the step of the checkpoint, None if there is no checkpoint of this run."""
+        state_path = Path(self.path, STATE_FILENAME)
+        if not state_path.exists():
+            return None
+        state = json.loads(state_path.read_text())
+        if state.get("fingerprint") != self.fingerprint:
+            return None
+        return state.get("step")
+
+    def restore(self):
+        """Return the checkpointed Sumstats object."""
+        return load_sumstats(self.path)
+
+    def clear(self):
+        """Remove the checkpoint."""
+        for filename in (STATE_FILENAME, DATA_FILENAME):
+            Path(self.path, filename).unlink(missing_ok=True)
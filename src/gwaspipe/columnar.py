@@ -0,0 +1,105 @@
+"""
+Memory-mappable columnar file of a Sumstats object.
+
+The table is written as an uncompressed Arrow IPC (Feather v2) file and the rest of
+the Sumstats object (metadata, log, build) is pickled without its data into the
+schema metadata. The references of the log back to the Sumstats object are pickled
+as persistent ids and rebound on load, so the pickled shell holds no rows. The file
+is read through a memory map, so only the pages of the selected columns are read
+from disk. The columns are then copied once into writable arrays, since the steps
+modify the table in place.
+"""
+
+import copy
+import io
+import os
+import pickle
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+SUMSTATS_METADATA_KEY = b"gwaspipe.sumstats"
+
+# Persistent id of the Sumstats object and its table in the pickled shell
+_SUMSTATS_ID = "sumstats"
+
+
+class _ShellPickler(pickle.Pickler):
+    """Pickler of a Sumstats shell, replacing the references to the Sumstats object and its table."""
+
+    def __init__(self, file, sumstats):
+        super().__init__(file)
+        self.sumstats = sumstats
+        self.data = sumstats.data
+
+    def persistent_id(self, obj):
+        if obj is self.sumstats or obj is self.data:
+            return _SUMSTATS_ID
+        return None
+
+
+class _ShellUnpickler(pickle.Unpickler):
+    """Unpickler of a Sumstats shell, the references to the Sumstats object are rebound after load."""
+
+    def persistent_load(self, pid):
+        if pid != _SUMSTATS_ID:
+            raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+        return None
+
+
+def dump_sumstats(sumstats, path):
+    """
+    Write a Sumstats object to a columnar file.
+
+    Parameters
+    ----------
+    sumstats : gl.Sumstats
+        Sumstats object
+    path : str
+        Output path, the file is replaced only once completely written
+    """
+    path = Path(path)
+    table = pa.Table.from_pandas(sumstats.data)
+    # The shell is pickled from a shallow copy, the object itself may be read by concurrent outputs
+    shell = copy.copy(sumstats)
+    shell.data = sumstats.data.iloc[:0]
+    buffer = io.BytesIO()
+    _ShellPickler(buffer, sumstats).dump(shell)
+    shell = buffer.getvalue()
+    table = table.replace_schema_metadata({**table.schema.metadata, SUMSTATS_METADATA_KEY: shell})
+    tmp_path = Path(path.parent, f".{path.name}.tmp")
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+def load_sumstats(path, columns=None):
+    """
+    Read a Sumstats object written by dump_sumstats.
+
+    Parameters
+    ----------
+    path : str
+        Input path
+    columns : iterable, optional
+        Columns to read, all the columns if None. Missing columns are ignored
+
+    Returns
+    -------
+    gl.Sumstats
+        Sumstats object with the selected columns
+    """
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        if SUMSTATS_METADATA_KEY not in metadata:
+            raise ValueError(f"{path} is not a gwaspipe checkpoint")
+        table = reader.read_all()
+    if columns is not None:
+        table = table.select([col for col in table.column_names if col in columns])
+    sumstats = _ShellUnpickler(io.BytesIO(metadata[SUMSTATS_METADATA_KEY])).load()
+    # The log refers back to its Sumstats object
+    if hasattr(sumstats.log, "_sumstats_obj"):
+        sumstats.log._sumstats_obj = sumstats
+    sumstats.data = table.to_pandas()
+    return sumstats
@@ -0,0 +1,124 @@
+"""
+Compact dtype plan applied to the loaded summary statistics.
+
+The plan maps column names to the dtype they are cast to, e.g.::
+
+    dtype_plan:
+      CHR: uint8
+      POS: uint32
+      EA: allele
+      NEA: allele
+      STATUS: int32
+
+``allele`` columns are categorical and share a single allele dictionary, so EA and
+NEA can be swapped without recoding. A column is left unchanged when its values do
+not fit the planned dtype, e.g. CHR with missing values or non-numeric labels.
+
+The plan is applied once the input is loaded by GWASLab, so it lowers the memory of
+the following steps but not the peak memory of the load. Float columns are best left
+float64: the outputs are formatted from the stored values, and float32 values are
+written with their float32 rounding error, e.g. 0.14329 as 0.14328999817371368.
+"""
+
+import numpy as np
+import pandas as pd
+from gwaslab.info.g_Log import Log
+
+ALLELE_DTYPE = "allele"
+
+# Plan used when dtype_plan is set to True in the configuration
+DEFAULT_DTYPE_PLAN = {
+    "CHR": "uint8",
+    "POS": "uint32",
+    "EA": ALLELE_DTYPE,
+    "NEA": ALLELE_DTYPE,
+    "STATUS": "int32",
+}
+
+
+def resolve_dtype_plan(dtype_plan):
+    """Return the plan for the dtype_plan configuration value: a mapping, True for the default plan, or None."""
+    if dtype_plan is True:
+        return dict(DEFAULT_DTYPE_PLAN)
+    if not dtype_plan:
+        return {}
+    return dict(dtype_plan)
+
+
+def _fits(values, dtype):
+    """Whether the values can be cast to a numpy integer or float dtype, missing values only fit a float dtype."""
+    if not pd.api.types.is_numeric_dtype(values):
+        return False
+    if np.issubdtype(dtype, np.integer):
+        if values.isna().any():
+            return False
+        info = np.iinfo(dtype)
+        return len(values) == 0 or (values.min() >= info.min and values.max() <= info.max)
+    return True
+
+
+def apply_dtype_plan(data, dtype_plan, log=Log(), verbose=True):
+    """
+    Cast the columns of the summary statistics in place following the dtype plan.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Summary statistics dataframe
+    dtype_plan : dict
+        Column name to dtype, see the module documentation
+    log : Log
+        Log object for recording operations
+    verbose : bool, default=True
+        Whether to print verbose output
+
+    Returns
+    -------
+    dict
+        Column name to ``(bytes before, bytes after)`` for the columns that were cast
+    """
+    report = {}
+    allele_columns = [col for col, dtype in dtype_plan.items() if dtype == ALLELE_DTYPE and col in data.columns]
+    if allele_columns:
+        categories = set()
+        for col in allele_columns:
+            values = data[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories |= set(values.cat.categories)
+            else:
+                categories |= set(values.dropna().unique())
+        allele_dtype = pd.CategoricalDtype(sorted(categories))
+        for col in allele_columns:
+            before = data[col].memory_usage(deep=True, index=False)
+            data[col] = data[col].astype(allele_dtype)
+            report[col] = (before, data[col].memory_usage(deep=True, index=False))
+
+    for col, dtype in dtype_plan.items():
+        if dtype == ALLELE_DTYPE or col not in data.columns or data[col].dtype == dtype:
+            continue
+        before = data[col].memory_usage(deep=True, index=False)
+        if dtype == "category":
+            data[col] = data[col].astype("category")
+        elif _fits(data[col], np.dtype(dtype)):
+            if np.issubdtype(dtype, np.floating):
+                data[col] = data[col].to_numpy(dtype=dtype, na_value=np.nan)
+            else:
+                data[col] = data[col].to_numpy(dtype=dtype)
+        else:
+            log.write(f" -Column {col} ({data[col].dtype}) does not fit {dtype}: kept unchanged", verbose=verbose)
+            continue
+        report[col] = (before, data[col].memory_usage(deep=True, index=False))
+
+    return report
+
+
+def log_memory_report(report, log=Log(), verbose=True):
+    """Write the memory of each cast column before and after the dtype plan to the log."""
+    if not report:
+        return
+    log.write("Memory usage of the columns cast by the dtype plan:", verbose=verbose)
+    for col, (before, after) in report.items():
+        log.write(f" -{col}: {before / 2**20:.2f} MB -> {after / 2**20:.2f} MB", verbose=verbose)
+    before = sum(before for before, _ in report.values())
+    after = sum(after for _, after in report.values())
+    log.write(f" -Total: {before / 2**20:.2f} MB -> {after / 2**20:.2f} MB", verbose=verbose)
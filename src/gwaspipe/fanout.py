@@ -0,0 +1,129 @@
+"""
+Fan-out of consecutive output steps.
+
+Consecutive enabled output steps of the run sequence form a stage: the table does not
+change between them, so the column encodings of the native writer (chromosome labels,
+float formatting, missing values) are computed once per stage and shared by its outputs,
+see SharedEncoding, and the outputs are written concurrently on a thread pool. Outputs
+that write the same files, e.g. the GWASLab log of ``write_tsv`` and ``write_parquet``
+with the same format, are written one after the other, in the order of the run sequence.
+
+The output steps that change the table before writing it (``write_snp_mapping`` adds the
+EQUALS and FLIPPED columns, ``write_vcf`` infers the genome build) start a new stage, so
+the outputs before them are written from the unchanged table.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Output steps that only read the table
+OUTPUT_STEPS = frozenset(
+    {
+        "write_snp_mapping",
+        "write_pickle",
+        "write_checkpoint",
+        "write_regenie",
+        "write_ldsc",
+        "write_metal",
+        "write_tsv",
+        "write_fastgwa",
+        "write_parquet",
+        "write_vcf",
+        "write_same_input_format",
+    }
+)
+
+# Output steps that change the table before writing it
+PREPARED_OUTPUT_STEPS = frozenset({"write_snp_mapping", "write_vcf"})
+
+
+def group_output_steps(run_sequence, step_config):
+    """
+    Group the consecutive enabled output steps of the run sequence into stages.
+
+    Parameters
+    ----------
+    run_sequence : tuple
+        Ordered step names
+    step_config : callable
+        Function returning the ``(params, gl_params)`` of a step, e.g. ``ConfigurationManager.step``
+
+    Returns
+    -------
+    list
+        Stages in the order of the run sequence, each a list of steps. A stage holds a
+        single step, or consecutive output steps. Disabled steps do not end a stage.
+    """
+    stages = []
+    fanout = False
+    for step in run_sequence:
+        params, _ = step_config(step)
+        if not params.get("run", False):
+            if fanout:
+                stages[-1].append(step)
+            else:
+                stages.append([step])
+            continue
+        if step in OUTPUT_STEPS and fanout and step not in PREPARED_OUTPUT_STEPS:
+            stages[-1].append(step)
+        else:
+            stages.append([step])
+        fanout = step in OUTPUT_STEPS
+    return stages
+
+
+def run_sinks(sinks, threads=1):
+    """
+    Run the outputs of a stage, concurrently on a thread pool.
+
+    Parameters
+    ----------
+    sinks : list
+        ``(key, function)`` pairs in the order of the run sequence. The functions with the
+        same key, e.g. the path of the files they write, run one after the other in this order.
+        A key of None is unique.
+    threads : int, default=1
+        Number of outputs written at once
+
+    Raises
+    ------
+    Exception
+        The first exception raised by an output, in the order of the run sequence, once all
+        the outputs are done
+    """
+    queues = {}
+    for i, (key, function) in enumerate(sinks):
+        queues.setdefault(i if key is None else key, []).append(function)
+
+    def run_queue(functions):
+        for function in functions:
+            function()
+
+    if threads <= 1 or len(queues) == 1:
+        for functions in queues.values():
+            run_queue(functions)
+        return
+    with ThreadPoolExecutor(max_workers=min(threads, len(queues))) as executor:
+        futures = [executor.submit(run_queue, functions) for functions in queues.values()]
+    for future in futures:
+        future.result()
+
+
+class SharedEncoding:
+    """
+    Values computed once and shared by the outputs of a stage, while the table does not change.
+
+    The values are computed under a lock, so an output waits for a value being computed by
+    another output instead of computing it again.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """Return the value of key, computed by compute if it was not computed yet."""
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = compute()
+            return self._values[key]
@@ -0,0 +1,257 @@
+"""
+Memory-mapped reference sequence for the check_ref stage of harmonize.
+
+GWASLab reads the whole ref_seq FASTA in memory before checking the alleles against
+it. IndexedFasta memory-maps an uncompressed FASTA with its ``.fai`` index instead and
+fetches the reference bases at the positions of the variants of a chromosome as one
+array, so only the pages holding the variants are read. The alleles are encoded once
+per distinct allele and compared with the reference bases as in GWASLab, giving the
+same digit 6 of STATUS (0 on reference, 3 flipped, 4 reverse complementary, 5 reverse
+complementary and flipped, 6 indistinguishable, 8 not on reference); the chromosomes
+are checked on threads.
+
+The engine is used by harmonize through fasta_engine, which runs the GWASLab
+check_ref with the reference loading and the status check replaced.
+"""
+
+import contextlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from gwaslab.hm import hm_harmonize_sumstats
+from gwaslab.hm.hm_harmonize_sumstats import PADDING_VALUE
+
+# Digit of STATUS set by check_ref, as an index from the left of the 7 digits
+STATUS_DIGIT = 5
+
+COMPRESSED_SUFFIXES = (".gz", ".bgz", ".bgzf", ".zip", ".bz2", ".xz")
+
+# Base codes of GWASLab: A, T, C, G and N, in upper or lower case, are 2, 3, 4, 5 and 6,
+# other bytes are unchanged
+_CODES = np.arange(256, dtype=np.uint8)
+for _bases in (b"ATCGN", b"atcgn"):
+    _CODES[list(_bases)] = range(2, 7)
+
+# Complementary base codes
+_COMPLEMENT = np.arange(256, dtype=np.uint8)
+_COMPLEMENT[[2, 3, 4, 5]] = [3, 2, 5, 4]
+
+_engine_lock = threading.Lock()
+
+
+def unsupported_reason(ref_seq):
+    """Return why the FASTA cannot be memory-mapped, None if it can."""
+    if str(ref_seq).endswith(COMPRESSED_SUFFIXES):
+        return "compressed FASTA"
+    if not os.path.exists(f"{ref_seq}.fai"):
+        return "FASTA without .fai index"
+    return None
+
+
+class IndexedFasta:
+    """Uncompressed FASTA memory-mapped with its ``.fai`` index."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.contigs = {}
+        with open(f"{self.path}.fai") as fai:
+            for line in fai:
+                name, length, offset, line_bases, line_width = line.split("\t")[:5]
+                self.contigs[name] = (int(length), int(offset), int(line_bases), int(line_width))
+        self._data = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+    def length(self, name):
+        """Return the length of a contig."""
+        return self.contigs[name][0]
+
+    def fetch(self, name, starts, width):
+        """
+        Return the base codes of windows of a contig.
+
+        Parameters
+        ----------
+        name : str
+            Contig name
+        starts : np.ndarray
+            0-based start of each window
+        width : int
+            Number of bases of the windows
+
+        Returns
+        -------
+        np.ndarray
+            ``(len(starts), width)`` array of GWASLab base codes, PADDING_VALUE beyond the contig
+        """
+        length, offset, line_bases, line_width = self.contigs[name]
+        positions = np.asarray(starts, dtype=np.int64)[:, np.newaxis] + np.arange(width)
+        inside = (positions >= 0) & (positions < length)
+        positions = np.where(inside, positions, 0)
+        offsets = offset + (positions // line_bases) * line_width + positions % line_bases
+        bases = _CODES[self._data[offsets]]
+        bases[~inside] = PADDING_VALUE
+        return bases
+
+
+def _encode_alleles(alleles):
+    """Return the codes of the alleles, padded with PADDING_VALUE, and the codes of their reverse complement."""
+    codes, uniques = pd.factorize(alleles)
+    uniques = pd.Index(uniques).astype(str)
+    width = max(int(uniques.str.len().max()), 1) if len(uniques) else 1
+    encoded = np.full((len(uniques), width), PADDING_VALUE, dtype=np.uint8)
+    for i, allele in enumerate(uniques):
+        encoded[i, : len(allele)] = np.frombuffer(allele.encode("latin-1", "replace"), dtype=np.uint8)
+    encoded = np.where(encoded == PADDING_VALUE, PADDING_VALUE, _CODES[encoded])
+    lengths = (encoded != PADDING_VALUE).sum(axis=1)
+    # Reverse complement: the complement of the bases read from the end of each allele
+    index = lengths[:, np.newaxis] - 1 - np.arange(width)
+    reverse = np.take_along_axis(_COMPLEMENT[encoded], np.clip(index, 0, None), axis=1)
+    reverse[index < 0] = PADDING_VALUE
+    return encoded[codes], reverse[codes]
+
+
+def _matches(alleles, bases):
+    """Return whether each allele matches the reference bases at its position."""
+    return np.all((alleles == bases) | (alleles == PADDING_VALUE), axis=1)
+
+
+def _digit(nea_codes, rev_nea_codes, ea_codes, rev_ea_codes, reference):
+    nea_eq_ref = _matches(nea_codes, reference)
+    ea_eq_ref = _matches(ea_codes, reference)
+    rev_nea_eq_ref = _matches(rev_nea_codes, reference)
+    rev_ea_eq_ref = _matches(rev_ea_codes, reference)
+    same_length = (nea_codes != PADDING_VALUE).sum(axis=1) == (ea_codes != PADDING_VALUE).sum(axis=1)
+
+    neither = ~nea_eq_ref & ~ea_eq_ref
+    digit = np.full(len(nea_codes), -1, dtype=np.int64)
+    # Same conditions and order as GWASLab
+    digit[nea_eq_ref & ea_eq_ref & ~same_length] = 6
+    digit[nea_eq_ref & ~ea_eq_ref] = 0
+    digit[~nea_eq_ref & ea_eq_ref] = 3
+    digit[neither & rev_nea_eq_ref & rev_ea_eq_ref & ~same_length] = 8
+    digit[neither & rev_nea_eq_ref & ~rev_ea_eq_ref] = 4
+    digit[neither & ~rev_nea_eq_ref & rev_ea_eq_ref] = 5
+    digit[neither & ~rev_nea_eq_ref & ~rev_ea_eq_ref] = 8
+    return digit
+
+
+def reference_digit(nea, ea, bases, short_length=4):
+    """
+    Return the digit 6 of STATUS of the variants given the reference bases at their positions.
+
+    Parameters
+    ----------
+    nea, ea : pd.Series
+        Non-effect and effect alleles
+    bases : callable
+        Function returning the reference base codes of windows of a given width at the positions
+        of the given rows, see IndexedFasta.fetch
+    short_length : int, default=4
+        Alleles up to this length are checked apart from the longer ones, so the windows of
+        most variants stay narrow
+
+    Returns
+    -------
+    np.ndarray
+        Digit of each variant, -1 where it is unchanged
+    """
+    codes = [*_encode_alleles(nea), *_encode_alleles(ea)]
+    total_width = max(c.shape[1] for c in codes)
+    codes = [np.pad(c, ((0, 0), (0, total_width - c.shape[1])), constant_values=PADDING_VALUE) for c in codes]
+    # NEA, reversed NEA, EA and reversed EA, the lengths are counted on the forward codes
+    nea_codes, ea_codes = codes[0], codes[2]
+    lengths = np.maximum((nea_codes != PADDING_VALUE).sum(axis=1), (ea_codes != PADDING_VALUE).sum(axis=1))
+    digit = np.full(len(nea_codes), -1, dtype=np.int64)
+    for rows in (np.flatnonzero(lengths <= short_length), np.flatnonzero(lengths > short_length)):
+        if len(rows) == 0:
+            continue
+        width = max(int(lengths[rows].max()), 1)
+        digit[rows] = _digit(*(c[rows, :width] for c in codes), bases(rows, width))
+    return digit
+
+
+def set_status_digit(status, digit):
+    """Return the STATUS codes with their digit 6 replaced where digit is not -1."""
+    status = np.asarray(status, dtype=np.int64)
+    power = 10 ** (6 - STATUS_DIGIT)
+    current = (status // power) % 10
+    return np.where(digit >= 0, status + (digit - current) * power, status)
+
+
+class _ContigRecords:
+    """Contigs of an IndexedFasta by sumstats chromosome, in place of the GWASLab concatenated record."""
+
+    def __init__(self, fasta, contigs):
+        self.fasta = fasta
+        self.contigs = contigs
+
+
+def _load_records(path, chromlist_set, chroms_in_sumstats_set, mapper=None, pos_as_dict=True, log=None, verbose=True):
+    """Index the contigs of ref_seq by chromosome, in place of GWASLab load_and_build_fasta_records."""
+    fasta = IndexedFasta(path)
+    log.write("   -Memory-mapping the indexed FASTA:", end="", verbose=verbose)
+    contigs = {}
+    for name in fasta.contigs:
+        try:
+            if mapper._sumstats_format is None:
+                mapper.detect_sumstats_format(pd.Series([name]))
+            chrom = mapper.to_numeric(name)
+        except (KeyError, ValueError, AttributeError):
+            chrom = name.strip("chrCHR").upper()
+        with contextlib.suppress(ValueError, TypeError):
+            chrom = int(chrom)
+        if chrom in chromlist_set and chrom in chroms_in_sumstats_set:
+            log.write(name, " ", end="", show_time=False, verbose=verbose)
+            contigs[chrom] = name
+    log.write("", show_time=False, verbose=verbose)
+    records_len = {chrom: fasta.length(name) for chrom, name in contigs.items()}
+    return _ContigRecords(fasta, contigs), dict.fromkeys(contigs, 0), records_len
+
+
+def _check_status(sumstats, record=None, threads=1, log=None, verbose=True, **kwargs):
+    """Check the variants against the memory-mapped contigs, in place of GWASLab check_status."""
+    chrom, pos, ea, nea, status = sumstats.columns
+    statuses = sumstats[status].to_numpy(dtype=np.int64)
+    groups = list(sumstats.groupby(chrom, sort=False, observed=True).indices.items())
+
+    def check(group):
+        value, rows = group
+        name = record.contigs[value]
+        starts = sumstats[pos].to_numpy(dtype=np.int64)[rows] - 1
+        part = sumstats.iloc[rows]
+        digit = reference_digit(part[nea], part[ea], lambda r, width: record.fasta.fetch(name, starts[r], width))
+        return rows, set_status_digit(statuses[rows], digit)
+
+    log.write(f"   -Checking records of {len(groups)} chromosomes on {threads} threads", verbose=verbose)
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        for rows, checked in executor.map(check, groups):
+            statuses[rows] = checked
+    return statuses
+
+
+@contextlib.contextmanager
+def fasta_engine(threads=1):
+    """
+    Run the GWASLab check_ref, e.g. within harmonize, on memory-mapped FASTA files.
+
+    The ref_seq must be an uncompressed FASTA with a ``.fai`` index, see unsupported_reason.
+
+    Parameters
+    ----------
+    threads : int, default=1
+        Number of threads checking the chromosomes
+    """
+    with _engine_lock:
+        load_records = hm_harmonize_sumstats.load_and_build_fasta_records
+        check_status = hm_harmonize_sumstats.check_status
+        hm_harmonize_sumstats.load_and_build_fasta_records = _load_records
+        hm_harmonize_sumstats.check_status = lambda sumstats, **kwargs: _check_status(
+            sumstats, threads=threads, **kwargs
+        )
+        try:
+            yield
+        finally:
+            hm_harmonize_sumstats.load_and_build_fasta_records = load_records
+            hm_harmonize_sumstats.check_status = check_status
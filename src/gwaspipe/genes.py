@@ -0,0 +1,335 @@
+"""
+Nearest-gene annotation of the variants.
+
+GWASLab annotates the lead variants with the closest genes of a GTF file, comparing
+each variant with all the genes of its chromosome. The gene list, e.g. the PLINK
+glist-hg19.txt, is compiled here once into sorted segments of 64-bit chromosome and
+position codes, split at the gene boundaries, halfway between the genes and at
+max_distance from them, each with its closest genes and the distance to them as a
+linear function of the position. All the variants are then annotated with one
+searchsorted, with the same result as GWASLab: GENE holds the overlapping genes, or else
+the closest genes within max_distance, joined by commas in the order of the gene list,
+and LOCATION is 0 inside a gene, the distance to the closest gene otherwise, negative
+when the variant is upstream of the gene start. Variants without a gene within
+max_distance have GENE Unknown and LOCATION max_distance.
+
+The compiled gene list is stored as NumPy files in a directory next to the gene list,
+memory-mapped by the later runs, and rebuilt when the gene list or max_distance change.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from gwaslab.info.g_Log import Log
+
+from gwaspipe.step_cache import _digest
+
+DEFAULT_MAX_DISTANCE = 1000000
+
+# Version of the layout of the compiled gene lists
+CACHE_FORMAT = 1
+
+CACHE_SUFFIX = "compiled"
+
+ARRAYS = ("segment", "label", "slope", "anchor")
+
+UNKNOWN = "Unknown"
+
+# Chromosome numbers of GWASLab, the pseudo-autosomal genes (XY) are on X
+CHROM_NUMBERS = {"X": 23, "Y": 24, "XY": 23, "M": 25, "MT": 25}
+
+
+def chrom_number(name):
+    """Return the GWASLab number of a chromosome name, e.g. 23 for chrX, None if it is not known."""
+    name = str(name).upper().removeprefix("CHR")
+    if name.isdigit():
+        return int(name)
+    return CHROM_NUMBERS.get(name)
+
+
+def chrom_numbers(chrom):
+    """Return the chromosome numbers of a column as float64, NaN where missing or not known."""
+    if pd.api.types.is_numeric_dtype(chrom):
+        return chrom.to_numpy(dtype="float64", na_value=np.nan)
+    codes, names = pd.factorize(chrom)
+    numbers = np.array([chrom_number(name) for name in names] + [None], dtype="float64")
+    return numbers[codes]
+
+
+def significant(data, sig_level):
+    """Return whether the variants reach sig_level, from MLOG10P if present, else from P, as in GWASLab."""
+    if "MLOG10P" in data.columns:
+        return data["MLOG10P"].to_numpy(dtype="float64", na_value=np.nan) >= -np.log10(sig_level)
+    return data["P"].to_numpy(dtype="float64", na_value=np.nan) <= sig_level
+
+
+def read_gene_list(gene_list_path):
+    """Read a gene list of CHR, START, END and GENE_NAME, separated by spaces, with or without header."""
+    genes = pd.read_csv(gene_list_path, sep=r"\s+", header=None, names=["CHR", "START", "END", "GENE_NAME"], dtype=str)
+    if len(genes) and not genes.at[0, "START"].isdigit():
+        genes = genes.iloc[1:]
+    return genes.reset_index(drop=True)
+
+
+def gene_list_key(gene_list_path, max_distance=DEFAULT_MAX_DISTANCE):
+    """Return the key of the compiled gene list, from the gene list file, max_distance and the layout version."""
+    stat = os.stat(gene_list_path)
+    identity = (os.path.realpath(gene_list_path), stat.st_size, stat.st_mtime_ns)
+    return _digest(identity, max_distance, CACHE_FORMAT)
+
+
+def _gap_segments(gap_start, gap_end, down, up, max_distance):
+    """
+    Return the segments of a gap between genes, as (start, genes, slope, anchor) with the
+    distance slope * position - anchor.
+
+    Parameters
+    ----------
+    gap_start, gap_end : int
+        First position after the genes ending before the gap and first position of the genes
+        starting after it, None at the ends of the chromosome
+    down, up : list
+        Genes ending before and starting after the gap
+    """
+    last_end = gap_start - 1 if gap_start is not None else None
+    lower = gap_start if gap_start is not None else 0
+    points = {lower}
+    if last_end is not None:
+        points.add(last_end + max_distance)
+    if gap_end is not None:
+        points.add(gap_end - max_distance + 1)
+    if last_end is not None and gap_end is not None:
+        middle = (last_end + gap_end) // 2
+        points.update((middle, middle + 1))
+    segments = []
+    for point in sorted(points):
+        if point < lower or (gap_end is not None and point >= gap_end):
+            continue
+        d = point - last_end if last_end is not None else np.inf
+        u = gap_end - point if gap_end is not None else np.inf
+        if min(d, u) >= max_distance:
+            segments.append((point, (), 0, -max_distance))
+        elif d < u:
+            segments.append((point, down, 1, last_end))
+        elif u < d:
+            segments.append((point, up, 1, gap_end))
+        else:
+            # Genes at the same distance on both sides, the sign is given by the first gene as in GWASLab
+            genes = sorted(down + up)
+            segments.append((point, genes, 0, d if genes[0] in up else -d))
+    return segments
+
+
+def compile_gene_list(gene_list_path, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Compile a gene list into sorted segments of chromosome and position codes.
+
+    Each segment holds the overlapping genes, or else the closest genes, and the distance
+    to them is slope * position - anchor.
+
+    Parameters
+    ----------
+    gene_list_path : str
+        Path to the gene list, see read_gene_list
+    max_distance : int, default=1000000
+        Maximum distance to a gene
+
+    Returns
+    -------
+    tuple
+        Arrays by name, see ARRAYS, the gene names and the labels of the segments, each a
+        list of gene indices in the order of the gene list, empty for no gene
+    """
+    genes = read_gene_list(gene_list_path)
+    chrom = np.array([chrom_number(name) or 0 for name in genes["CHR"]], dtype=np.int64)
+    start = genes["START"].to_numpy(dtype=np.int64)
+    end = genes["END"].to_numpy(dtype=np.int64)
+    known = np.flatnonzero(chrom > 0)
+    labels = {(): 0}
+    # Positions before the first chromosome have no gene
+    codes, segment_labels, slopes, anchors = [np.iinfo(np.int64).min], [0], [0], [-max_distance]
+
+    for c in np.unique(chrom[known]):
+        ids = known[chrom[known] == c].tolist()
+        starting, ending = {}, {}
+        for i in ids:
+            starting.setdefault(int(start[i]), []).append(i)
+            ending.setdefault(int(end[i]) + 1, []).append(i)
+        segments = []
+        active = set()
+        gap_start, down = None, []
+        for point in sorted(starting.keys() | ending.keys()):
+            if not active:
+                segments += _gap_segments(gap_start, point, down, starting.get(point, []), max_distance)
+            active.difference_update(ending.get(point, ()))
+            active.update(starting.get(point, ()))
+            if active:
+                segments.append((point, sorted(active), 0, 0))
+            else:
+                gap_start, down = point, ending[point]
+        segments += _gap_segments(gap_start, None, down, [], max_distance)
+        for point, gene_ids, slope, anchor in segments:
+            codes.append((int(c) << 32) | point)
+            segment_labels.append(labels.setdefault(tuple(gene_ids), len(labels)))
+            slopes.append(slope)
+            anchors.append(anchor)
+
+    arrays = {
+        "segment": np.array(codes, dtype=np.int64),
+        "label": np.array(segment_labels, dtype=np.int32),
+        "slope": np.array(slopes, dtype=np.int8),
+        "anchor": np.array(anchors, dtype=np.int64),
+    }
+    return arrays, genes["GENE_NAME"].tolist(), [list(map(int, ids)) for ids in labels]
+
+
+class GeneIndex:
+    """Compiled gene list."""
+
+    def __init__(self, arrays, names, labels, max_distance=DEFAULT_MAX_DISTANCE):
+        self.arrays = arrays
+        self.names = names
+        self.labels = labels
+        self.max_distance = max_distance
+        self.label_names = np.array([",".join(names[i] for i in ids) or UNKNOWN for ids in labels], dtype=object)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map the compiled gene list of a directory."""
+        with open(Path(path, "genes.json")) as f:
+            index = json.load(f)
+        arrays = {name: np.load(Path(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        return cls(arrays, index["names"], index["labels"], index["max_distance"])
+
+    def save(self, path):
+        """Write the compiled gene list in a directory, aside then moved in place."""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        for name in ARRAYS:
+            np.save(Path(tmp_path, f"{name}.npy"), self.arrays[name])
+        with open(Path(tmp_path, "genes.json"), "w") as f:
+            json.dump({"names": self.names, "labels": self.labels, "max_distance": self.max_distance}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def closest(self, codes, positions):
+        """
+        Return the closest genes of variants and their distance.
+
+        Parameters
+        ----------
+        codes : np.ndarray
+            Chromosome and position codes of the variants, see position_codes
+        positions : np.ndarray
+            Positions of the variants
+
+        Returns
+        -------
+        tuple of np.ndarray
+            Gene names and distances, see the module description
+        """
+        i = np.searchsorted(self.arrays["segment"], codes, side="right") - 1
+        distance = self.arrays["slope"][i] * positions - self.arrays["anchor"][i]
+        return self.label_names[self.arrays["label"][i]], distance
+
+
+def position_codes(chrom, pos):
+    """Return the 64-bit codes of chromosome number and position pairs."""
+    return (chrom.astype(np.int64) << 32) | pos.astype(np.int64)
+
+
+def _default_cache_path(gene_list_path, key):
+    return Path(f"{gene_list_path}.{key[:16]}.{CACHE_SUFFIX}")
+
+
+def open_gene_index(gene_list_path, max_distance=DEFAULT_MAX_DISTANCE, cache_path=None, log=Log(), verbose=True):
+    """
+    Return the compiled gene list, compiling it if it is not cached.
+
+    Parameters
+    ----------
+    gene_list_path : str
+        Path to the gene list, see read_gene_list
+    max_distance : int, default=1000000
+        Maximum distance to a gene
+    cache_path : str, optional
+        Directory of the compiled gene lists, next to the gene list by default
+
+    Returns
+    -------
+    GeneIndex
+        Compiled gene list, memory-mapped when it is cached
+    """
+    key = gene_list_key(gene_list_path, max_distance)
+    if cache_path is None:
+        path = _default_cache_path(gene_list_path, key)
+    else:
+        path = Path(cache_path, f"{Path(gene_list_path).name}.{key[:16]}.{CACHE_SUFFIX}")
+    if Path(path, "genes.json").exists():
+        log.write(f" -Using compiled gene list: {path}", verbose=verbose)
+        return GeneIndex.load(path)
+    index = GeneIndex(*compile_gene_list(gene_list_path, max_distance), max_distance)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        index.save(path)
+        log.write(f" -Compiled gene list written to {path}", verbose=verbose)
+    except OSError as e:
+        log.write(f" -Compiled gene list not written to {path}: {e}", verbose=verbose)
+    return index
+
+
+def annotate_genes(
+    data,
+    index,
+    chrom="CHR",
+    pos="POS",
+    sig_level=None,
+    log=Log(),
+    verbose=True,
+):
+    """
+    Annotate the variants with their closest genes, in place.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Sumstats
+    index : GeneIndex
+        Compiled gene list, see open_gene_index
+    sig_level : float, optional
+        Annotate only the variants reaching sig_level, see significant
+
+    Returns
+    -------
+    pd.DataFrame
+        Sumstats with the GENE and LOCATION columns, missing for the variants not annotated
+    """
+    chroms = chrom_numbers(data[chrom])
+    positions = data[pos].to_numpy(dtype="float64", na_value=np.nan)
+    selected = ~(np.isnan(chroms) | np.isnan(positions))
+    if sig_level is not None:
+        selected &= significant(data, sig_level)
+    rows = np.flatnonzero(selected)
+    log.write(f" -Annotating {len(rows)} variants with the closest genes", verbose=verbose)
+    names, distance = index.closest(position_codes(chroms[rows], positions[rows]), positions[rows].astype(np.int64))
+
+    if len(rows) == len(data):
+        gene, location = names, distance
+    else:
+        gene = np.full(len(data), None, dtype=object)
+        gene[rows] = names
+        location = np.zeros(len(data), dtype=np.int64)
+        location[rows] = distance
+    data["GENE"] = gene
+    data["LOCATION"] = pd.arrays.IntegerArray(location, ~selected)
+    log.write(f" -Variants in a gene: {int((distance == 0).sum())}", verbose=verbose)
+    log.write(
+        f" -Variants without a gene within {index.max_distance} bp: {int((names == UNKNOWN).sum())}", verbose=verbose
+    )
+    return data
@@ -1,54 +1,191 @@
 import gzip
 import os
+from functools import partial
 from pathlib import Path
 
 import click
 import gwaslab as gl
 import numpy as np
 
-from gwaspipe import __appname__, __version__, logger
+from gwaspipe import (
+    __appname__,
+    __version__,
+    columnar,
+    fasta,
+    genes,
+    liftover,
+    loci,
+    logger,
+    normalize,
+    parquet,
+    snp_mapping,
+)
+from gwaspipe.build_inference import DEFAULT_SAMPLE_SIZE, BuildCache, infer_sumstats_build
+from gwaspipe.checkpoint import Checkpoint, resolve_checkpoint_steps, run_fingerprint
 from gwaspipe.configuring import ConfigurationManager
+from gwaspipe.dtypes import apply_dtype_plan, log_memory_report, resolve_dtype_plan
+from gwaspipe.fanout import PREPARED_OUTPUT_STEPS, SharedEncoding, group_output_steps, run_sinks
+from gwaspipe.order_alleles import build_previous_ids, build_snpids
 from gwaspipe.order_alleles import order_alleles as order_alleles_func
+from gwaspipe.precision import max_decimal_places
+from gwaspipe.projection import load_formatbook, required_columns
+from gwaspipe.reference_cache import DEFAULT_MAX_SIZE as REFERENCE_CACHE_MAX_SIZE
+from gwaspipe.reference_cache import ReferenceCache, read_reference, reference_key
+from gwaspipe.step_cache import DEFAULT_MAX_SIZE, StepCache, base_key, step_keys
+from gwaspipe.streaming import (
+    STREAMING_SUPPORTED,
+    UNCHUNKABLE_FORMATS,
+    WHOLE_TABLE_PARAMS,
+    concat_chunks,
+    read_chunks,
+    split_run_sequence,
+)
+from gwaspipe.variant_ids import GTEX_ID_FIELDS, parse_variant_ids
+from gwaspipe.writer import unsupported_reason, write_tabular
 
 
 class SumstatsManager:
     def _make_gwaslab_snpid(self):
         """Return SNPID in GWASLab format (CHR:POS:EA:NEA)"""
-        df = self.mysumstats.data
-        return df[["CHR", "POS", "EA", "NEA"]].astype(str).agg(":".join, axis=1)
+        return build_snpids(self.mysumstats.data)
 
-    def __init__(self, input_path, input_format, input_separator, input_study, formatbook_path, pid, bcfliftover):
+    def __init__(
+        self,
+        input_path,
+        input_format,
+        input_separator,
+        input_study,
+        formatbook_path,
+        pid,
+        bcfliftover,
+        chunk_size=None,
+        dtype_plan=None,
+        columns=None,
+        restore_from=None,
+        previous_alleles=False,
+    ):
         if formatbook_path.exists():
             gl.options.set_option("formatbook", str(formatbook_path))
+        self.input_path = input_path
+        self.input_format = input_format
+        self.input_separator = input_separator
+        self.pid = pid
+        # Whether the input alleles are kept for write_snp_mapping, see snp_mapping.previous_alleles
+        self.previous_alleles = previous_alleles
+        self.bcfliftover = bcfliftover
+        self.chunk_size = chunk_size if input_format not in UNCHUNKABLE_FORMATS else None
+        self.chunk_index = 0
+        self.dtype_plan = dtype_plan or {}
+        self.columns = columns
+        self.inferred_build = None
+        # Cache of the inferred builds, see gwaspipe.build_inference
+        self.build_cache = None
+        # Sampling of the build inference configured on infer_build, also used by write_vcf
+        self.build_sampling = {}
+        # Compiled gene list of annotate_genes, shared by the chunks while streaming
+        self.gene_index = None
+        self._float_decimals = {}
+        self._column_decimals = {}
+        # Whether SNPID is built from the current EA and NEA, see snp_mapping.flipped_alleles
+        self.alleles_in_snpid = False
+        self.mysumstats = None
+        if restore_from is not None:
+            # Restore from a checkpoint or a step cache entry, the input was already loaded and prepared
+            self.chunk_size = None
+            self.mysumstats = restore_from.restore()
+            return
+        if self.chunk_size:
+            return
         if input_format == "pickle":
             self.mysumstats = gl.load_pickle(input_path)
+            self._drop_unused_columns()
+        elif input_format == "checkpoint":
+            self.mysumstats = columnar.load_sumstats(input_path, columns=self.columns)
         elif input_format == "vcf":
             self.mysumstats = gl.Sumstats(input_path, fmt=input_format, sep=input_separator, study=input_study)
+            self._drop_unused_columns()
         else:
-            self.mysumstats = gl.Sumstats(input_path, fmt=input_format, sep=input_separator)
-        if input_format == "gtex":
-            if "CHR" not in self.mysumstats.data.columns:
-                self.mysumstats.data["CHR"] = self.mysumstats.data["SNPID"].str.split("_", expand=True)[0]
-            if "POS" not in self.mysumstats.data.columns:
-                self.mysumstats.data["POS"] = self.mysumstats.data["SNPID"].str.split("_", expand=True)[1].astype(int)
-            if "NEA" not in self.mysumstats.data.columns:
-                self.mysumstats.data["NEA"] = self.mysumstats.data["SNPID"].str.split("_", expand=True)[2]
-            if "EA" not in self.mysumstats.data.columns:
-                self.mysumstats.data["EA"] = self.mysumstats.data["SNPID"].str.split("_", expand=True)[3]
-        if pid:
-            self.mysumstats.data["PREVIOUS_ID_GWASLAB"] = self._make_gwaslab_snpid()
-            if "rsID" in self.mysumstats.data.columns:
-                self.mysumstats.data["PREVIOUS_rsID"] = self.mysumstats.data["rsID"].astype("string")
-            if "SNPID" in self.mysumstats.data.columns:
-                self.mysumstats.data["PREVIOUS_ID"] = self.mysumstats.data["SNPID"].astype("string")
-            else:
-                self.mysumstats.data["PREVIOUS_ID"] = self._make_gwaslab_snpid()
-            if bcfliftover:
-                self.mysumstats.data["PREVIOUS_ID"] = (
-                    self.mysumstats.data["rsID"].astype("string").str.replace("_", ":", regex=False)
-                )
-        if bcfliftover:
+            self.mysumstats = gl.Sumstats(input_path, fmt=input_format, sep=input_separator, include=self._include)
+        self._prepare()
+
+    @property
+    def streaming(self):
+        return bool(self.chunk_size)
+
+    @property
+    def _include(self):
+        """Columns read from the input, None to read all the columns"""
+        return sorted(self.columns) if self.columns else None
+
+    def _drop_unused_columns(self):
+        """Drop the loaded columns that are not needed, for inputs read as a whole"""
+        if not self.columns:
+            return
+        unused = [col for col in self.mysumstats.data.columns if col not in self.columns]
+        if unused:
+            self.mysumstats.data.drop(columns=unused, inplace=True)
+            self.mysumstats.log.write(f" -Dropped columns not used by the run sequence: {','.join(unused)}")
+
+    def _prepare(self):
+        """Complete the loaded sumstats with the columns derived from the input"""
+        if self.input_format == "gtex":
+            missing = [field for field in GTEX_ID_FIELDS if field not in self.mysumstats.data.columns]
+            if missing:
+                fields = tuple(field if field in missing else None for field in GTEX_ID_FIELDS)
+                parsed = parse_variant_ids(self.mysumstats.data["SNPID"], sep="_", fields=fields)
+                for field in missing:
+                    self.mysumstats.data[field] = parsed[field]
+        if self.pid:
+            for column, values in build_previous_ids(self.mysumstats.data, bcfliftover=self.bcfliftover).items():
+                self.mysumstats.data[column] = values
+            if self.previous_alleles:
+                for column, values in snp_mapping.previous_alleles(self.mysumstats.data).items():
+                    self.mysumstats.data[column] = values
+        if self.bcfliftover:
             self.mysumstats.data.drop(columns=["rsID"], inplace=True)
+        self.apply_dtype_plan()
+
+    def apply_dtype_plan(self):
+        """Cast the columns to the compact dtypes of the plan and log their memory before and after"""
+        if not self.dtype_plan:
+            return
+        verbose = self.chunk_index == 0
+        report = apply_dtype_plan(self.mysumstats.data, self.dtype_plan, log=self.mysumstats.log, verbose=verbose)
+        log_memory_report(report, log=self.mysumstats.log, verbose=verbose)
+
+    def iter_chunks(self, collect=False):
+        """
+        Load the input one chunk at a time, holding each chunk in mysumstats while the caller
+        runs the streamed steps. Yield the index of the current chunk.
+        If collect is True, the processed chunks are concatenated into mysumstats at the end.
+        """
+        frames = []
+        chunks = read_chunks(
+            self.input_path, self.input_format, self.input_separator, self.chunk_size, include=self._include
+        )
+        for chunk_index, chunk in enumerate(chunks):
+            self.chunk_index = chunk_index
+            sumstats = gl.Sumstats(chunk, fmt=self.input_format, verbose=chunk_index == 0)
+            if self.mysumstats is not None:
+                # Keep a single log for the whole input
+                sumstats.log = self.mysumstats.log
+                sumstats.log._sumstats_obj = sumstats
+            self.mysumstats = sumstats
+            self.invalidate_float_decimals()
+            self._prepare()
+            sumstats.log.write(f"Processing chunk {chunk_index} ({len(sumstats.data)} rows)")
+            yield chunk_index
+            if collect:
+                frames.append(self.mysumstats.data)
+        if collect and frames:
+            self.mysumstats.data = concat_chunks(frames)
+            self.invalidate_float_decimals()
+            self.mysumstats.log.write(f"Materialized {len(frames)} chunks: {len(self.mysumstats.data)} rows")
+        self.chunk_size = None
+        self.chunk_index = 0
+        if collect and frames:
+            # Chunks may have different allele dictionaries
+            self.apply_dtype_plan()
 
     def fill_mlog10p(self, gl_params):
         """
@@ -69,16 +206,165 @@ class SumstatsManager:
             self.mysumstats.log.write("Finished filling the MLOG10P column")
 
     def float_dict_custom(self, gp):
-        """Preserve the number of decimals from the input data (statistics)"""
+        """
+        Preserve the number of decimals from the input data (statistics).
+        The number of decimals of each column is cached until the table changes, see invalidate_float_decimals.
+        While streaming, the number of decimals is the running maximum over the chunks written so far.
+        """
         float_dict = {}
         for col in self.mysumstats.data.columns:
             if str(self.mysumstats.data[col].dtype) in ["Float32", "Float64", "float64", "float32", "float16", "float"]:
-                fn = self.mysumstats.data[col].apply(lambda x: len(str(x).split(".")[-1]) if "." in str(x) else 0).max()
+                if col not in self._column_decimals:
+                    self._column_decimals[col] = max_decimal_places(self.mysumstats.data[col])
+                fn = self._column_decimals[col]
+                if self.streaming:
+                    fn = max(fn, self._float_decimals.get(col, 0))
+                    self._float_decimals[col] = fn
                 float_dict[col] = "{:." + str(fn) + "f}"
         if "float_formats" in gp:
             float_dict.update({k: v for k, v in gp["float_formats"].items() if k in float_dict})
         return float_dict
 
+    def invalidate_float_decimals(self):
+        """Forget the cached number of decimals, after a step that can change the float values"""
+        self._column_decimals = {}
+
+    def infer_build(self, sampled=False, sample_size=DEFAULT_SAMPLE_SIZE):
+        """
+        Infer the genome build, from a sample of the positions if sampled is set, see gwaspipe.build_inference.
+        While streaming, the chunks after the first reuse the build of the first chunk, and a build inferred
+        before is reused while the sumstats keep it.
+        """
+        if self.streaming and self.chunk_index > 0:
+            if self.inferred_build is not None:
+                self.mysumstats.set_build(self.inferred_build, verbose=False)
+            return
+        if self.inferred_build is not None and self.mysumstats.meta["gwaslab"]["genome_build"] == self.inferred_build:
+            self.mysumstats.log.write(f" -Genome build already inferred: {self.inferred_build}")
+            return
+        if sampled:
+            infer_sumstats_build(
+                self.mysumstats,
+                sample_size=sample_size,
+                build_cache=self.build_cache,
+                input_path=self.input_path,
+                log=self.mysumstats.log,
+            )
+        else:
+            self.mysumstats.infer_build()
+        self.inferred_build = self.mysumstats.meta["gwaslab"]["genome_build"]
+
+    def to_format(
+        self, path, gl_params, native_writer=False, writer_threads=1, tabix_index=False, encoding=None, **kwargs
+    ):
+        """
+        Write the sumstats preserving the input decimals. While streaming, the chunks are appended to the output.
+        With native_writer, delimited-text outputs are written by gwaspipe.writer, compressing on writer_threads threads.
+        tabix_index implies native_writer and sorts the output by position and writes its tabix index.
+        encoding holds the column encodings shared by the outputs of a fan-out stage.
+        """
+        gl_params = {**gl_params, "float_formats": self.float_dict_custom(gl_params)}
+        if self.streaming:
+            if tabix_index and self.chunk_index == 0:
+                self.mysumstats.log.write(" -Tabix index not supported in streaming mode, writing without index")
+            tabix_index = False
+        if self.streaming and self.chunk_index > 0:
+            gl_params["to_csvargs"] = {**gl_params.get("to_csvargs", {}), "mode": "a", "header": False}
+        if native_writer or tabix_index:
+            reason = unsupported_reason(self.mysumstats.data, path, {**gl_params, **kwargs})
+            if reason is None:
+                write_tabular(
+                    self.mysumstats,
+                    path,
+                    threads=writer_threads,
+                    tabix=tabix_index,
+                    encoding=encoding,
+                    **gl_params,
+                    **kwargs,
+                )
+                return
+            self.mysumstats.log.write(f" -Native writer does not support {reason}, writing with GWASLab")
+        self.mysumstats.to_format(path, **gl_params, **kwargs)
+
+    def to_parquet(self, path, gl_params, layout, row_group_size=parquet.DEFAULT_ROW_GROUP_SIZE, encoding=None):
+        """
+        Write the sumstats as Parquet sorted by position, in row groups aligned to the chromosomes.
+        See gwaspipe.parquet for the layouts, outputs it does not support are written by GWASLab.
+        """
+        reason = parquet.unsupported_reason(self.mysumstats.data, path, gl_params)
+        if reason is None:
+            parquet.write_parquet(
+                self.mysumstats, path, layout=layout, row_group_size=row_group_size, encoding=encoding, **gl_params
+            )
+            return
+        self.mysumstats.log.write(f" -Parquet layout does not support {reason}, writing with GWASLab")
+        self.to_format(path, gl_params)
+
+    def basic_check(self, gl_params, fast_normalize=False, left_align_ref_seq=None):
+        """
+        Run basic_check, normalizing the indels with the vectorized engine if fast_normalize is set
+        and left-aligning them against left_align_ref_seq if it is given.
+        See gwaspipe.normalize, a FASTA it does not support is not used to left-align the indels.
+        """
+        if left_align_ref_seq is not None:
+            reason = fasta.unsupported_reason(left_align_ref_seq)
+            if reason is not None:
+                self.mysumstats.log.write(f" -Left alignment does not support {reason}, trimming the indels only")
+                left_align_ref_seq = None
+        if (fast_normalize or left_align_ref_seq is not None) and gl_params.get("normalize", True):
+            with normalize.normalize_engine(threads=gl_params.get("threads", 1), ref_seq=left_align_ref_seq):
+                self.mysumstats.basic_check(**gl_params)
+            return
+        self.mysumstats.basic_check(**gl_params)
+
+    def liftover(self, gl_params, compiled_chain=False, compiled_chain_path=None):
+        """
+        Lift the sumstats over, with the chain compiled once and stored in compiled_chain_path,
+        next to the chain by default, if compiled_chain is set. See gwaspipe.liftover.
+        """
+        if compiled_chain:
+            with liftover.liftover_engine(cache_path=compiled_chain_path, log=self.mysumstats.log):
+                self.mysumstats.liftover(**gl_params)
+            return
+        self.mysumstats.liftover(**gl_params)
+
+    def harmonize(self, gl_params, mmap_fasta=False):
+        """
+        Harmonize the sumstats, checking the alleles against a memory-mapped ref_seq if mmap_fasta is set.
+        See gwaspipe.fasta, a FASTA it does not support is read by GWASLab.
+        """
+        ref_seq = gl_params.get("ref_seq")
+        if mmap_fasta and ref_seq is not None:
+            reason = fasta.unsupported_reason(ref_seq)
+            if reason is None:
+                with fasta.fasta_engine(threads=gl_params.get("threads", 1)):
+                    self.mysumstats.harmonize(**gl_params)
+                return
+            self.mysumstats.log.write(f" -Memory-mapped reference does not support {reason}, reading it with GWASLab")
+        self.mysumstats.harmonize(**gl_params)
+
+    def annotate_genes(
+        self, gene_list, sig_level=None, max_distance=genes.DEFAULT_MAX_DISTANCE, compiled_gene_list_path=None
+    ):
+        """
+        Annotate the variants, or only those with P below sig_level, with their closest genes in gene_list.
+        The gene list is compiled once and stored in compiled_gene_list_path, next to the gene list by default.
+        See gwaspipe.genes.
+        """
+        verbose = self.chunk_index == 0
+        if self.gene_index is None:
+            self.gene_index = genes.open_gene_index(
+                gene_list,
+                max_distance=max_distance,
+                cache_path=compiled_gene_list_path,
+                log=self.mysumstats.log,
+                verbose=verbose,
+            )
+        self.mysumstats.log.write("Start to annotate the closest genes...", verbose=verbose)
+        genes.annotate_genes(
+            self.mysumstats.data, self.gene_index, sig_level=sig_level, log=self.mysumstats.log, verbose=verbose
+        )
+
     def order_alleles(
         self,
         ea="EA",
@@ -106,6 +392,275 @@ class SumstatsManager:
             mode=mode,
             verbose=verbose,
         )
+        self.alleles_in_snpid = format_snpid
+
+
+def setup_harmonize_cache(cm, log, run_sequence=None):
+    """
+    Open the persistent reference cache or start the palindromic/indel cache process for the harmonize step, if requested
+    and harmonize is among the steps of run_sequence that remain to run, by default the whole run sequence
+    """
+    if run_sequence is None:
+        run_sequence = cm.run_sequence
+    if "harmonize" in run_sequence:
+        params, gl_params = cm.step("harmonize")
+        run = params.get("run", False)
+        preload_cache = params.get("preload_cache", False)
+        reference_cache_config = cm.config.get("reference_cache")
+        if run and (preload_cache or reference_cache_config):
+            if "ref_infer" in gl_params:
+                NUM_WORKERS = cm.config.get("n_cores", None) or int(
+                    os.environ.get("SLURM_CPUS_PER_TASK", 1)
+                )  # default to 1 if not set. It is used only if cache has to be built
+                ref_alt_freq = gl_params.get("ref_alt_freq", None)
+                base_path = gl_params["ref_infer"]
+                if reference_cache_config:
+                    reference_cache = ReferenceCache(
+                        reference_cache_config.get("path", Path(cm.root_path, ".reference_cache")),
+                        reference_cache_config.get("max_size", REFERENCE_CACHE_MAX_SIZE),
+                    )
+                    key = reference_key(base_path, ref_alt_freq)
+                    logger.info(f"Opening the reference cache {key[:12]} in {reference_cache.path}")
+                    lookup = reference_cache.open(
+                        key, partial(read_reference, base_path, ref_alt_freq, threads=NUM_WORKERS)
+                    )
+                    logger.info(f"Reference cache opened with {len(lookup)} variants")
+                    cache_options = {"cache_loader": lookup}
+                else:
+                    cache_process = gl.cache_manager.CacheProcess(
+                        base_path,
+                        ref_alt_freq=ref_alt_freq,
+                        category=gl.cache_manager.PALINDROMIC_INDEL,
+                        threads=NUM_WORKERS,
+                        log=log,
+                        verbose=True,
+                    )
+                    cache_process.start()
+                    cache_options = {"cache_process": cache_process}
+
+                # Add cache options to the infer_strand arguments of harmonize
+                infer_strand_kwargs = gl_params.get("infer_strand_kwargs", {})
+                infer_strand_kwargs.setdefault("cache_options", {}).update(cache_options)
+                gl_params["infer_strand_kwargs"] = infer_strand_kwargs
+
+
+# Steps that leave the float values of the table unchanged, so the cached decimals stay valid
+FLOAT_PRESERVING_STEPS = frozenset(
+    {
+        "infer_build",
+        "annotate_genes",
+        "report_harmonization_summary",
+        "report_min_pvalue",
+        "report_loci",
+        "report_inflation_factors",
+        "qq_manhattan_plots",
+        "write_snp_mapping",
+        "write_pickle",
+        "write_checkpoint",
+        "write_regenie",
+        "write_ldsc",
+        "write_metal",
+        "write_tsv",
+        "write_fastgwa",
+        "write_parquet",
+        "write_vcf",
+        "write_same_input_format",
+    }
+)
+
+
+def prepare_output_step(sm, step, input_file_stem):
+    """Change the sumstats as needed by an output step, before the outputs of its fan-out stage are written"""
+    if step == "write_snp_mapping":
+        sm.mysumstats.data["EQUALS"] = sm.mysumstats.data["SNPID"] == sm.mysumstats.data["PREVIOUS_ID"]
+        sm.mysumstats.data["FLIPPED"] = snp_mapping.flipped_alleles(sm.mysumstats.data, sm.alleles_in_snpid)
+        # The input alleles are only kept for FLIPPED, so they are not written by the following outputs
+        previous = [col for col in snp_mapping.PREVIOUS_ALLELES.values() if col in sm.mysumstats.data.columns]
+        sm.mysumstats.data.drop(columns=previous, inplace=True)
+    elif step == "write_vcf":
+        sm.mysumstats.meta["gwaslab"]["study_name"] = input_file_stem
+        sm.infer_build(**sm.build_sampling)
+
+
+def output_log_path(step, gl_params, workspace_path, input_file_stem, input_format):
+    """Return the log file written by an output step, None for the steps writing no log"""
+    if step in ("write_pickle", "write_checkpoint"):
+        return None
+    prefix = Path(workspace_path, "table" if step == "write_snp_mapping" else input_file_stem)
+    fmt = input_format if step == "write_same_input_format" else gl_params.get("fmt", "gwaslab")
+    suffix = "hapmap3." * bool(gl_params.get("hapmap3")) + fmt
+    suffix = "noMHC." * bool(gl_params.get("exclude_hla")) + suffix
+    return f"{prefix}.{suffix}.log"
+
+
+def run_step(
+    sm,
+    step,
+    params,
+    gl_params,
+    workspace_path,
+    input_file_name,
+    input_file_stem,
+    if_eaf_float_format,
+    encoding=None,
+    prepared=False,
+):
+    """
+    Run a single step of the run sequence on the sumstats held by the SumstatsManager.
+    In a fan-out stage, the output steps share the column encodings and are already prepared.
+    """
+    if step not in FLOAT_PRESERVING_STEPS:
+        sm.invalidate_float_decimals()
+        # The step may change the alleles, sort_alphabetically builds SNPID again from them
+        sm.alleles_in_snpid = False
+    if step in PREPARED_OUTPUT_STEPS and not prepared:
+        prepare_output_step(sm, step, input_file_stem)
+    writer = {
+        "native_writer": params.get("native_writer", False),
+        "writer_threads": params.get("writer_threads", 1),
+        "tabix_index": params.get("tabix_index", False),
+        "encoding": encoding,
+    }
+    if step == "write_snp_mapping":
+        output_path = str(Path(workspace_path, "table"))
+        sm.to_format(output_path, gl_params, **writer)
+        if params.get("compact_mapping", False):
+            snp_mapping.write_compact_mapping(sm.mysumstats.data, output_path, part=sm.chunk_index)
+            sm.mysumstats.log.write(f" -Compact SNP mapping written to {output_path}.{snp_mapping.COMPACT_SUFFIX}")
+    elif step == "basic_check":
+        sm.basic_check(
+            gl_params,
+            fast_normalize=params.get("fast_normalize", False),
+            left_align_ref_seq=params.get("left_align_ref_seq"),
+        )
+        # basic_check casts the columns back to the GWASLab dtypes
+        sm.apply_dtype_plan()
+        if not if_eaf_float_format:
+            sm.mysumstats.data["EAF"] = round(sm.mysumstats.data["EAF"].astype("float64"), 7)
+    elif step == "infer_build":
+        sm.infer_build(sampled=params.get("sampled", False), sample_size=params.get("sample_size", DEFAULT_SAMPLE_SIZE))
+    elif step == "fill_data":
+        sm.fill_mlog10p(gl_params)
+        sm.mysumstats.fill_data(**gl_params)
+    elif step == "harmonize":
+        sm.harmonize(gl_params, mmap_fasta=params.get("mmap_fasta", False))
+    elif step == "liftover":
+        sm.liftover(
+            gl_params,
+            compiled_chain=params.get("compiled_chain", False),
+            compiled_chain_path=params.get("compiled_chain_path"),
+        )
+    elif step == "annotate_genes":
+        sm.annotate_genes(
+            params["gene_list"],
+            sig_level=params.get("sig_level"),
+            max_distance=params.get("max_distance", genes.DEFAULT_MAX_DISTANCE),
+            compiled_gene_list_path=params.get("compiled_gene_list_path"),
+        )
+    elif step == "report_harmonization_summary":
+        summary = sm.mysumstats.lookup_status().to_string()
+        output_path = str(Path(workspace_path, ".".join([input_file_stem, "harmonization_summary.tsv"])))
+        with open(output_path, "w") as fp:
+            fp.write(summary)
+    elif step == "report_min_pvalue":
+        nrows = params.get("nrows", 1)
+        df = sm.mysumstats.data.nlargest(nrows, "MLOG10P", keep="first").reset_index(drop=True)
+        snpid = df.at[0, "SNPID"]
+        mlog10p = df.at[0, "MLOG10P"]
+        output_path = str(Path(workspace_path, ".".join([input_file_stem, "nlargest.txt"])))
+        with open(output_path, "w") as fp:
+            fp.write("input_file\tSNPID\tMLOG10P\n")
+            fp.write(f"{input_file_name}\t{snpid}\t{mlog10p}\n")
+    elif step == "report_loci":
+        sm.mysumstats.log.write("Start to extract the loci...")
+        df = loci.find_loci(
+            sm.mysumstats.data,
+            sig_level=params.get("sig_level", loci.DEFAULT_SIG_LEVEL),
+            windowsizekb=params.get("windowsizekb", loci.DEFAULT_WINDOW_SIZE_KB),
+            method=params.get("method", "clump"),
+            log=sm.mysumstats.log,
+        )
+        df.insert(0, "input_file", input_file_name)
+        output_path = str(Path(workspace_path, ".".join([input_file_stem, "loci.tsv"])))
+        df.to_csv(output_path, sep="\t", index=False)
+    elif step == "report_inflation_factors":
+        df = sm.mysumstats.data
+        CHISQ = df.Z**2
+        max_chisq = str(round(CHISQ.max(), 3))
+        mean_chisq = str(round(CHISQ.mean(), 3))
+        lambda_GC = str(round(CHISQ.median() / 0.4549, 3))
+
+        output_path = str(Path(workspace_path, ".".join([input_file_stem, "if.txt"])))
+        with open(output_path, "w") as fp:
+            fp.write("input_file\tlambda_GC\tmean_chisq\tmax_chisq\n")
+            fp.write(f"{input_file_name}\t{lambda_GC}\t{mean_chisq}\t{max_chisq}\n")
+    elif step == "sort_alphabetically":
+        n_cores = params.get("n_cores", gl_params.get("n_cores", 1))
+        sm.order_alleles(n_cores=n_cores, mode=params.get("mode", "v"))
+        if not if_eaf_float_format:
+            sm.mysumstats.data["EAF"] = round(sm.mysumstats.data["EAF"].astype("float64"), 7)
+    elif step == "write_pickle":
+        output_path = str(Path(workspace_path, ".".join([input_file_stem, "pkl"])))
+        gl.dump_pickle(sm.mysumstats, output_path, overwrite=params["overwrite"])
+    elif step == "write_checkpoint":
+        output_path = Path(workspace_path, ".".join([input_file_stem, "feather"]))
+        if output_path.exists() and not params.get("overwrite", False):
+            sm.mysumstats.log.write(f" -{output_path} exists, set overwrite to replace it")
+        else:
+            columnar.dump_sumstats(sm.mysumstats, output_path)
+            sm.mysumstats.log.write(f" -Checkpoint written to {output_path}")
+    elif step == "write_parquet" and params.get("parquet_layout"):
+        output_path = str(Path(workspace_path, input_file_stem))
+        sm.to_parquet(
+            output_path,
+            gl_params,
+            params["parquet_layout"],
+            row_group_size=params.get("row_group_size", parquet.DEFAULT_ROW_GROUP_SIZE),
+            encoding=encoding,
+        )
+    elif step in ["write_regenie", "write_ldsc", "write_metal", "write_tsv", "write_fastgwa", "write_parquet"]:
+        output_path = str(Path(workspace_path, input_file_stem))
+        sm.to_format(output_path, gl_params, **writer)
+    elif step == "write_vcf":
+        output_path = str(Path(workspace_path, input_file_stem))
+        sm.to_format(output_path, gl_params, **writer)
+    elif step == "write_same_input_format":
+        output_path = str(Path(workspace_path, input_file_stem))
+        sm.to_format(output_path, gl_params, fmt=sm.input_format, **writer)
+    elif step == "check_ambiguous_snps":
+        df = sm.mysumstats.data
+
+        # True duplicated SNPs
+        dup_mask = df.duplicated(subset=["SNPID", "EAF", "BETA", "SE"], keep="first")
+        nr_dup_snps = dup_mask.sum()
+        if nr_dup_snps > 0:
+            df = df.loc[~dup_mask].reset_index(drop=True)
+
+        # Ambiguous SNPs
+        snp_groups = df.groupby("SNPID")
+        ambiguous_mask = snp_groups[["EAF", "BETA", "SE"]].transform("nunique").gt(1).any(axis=1)
+        nr_ambiguous_snps = ambiguous_mask.sum()
+        if nr_ambiguous_snps > 0:
+            df = df.loc[~ambiguous_mask].reset_index(drop=True)
+
+        # Multi-allelic SNPs
+        nr_multiallelic_snps = df.groupby(["CHR", "POS"])["SNPID"].transform("nunique").gt(1).sum()
+        nr_multiallelic_loci = df.groupby(["CHR", "POS"])["SNPID"].nunique().gt(1).sum()
+
+        sm.mysumstats.data = df
+
+        sm.mysumstats.log.write("Start to check ambiguous variants...")
+        sm.mysumstats.log.write(f" -Dropped duplicated SNPs: {nr_dup_snps}")
+        sm.mysumstats.log.write(f" -Dropped ambiguous SNPs: {nr_ambiguous_snps}")
+        sm.mysumstats.log.write(f" -Multi-allelic SNPs: {nr_multiallelic_snps}")
+        sm.mysumstats.log.write(f" -Multi-allelic positions: {nr_multiallelic_loci}")
+        sm.mysumstats.log.write(
+            f" -Current Dataframe shape : {len(sm.mysumstats.data)} x {len(sm.mysumstats.data.columns)}"
+        )
+    elif step == "qq_manhattan_plots":
+        output_path = str(Path(workspace_path, ".".join([input_file_stem, "png"])))
+        cut = round(-np.log10(gl_params["sig_level"])) + params["dist"]
+        sm.mysumstats.plot_mqq(cut=cut, save=output_path, **gl_params)
 
 
 @click.version_option(version=__version__)
@@ -134,6 +689,7 @@ class SumstatsManager:
             "ldsc",
             "fuma",
             "pickle",
+            "checkpoint",
             "metal_het",
             "auto",
         ],
@@ -147,6 +703,13 @@ class SumstatsManager:
 @click.option("-q", "--quiet", default=False, is_flag=True, help="Set log verbosity")
 @click.option("--pid", default=False, is_flag=True, help="Preserve ID")
 @click.option("--bcfliftover", default=False, is_flag=True, help="Input from BCFtools liftover")
+@click.option(
+    "--chunk_size",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Stream the input in chunks of this many rows through the row-local steps",
+)
+@click.option("--resume", default=False, is_flag=True, help="Resume after the last checkpointed step")
 def main(
     config_file,
     input_file,
@@ -158,6 +721,8 @@ def main(
     quiet,
     pid,
     bcfliftover,
+    chunk_size,
+    resume,
 ):
     cm = ConfigurationManager(config_file=config_file, formatbook_file=formatbook_file, root_path=output)
     log_file = cm.log_file_path
@@ -190,50 +755,46 @@ def main(
         except IndexError:
             print("No study label found after FORMAT.")
 
-    if "write_snp_mapping" in cm.run_sequence:
+    previous_alleles = "write_snp_mapping" in cm.run_sequence
+    if previous_alleles:
         pid = True
-    if input_file_path.exists():
-        sm = SumstatsManager(
-            input_file_path.as_posix(),
-            input_file_format,
-            input_file_separator,
-            study_label,
-            formatbook_file_path,
-            pid,
-            bcfliftover,
-        )
-    else:
+    chunk_size = chunk_size or cm.config.get("chunk_size", None)
+    if chunk_size and not STREAMING_SUPPORTED:
+        logger.warning("Streaming is not supported by this GWASLab version, loading the whole input")
+        chunk_size = None
+    columns = None
+    if cm.config.get("column_projection", True) and formatbook_file_path.exists():
+        columns = required_columns(cm.run_sequence, cm.step, load_formatbook(formatbook_file_path))
+        if columns:
+            logger.info(f"Column projection, reading only: {', '.join(sorted(columns))}")
+    if not input_file_path.exists():
         msg = f"{input_file_path} input file not found"
         exit(msg)
 
-    # Setup cache if needed
-    if "harmonize" in cm.run_sequence:
-        params, gl_params = cm.step("harmonize")
-        run = params.get("run", False)
-        preload_cache = params.get("preload_cache", False)
-        if run and preload_cache:
-            if "ref_infer" in gl_params:
-                NUM_WORKERS = cm.config.get("n_cores", None) or int(
-                    os.environ.get("SLURM_CPUS_PER_TASK", 1)
-                )  # default to 1 if not set. It is used only if cache has to be built
-                ref_alt_freq = gl_params.get("ref_alt_freq", None)
-                base_path = gl_params["ref_infer"]
-                cache_process = gl.cache_manager.CacheProcess(
-                    base_path,
-                    ref_alt_freq=ref_alt_freq,
-                    category=gl.cache_manager.PALINDROMIC_INDEL,
-                    n_cores=NUM_WORKERS,
-                    log=sm.mysumstats.log,
-                    verbose=True,
-                )
-                cache_process.start()
+    checkpoint = None
+    checkpoint_steps = resolve_checkpoint_steps(cm.config.get("checkpoint"))
+    if checkpoint_steps or resume:
+        checkpoint = Checkpoint(
+            Path(cm.root_path, ".checkpoints", input_file_stem),
+            run_fingerprint(
+                input_file_path,
+                cm.config,
+                input_file_format=input_file_format,
+                input_file_separator=input_file_separator,
+                pid=pid,
+                bcfliftover=bcfliftover,
+                chunk_size=chunk_size,
+            ),
+            steps=checkpoint_steps,
+        )
+    resume_step = None
+    if resume:
+        resume_step = checkpoint.completed_step()
+        if resume_step not in cm.run_sequence:
+            logger.info("No checkpoint of this input and configuration found, starting from the input")
+            resume_step = None
 
-                # Add cache options to inferstrand_args
-                inferstrand_args = gl_params.get("inferstrand_args", {})
-                cache_options = inferstrand_args.get("cache_options", {})
-                cache_options.update({"cache_process": cache_process})
-                inferstrand_args.update({"cache_options": cache_options})
-                gl_params["inferstrand_args"] = inferstrand_args
+    dtype_plan = resolve_dtype_plan(cm.config.get("dtype_plan"))
 
     # EAF floating format in config
     if_eaf_float_format = any(
@@ -243,9 +804,66 @@ def main(
         for y, x in [cm.step(step)]
     )
 
-    for step in cm.run_sequence:
-        params, gl_params = cm.step(step)
-        run = params.get("run", False)
+    restore_from = checkpoint if resume_step else None
+    step_cache = None
+    cached_keys = {}
+    cached_step = None
+    step_cache_config = cm.config.get("step_cache")
+    if step_cache_config and not chunk_size and not resume_step:
+        step_cache = StepCache(
+            step_cache_config.get("path", Path(cm.root_path, ".step_cache")),
+            step_cache_config.get("max_size", DEFAULT_MAX_SIZE),
+        )
+        keys = step_keys(
+            base_key(
+                input_file_path,
+                formatbook_file_path,
+                input_file_format=input_file_format,
+                input_file_separator=input_file_separator,
+                study_label=study_label,
+                pid=pid,
+                previous_alleles=previous_alleles,
+                bcfliftover=bcfliftover,
+                dtype_plan=dtype_plan,
+                columns=sorted(columns) if columns else None,
+                if_eaf_float_format=if_eaf_float_format,
+            ),
+            cm.run_sequence,
+            cm.step,
+        )
+        cached_keys = dict(keys)
+        cached_index, cached_entry = step_cache.restore(keys)
+        if cached_index is not None:
+            cached_step = keys[cached_index][0]
+            restore_from = cached_entry
+
+    sm = SumstatsManager(
+        input_file_path.as_posix(),
+        input_file_format,
+        input_file_separator,
+        study_label,
+        formatbook_file_path,
+        pid,
+        bcfliftover,
+        chunk_size=chunk_size,
+        dtype_plan=dtype_plan,
+        columns=columns,
+        restore_from=restore_from,
+        previous_alleles=previous_alleles,
+    )
+
+    infer_build_params = cm.step("infer_build")[0]
+    sm.build_sampling = {
+        "sampled": infer_build_params.get("sampled", False),
+        "sample_size": infer_build_params.get("sample_size", DEFAULT_SAMPLE_SIZE),
+    }
+    build_cache_config = cm.config.get("build_cache")
+    if build_cache_config:
+        sm.build_cache = BuildCache(build_cache_config.get("path", Path(cm.root_path, ".build_cache")))
+
+    fanout_threads = cm.config.get("fanout_threads", 1)
+
+    def step_workspace(params):
         ws = params.get("workspace", "default")
         ws_subfolder = params.get("workspace_subfolder", False)
         if ws_subfolder:
@@ -253,117 +871,81 @@ def main(
         else:
             workspace_path = Path(cm.root_path, ws)
         workspace_path.mkdir(parents=True, exist_ok=True)
+        return workspace_path
 
-        if run:
-            logger.info(f"Started {step} step")
-            if step == "write_snp_mapping":
-                output_path = str(Path(workspace_path, "table"))
-                sm.mysumstats.data["EQUALS"] = sm.mysumstats.data["SNPID"] == sm.mysumstats.data["PREVIOUS_ID"]
-                snp_split = sm.mysumstats.data["SNPID"].str.split(":", expand=True)
-                prev_split = sm.mysumstats.data["PREVIOUS_ID_GWASLAB"].str.split(":", expand=True)
-                sm.mysumstats.data["FLIPPED"] = (snp_split.iloc[:, -2] != prev_split.iloc[:, -2]) & (
-                    snp_split.iloc[:, -1] != prev_split.iloc[:, -1]
-                )
-                gl_params["float_formats"] = sm.float_dict_custom(gl_params)
-                sm.mysumstats.to_format(output_path, **gl_params)
-            elif step == "basic_check":
-                sm.mysumstats.basic_check(**gl_params)
-                if not if_eaf_float_format:
-                    sm.mysumstats.data["EAF"] = round(sm.mysumstats.data["EAF"].astype("float64"), 7)
-            elif step == "infer_build":
-                sm.mysumstats.infer_build()
-            elif step == "fill_data":
-                sm.fill_mlog10p(gl_params)
-                sm.mysumstats.fill_data(**gl_params)
-            elif step == "harmonize":
-                sm.mysumstats.harmonize(**gl_params)
-            elif step == "liftover":
-                sm.mysumstats.liftover(**gl_params)
-            elif step == "report_harmonization_summary":
-                summary = sm.mysumstats.lookup_status().to_string()
-                output_path = str(Path(workspace_path, ".".join([input_file_stem, "harmonization_summary.tsv"])))
-                with open(output_path, "w") as fp:
-                    fp.write(summary)
-            elif step == "report_min_pvalue":
-                nrows = params.get("nrows", 1)
-                df = sm.mysumstats.data.nlargest(nrows, "MLOG10P", keep="first").reset_index(drop=True)
-                snpid = df.at[0, "SNPID"]
-                mlog10p = df.at[0, "MLOG10P"]
-                output_path = str(Path(workspace_path, ".".join([input_file_stem, "nlargest.txt"])))
-                with open(output_path, "w") as fp:
-                    fp.write("input_file\tSNPID\tMLOG10P\n")
-                    fp.write(f"{input_file_name}\t{snpid}\t{mlog10p}\n")
-            elif step == "report_inflation_factors":
-                df = sm.mysumstats.data
-                CHISQ = df.Z**2
-                max_chisq = str(round(CHISQ.max(), 3))
-                mean_chisq = str(round(CHISQ.mean(), 3))
-                lambda_GC = str(round(CHISQ.median() / 0.4549, 3))
-
-                output_path = str(Path(workspace_path, ".".join([input_file_stem, "if.txt"])))
-                with open(output_path, "w") as fp:
-                    fp.write("input_file\tlambda_GC\tmean_chisq\tmax_chisq\n")
-                    fp.write(f"{input_file_name}\t{lambda_GC}\t{mean_chisq}\t{max_chisq}\n")
-            elif step == "sort_alphabetically":
-                n_cores = gl_params.get("n_cores", 1)
-                sm.order_alleles(n_cores=n_cores)
-                if not if_eaf_float_format:
-                    sm.mysumstats.data["EAF"] = round(sm.mysumstats.data["EAF"].astype("float64"), 7)
-            elif step == "write_pickle":
-                output_path = str(Path(workspace_path, ".".join([input_file_stem, "pkl"])))
-                gl.dump_pickle(sm.mysumstats, output_path, overwrite=params["overwrite"])
-            elif step in ["write_regenie", "write_ldsc", "write_metal", "write_tsv", "write_fastgwa", "write_parquet"]:
-                output_path = str(Path(workspace_path, input_file_stem))
-                gl_params["float_formats"] = sm.float_dict_custom(gl_params)
-                sm.mysumstats.to_format(output_path, **gl_params)
-            elif step == "write_vcf":
-                study_name = input_file_stem
-                sm.mysumstats.meta["gwaslab"]["study_name"] = study_name
-                sm.mysumstats.infer_build()
-                output_path = str(Path(workspace_path, input_file_stem))
-                gl_params["float_formats"] = sm.float_dict_custom(gl_params)
-                sm.mysumstats.to_format(output_path, **gl_params)
-            elif step == "write_same_input_format":
-                output_path = str(Path(workspace_path, input_file_stem))
-                gl_params["float_formats"] = sm.float_dict_custom(gl_params)
-                sm.mysumstats.to_format(output_path, fmt=input_file_format, **gl_params)
-            elif step == "check_ambiguous_snps":
-                df = sm.mysumstats.data
-
-                # True duplicated SNPs
-                dup_mask = df.duplicated(subset=["SNPID", "EAF", "BETA", "SE"], keep="first")
-                nr_dup_snps = dup_mask.sum()
-                if nr_dup_snps > 0:
-                    df = df.loc[~dup_mask].reset_index(drop=True)
-
-                # Ambiguous SNPs
-                snp_groups = df.groupby("SNPID")
-                ambiguous_mask = snp_groups[["EAF", "BETA", "SE"]].transform("nunique").gt(1).any(axis=1)
-                nr_ambiguous_snps = ambiguous_mask.sum()
-                if nr_ambiguous_snps > 0:
-                    df = df.loc[~ambiguous_mask].reset_index(drop=True)
-
-                # Multi-allelic SNPs
-                nr_multiallelic_snps = df.groupby(["CHR", "POS"])["SNPID"].transform("nunique").gt(1).sum()
-                nr_multiallelic_loci = df.groupby(["CHR", "POS"])["SNPID"].nunique().gt(1).sum()
-
-                sm.mysumstats.data = df
-
-                sm.mysumstats.log.write("Start to check ambiguous variants...")
-                sm.mysumstats.log.write(f" -Dropped duplicated SNPs: {nr_dup_snps}")
-                sm.mysumstats.log.write(f" -Dropped ambiguous SNPs: {nr_ambiguous_snps}")
-                sm.mysumstats.log.write(f" -Multi-allelic SNPs: {nr_multiallelic_snps}")
-                sm.mysumstats.log.write(f" -Multi-allelic positions: {nr_multiallelic_loci}")
-                sm.mysumstats.log.write(
-                    f" -Current Dataframe shape : {len(sm.mysumstats.data)} x {len(sm.mysumstats.data.columns)}"
+    def step_done(step, save_checkpoints):
+        if checkpoint and save_checkpoints and step in checkpoint.steps:
+            checkpoint.save(sm.mysumstats, step)
+            logger.info(f"Saved checkpoint after {step} step")
+        if step in cached_keys:
+            step_cache.put(cached_keys[step], sm.mysumstats)
+            logger.info(f"Cached the result of the {step} step")
+
+    def run_logged(step, *args, **kwargs):
+        logger.info(f"Started {step} step")
+        run_step(sm, step, *args, **kwargs)
+        logger.info(f"Finished {step} step")
+
+    def run_stage(stage, save_checkpoints):
+        """Write the outputs of consecutive output steps from the same table, see gwaspipe.fanout"""
+        encoding = SharedEncoding()
+        sinks = []
+        for step in stage:
+            params, gl_params = cm.step(step)
+            workspace_path = step_workspace(params)
+            if not params.get("run", False):
+                logger.info(f"Skipping {step} step")
+                continue
+            if step in PREPARED_OUTPUT_STEPS:
+                prepare_output_step(sm, step, input_file_stem)
+            args = (params, gl_params, workspace_path, input_file_name, input_file_stem, if_eaf_float_format)
+            key = output_log_path(step, gl_params, workspace_path, input_file_stem, sm.input_format)
+            sinks.append((key, partial(run_logged, step, *args, encoding=encoding, prepared=True)))
+        run_sinks(sinks, threads=fanout_threads)
+        for step in stage:
+            if cm.step(step)[0].get("run", False):
+                step_done(step, save_checkpoints)
+
+    def run_steps(steps, save_checkpoints=False):
+        for stage in group_output_steps(steps, cm.step):
+            if len(stage) > 1:
+                run_stage(stage, save_checkpoints)
+                continue
+            step = stage[0]
+            params, gl_params = cm.step(step)
+            workspace_path = step_workspace(params)
+
+            if params.get("run", False):
+                run_logged(
+                    step, params, gl_params, workspace_path, input_file_name, input_file_stem, if_eaf_float_format
                 )
-            elif step == "qq_manhattan_plots":
-                output_path = str(Path(workspace_path, ".".join([input_file_stem, "png"])))
-                cut = round(-np.log10(gl_params["sig_level"])) + params["dist"]
-                sm.mysumstats.plot_mqq(cut=cut, save=output_path, **gl_params)
-            logger.info(f"Finished {step} step")
-        else:
-            logger.info(f"Skipping {step} step")
+                step_done(step, save_checkpoints)
+            else:
+                logger.info(f"Skipping {step} step")
+
+    run_sequence = cm.run_sequence
+    if resume_step:
+        logger.info(f"Resuming after the {resume_step} step")
+        run_sequence = run_sequence[run_sequence.index(resume_step) + 1 :]
+    elif cached_step:
+        logger.info(f"Restored the cached result of the steps up to {cached_step}")
+        run_sequence = run_sequence[run_sequence.index(cached_step) + 1 :]
+    elif sm.streaming:
+        streamed, run_sequence = split_run_sequence(cm.run_sequence, cm.step)
+        logger.info(f"Streaming the input in chunks of {sm.chunk_size} rows through: {', '.join(streamed)}")
+        if run_sequence:
+            reason = " to remove the duplicates" if run_sequence[0] in WHOLE_TABLE_PARAMS else ""
+            logger.info(f"Materializing the whole table from the {run_sequence[0]} step{reason}")
+        for chunk_index in sm.iter_chunks(collect=bool(run_sequence)):
+            logger.info(f"Processing chunk {chunk_index}")
+            run_steps(streamed)
+
+    # Setup cache if needed, only when harmonize has not already run before the resumed or restored step
+    setup_harmonize_cache(cm, sm.mysumstats.log, run_sequence)
+
+    run_steps(run_sequence, save_checkpoints=True)
+    if checkpoint:
+        checkpoint.clear()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+"""
+Precompiled chain files for the liftover step.
+
+GWASLab lifts the positions with sumstats_liftover, which parses the chain file and
+builds its index of disjoint intervals at every call. The index is compiled here once
+per chain into sorted arrays of interval start, end, offset and strand, with the target
+chromosome of each interval, concatenated per source chromosome. They are stored as
+NumPy files in a directory next to the chain, memory-mapped by the later runs, and the
+positions of each chromosome are mapped with one searchsorted. The lifted positions,
+chromosomes and strands are the same as with sumstats_liftover.
+
+The compiled chain is rebuilt when the chain file, the parsing options or the version
+of sumstats_liftover change. The engine is used by liftover through liftover_engine,
+which runs the GWASLab liftover with the chain parsing and mapping replaced.
+"""
+
+import contextlib
+import importlib.metadata
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from gwaslab.hm import hm_liftover_v2
+from gwaslab.info.g_Log import Log
+from sumstats_liftover.liftover_df import _normalize_chrom_name, parse_chain_to_segments
+
+from gwaspipe.step_cache import _digest
+
+# Version of the layout of the compiled chains
+CACHE_FORMAT = 1
+
+CACHE_SUFFIX = "compiled"
+
+ARRAYS = ("start", "end", "offset", "reverse", "target")
+
+_engine_lock = threading.Lock()
+
+
+def chain_key(chain_path, **options):
+    """Return the key of the compiled chain, from the chain file, the parsing options and the versions."""
+    stat = os.stat(chain_path)
+    identity = (os.path.realpath(chain_path), stat.st_size, stat.st_mtime_ns)
+    version = importlib.metadata.version("sumstats-liftover")
+    return _digest(identity, sorted(options.items()), version, CACHE_FORMAT)
+
+
+def compile_chain(chain_path, **options):
+    """
+    Compile a chain file into interval arrays.
+
+    Parameters
+    ----------
+    chain_path : str
+        Path to the UCSC chain file
+    **options
+        Parsing options of sumstats_liftover parse_chain_to_segments
+
+    Returns
+    -------
+    tuple
+        Arrays by name, see ARRAYS, the source chromosomes with their slice of the arrays
+        and the target chromosome names
+    """
+    segments_by_chrom = parse_chain_to_segments(chain_path, **options)
+    parts, chroms, targets = [], {}, {}
+    first = 0
+    for chrom, segments in segments_by_chrom.items():
+        seg = segments.bseg.astype(np.int64)
+        reverse = segments.qrev[seg]
+        # The target position is offset + position, or offset - position on the reverse strand
+        offset = np.where(
+            reverse,
+            segments.qsize[seg] - 1 - segments.q0[seg] + segments.t0[seg],
+            segments.q0[seg] - segments.t0[seg],
+        )
+        target = np.array([targets.setdefault(name, len(targets)) for name in segments.qname[seg]])
+        parts.append((segments.bt0, segments.bt1, offset, reverse, target.astype(np.int32)))
+        chroms[chrom] = (first, first + len(seg))
+        first += len(seg)
+    arrays = {
+        name: np.concatenate([part[i] for part in parts]) if parts else np.empty(0) for i, name in enumerate(ARRAYS)
+    }
+    return arrays, chroms, list(targets)
+
+
+class CompiledChain:
+    """Interval arrays of a chain file, by source chromosome."""
+
+    def __init__(self, arrays, chroms, targets):
+        self.arrays = arrays
+        self.chroms = chroms
+        self.targets = np.array(targets, dtype=object)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map the compiled chain of a directory."""
+        with open(Path(path, "chroms.json")) as f:
+            index = json.load(f)
+        arrays = {name: np.load(Path(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        return cls(arrays, {chrom: tuple(bounds) for chrom, bounds in index["chroms"].items()}, index["targets"])
+
+    def save(self, path):
+        """Write the compiled chain in a directory, aside then moved in place."""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        for name in ARRAYS:
+            np.save(Path(tmp_path, f"{name}.npy"), self.arrays[name])
+        with open(Path(tmp_path, "chroms.json"), "w") as f:
+            json.dump({"chroms": self.chroms, "targets": self.targets.tolist()}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def lift(self, chrom, pos0):
+        """
+        Return the target chromosome, 0-based position and strand of positions of a chromosome.
+
+        Parameters
+        ----------
+        chrom : str
+            Source chromosome, as in the chain or normalized by sumstats_liftover
+        pos0 : np.ndarray
+            0-based positions
+
+        Returns
+        -------
+        tuple of np.ndarray
+            Index of the target chromosomes in targets, positions, both -1 where unmapped,
+            and whether the target is on the reverse strand
+        """
+        target = np.full(len(pos0), -1, dtype=np.int32)
+        out_pos = np.full(len(pos0), -1, dtype=np.int64)
+        reverse = np.zeros(len(pos0), dtype=bool)
+        if chrom not in self.chroms:
+            return target, out_pos, reverse
+        chrom_slice = slice(*self.chroms[chrom])
+        start, end = self.arrays["start"][chrom_slice], self.arrays["end"][chrom_slice]
+        j = np.searchsorted(start, pos0, side="right") - 1
+        ok = (j >= 0) & (pos0 < end[np.maximum(j, 0)])
+        j = j[ok]
+        reverse[ok] = self.arrays["reverse"][chrom_slice][j]
+        offset = self.arrays["offset"][chrom_slice][j]
+        target[ok] = self.arrays["target"][chrom_slice][j]
+        out_pos[ok] = np.where(reverse[ok], offset - pos0[ok], offset + pos0[ok])
+        return target, out_pos, reverse
+
+
+def _default_cache_path(chain_path, key):
+    return Path(f"{chain_path}.{key[:16]}.{CACHE_SUFFIX}")
+
+
+def open_chain(chain_path, cache_path=None, log=Log(), verbose=True, **options):
+    """
+    Return the compiled chain of a chain file, compiling it if it is not cached.
+
+    Parameters
+    ----------
+    chain_path : str
+        Path to the UCSC chain file
+    cache_path : str, optional
+        Directory of the compiled chains, next to the chain file by default
+    **options
+        Parsing options of sumstats_liftover parse_chain_to_segments
+
+    Returns
+    -------
+    CompiledChain
+        Compiled chain, memory-mapped when it is cached
+    """
+    key = chain_key(chain_path, **options)
+    if cache_path is None:
+        path = _default_cache_path(chain_path, key)
+    else:
+        path = Path(cache_path, f"{Path(chain_path).name}.{key[:16]}.{CACHE_SUFFIX}")
+    if Path(path, "chroms.json").exists():
+        log.write(f" -Using compiled chain: {path}", verbose=verbose)
+        return CompiledChain.load(path)
+    chain = CompiledChain(*compile_chain(chain_path, **options))
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        chain.save(path)
+        log.write(f" -Compiled chain written to {path}", verbose=verbose)
+    except OSError as e:
+        log.write(f" -Compiled chain not written to {path}: {e}", verbose=verbose)
+    return chain
+
+
+def liftover_df(
+    df,
+    chain_path,
+    chrom_col="CHR",
+    pos_col="POS",
+    out_chrom_col="CHR_LIFT",
+    out_pos_col="POS_LIFT",
+    out_strand_col="STRAND_LIFT",
+    one_based_input=True,
+    one_based_output=True,
+    remove_unmapped=False,
+    cache_path=None,
+    log=Log(),
+    verbose=True,
+    **options,
+):
+    """Lift the positions of a DataFrame with the compiled chain, in place of sumstats_liftover liftover_df."""
+    if len(df) == 0:
+        return df.copy()
+    chain = open_chain(chain_path, cache_path=cache_path, log=log, verbose=verbose, **options)
+    n = len(df)
+    target = np.empty(n, dtype=np.int32)
+    out_pos = np.empty(n, dtype=np.int64)
+    reverse = np.empty(n, dtype=bool)
+    pos0 = df[pos_col].to_numpy().astype(np.int64) - (1 if one_based_input else 0)
+    # The chromosomes are matched as strings, as in sumstats_liftover
+    chrom_codes, chroms = pd.factorize(df[chrom_col], use_na_sentinel=False)
+    for code, rows in pd.Series(chrom_codes).groupby(chrom_codes).indices.items():
+        chrom = _normalize_chrom_name(str(chroms[code]))
+        target[rows], out_pos[rows], reverse[rows] = chain.lift(chrom, pos0[rows])
+    if one_based_output:
+        out_pos[out_pos >= 0] += 1
+
+    # The unmapped variants have no chromosome and strand
+    out = df.copy()
+    out[out_chrom_col] = np.append(chain.targets, None)[target]
+    out[out_pos_col] = out_pos
+    out[out_strand_col] = np.where(target >= 0, np.where(reverse, "-", "+"), None).astype(object)
+    if remove_unmapped:
+        out = out[out[out_pos_col] != -1].copy()
+    return out
+
+
+@contextlib.contextmanager
+def liftover_engine(cache_path=None, log=Log(), verbose=True):
+    """
+    Run the GWASLab liftover with the chain files compiled once.
+
+    Parameters
+    ----------
+    cache_path : str, optional
+        Directory of the compiled chains, next to the chain files by default
+    """
+    with _engine_lock:
+        gwaslab_liftover_df = hm_liftover_v2.liftover_df
+        hm_liftover_v2.liftover_df = lambda df, **kwargs: liftover_df(
+            df, cache_path=cache_path, log=log, verbose=verbose, **kwargs
+        )
+        try:
+            yield
+        finally:
+            hm_liftover_v2.liftover_df = gwaslab_liftover_df
@@ -0,0 +1,151 @@
+"""
+Extraction of the independent loci.
+
+The significant variants are sorted by position once. With the default ``clump`` method,
+the loci are found by greedy distance clumping: on each chromosome, the remaining variant
+with the highest MLOG10P, the first by position on ties, is the lead of a new locus made
+of the remaining variants within windowsizekb of it, until no variant remains. The loop
+runs once per lead over the sorted arrays, the window of a lead is found by binary search.
+
+With the ``gwaslab`` method, a locus starts at each new chromosome and at each gap of more
+than windowsizekb between consecutive significant variants, as in GWASLab get_lead, and
+its lead variant is its variant with the highest MLOG10P. The clustering and the lead
+selection are array operations over all the chromosomes at once.
+"""
+
+import numpy as np
+import pandas as pd
+from gwaslab.info.g_Log import Log
+
+from gwaspipe.genes import chrom_numbers, significant
+
+DEFAULT_SIG_LEVEL = 5e-8
+
+DEFAULT_WINDOW_SIZE_KB = 500
+
+# Definitions of the loci, see the module documentation
+METHODS = ("clump", "gwaslab")
+
+# Columns of the lead variants written in the loci table, when present
+LEAD_COLUMNS = ("SNPID", "rsID", "EA", "NEA", "EAF", "BETA", "SE", "P", "MLOG10P", "GENE", "LOCATION")
+
+
+def _clump(chroms, positions, score, window):
+    """
+    Greedy distance clumping of variants sorted by position.
+
+    Returns the locus of each variant, numbered in the order of the leads, and the
+    index of the lead of each locus.
+    """
+    # Bounds of the chromosome of each variant
+    chrom_start = np.searchsorted(chroms, chroms, side="left")
+    chrom_stop = np.searchsorted(chroms, chroms, side="right")
+    # Candidates by decreasing score, the first by position on ties
+    candidates = np.lexsort((np.arange(len(positions)), -score))
+    locus = np.full(len(positions), -1, dtype=np.int64)
+    leads = []
+    for lead in candidates.tolist():
+        if locus[lead] >= 0:
+            continue
+        start, stop = chrom_start[lead], chrom_stop[lead]
+        lo = start + np.searchsorted(positions[start:stop], positions[lead] - window, side="left")
+        hi = start + np.searchsorted(positions[start:stop], positions[lead] + window, side="right")
+        members = locus[lo:hi]
+        members[members < 0] = len(leads)
+        leads.append(lead)
+    return locus, np.asarray(leads, dtype=np.int64)
+
+
+def _chain(chroms, positions, score, window):
+    """
+    Loci of the variants sorted by position as in GWASLab get_lead.
+
+    Returns the locus of each variant, numbered by position, and the index of the lead
+    of each locus.
+    """
+    # A locus starts at a new chromosome or after a gap larger than the window
+    breaks = np.ones(len(positions), dtype=bool)
+    breaks[1:] = (chroms[1:] != chroms[:-1]) | (np.diff(positions) > window)
+    locus = np.cumsum(breaks) - 1
+    # Highest score of each locus, the first by position on ties
+    by_score = np.lexsort((np.arange(len(positions)), -score, locus))
+    leads = by_score[np.flatnonzero(np.diff(locus[by_score], prepend=-1))]
+    return locus, leads
+
+
+def find_loci(
+    data,
+    chrom="CHR",
+    pos="POS",
+    sig_level=DEFAULT_SIG_LEVEL,
+    windowsizekb=DEFAULT_WINDOW_SIZE_KB,
+    method="clump",
+    log=Log(),
+    verbose=True,
+):
+    """
+    Return the loci of the significant variants with their lead variant.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Sumstats
+    sig_level : float, default=5e-8
+        Significance threshold
+    windowsizekb : int, default=500
+        Distance in kb from the lead variant of the variants of its locus with the ``clump``
+        method, largest gap between consecutive significant variants of a locus with ``gwaslab``
+    method : str, default="clump"
+        Definition of the loci, ``clump`` or ``gwaslab``, see the module documentation
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per locus sorted by the position of its lead variant: LOCUS, CHR, START and END,
+        the positions of its first and last significant variants, N_SIG, its number of significant
+        variants, POS and the LEAD_COLUMNS of its lead variant
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown loci method {method}, expected one of {', '.join(METHODS)}")
+    chroms = chrom_numbers(data[chrom])
+    positions = data[pos].to_numpy(dtype="float64", na_value=np.nan)
+    rows = np.flatnonzero(significant(data, sig_level) & ~np.isnan(chroms) & ~np.isnan(positions))
+    log.write(f" -Found {len(rows)} significant variants at {sig_level}", verbose=verbose)
+
+    # Significant variants sorted by position, the input order is kept on equal positions
+    order = np.lexsort((positions[rows], chroms[rows]))
+    rows = rows[order]
+    chroms, positions = chroms[rows], positions[rows]
+    if "MLOG10P" in data.columns:
+        score = data["MLOG10P"].to_numpy(dtype="float64", na_value=np.nan)[rows]
+    else:
+        score = -data["P"].to_numpy(dtype="float64", na_value=np.nan)[rows]
+
+    find = _clump if method == "clump" else _chain
+    locus, leads = find(chroms, positions, score, windowsizekb * 1000)
+    # Loci numbered by the position of their lead variant
+    by_position = np.argsort(leads, kind="stable")
+    leads = leads[by_position]
+    number = np.empty(len(leads), dtype=np.int64)
+    number[by_position] = np.arange(len(leads))
+    locus = number[locus]
+    log.write(f" -Identified {len(leads)} loci", verbose=verbose)
+
+    # First and last significant variant of each locus
+    members = np.lexsort((np.arange(len(rows)), locus))
+    starts = np.flatnonzero(np.diff(locus[members], prepend=-1))
+    stops = np.append(starts[1:], len(rows))[: len(starts)]
+    loci = pd.DataFrame(
+        {
+            "LOCUS": np.arange(1, len(leads) + 1),
+            "CHR": data[chrom].array[rows[leads]],
+            "START": positions[members[starts]].astype(np.int64),
+            "END": positions[members[stops - 1]].astype(np.int64),
+            "N_SIG": stops - starts,
+            "POS": positions[leads].astype(np.int64),
+        }
+    )
+    for column in LEAD_COLUMNS:
+        if column in data.columns:
+            loci[column] = data[column].array[rows[leads]]
+    return loci
@@ -0,0 +1,400 @@
+"""
+Vectorized indel normalization for the normalize stage of basic_check.
+
+GWASLab normalizes the alleles by trimming the bases shared by the end and then by
+the start of the two alleles, one base of all the variants per iteration, for as many
+iterations as the longest allele. The trimming is computed here once per distinct
+pair of alleles, from the lengths of their common suffix and prefix, and applied to
+the variants as array operations. It gives the same alleles, positions and digit 5 of
+STATUS as GWASLab, including its limit on the number of trimmed bases, and the chunks
+where all the variants are already normalized take the same fast path.
+
+With a reference sequence, the trimmed indels are also left-aligned: the indel is
+shifted towards the start of the chromosome while the base before it is the last
+base of the inserted or deleted sequence, as in VCF normalization. The flanking
+reference bases of the indels of a chromosome are fetched as one array from the
+memory-mapped FASTA and the chromosomes are aligned on threads. GWASLab does not
+left-align, so this changes the position of the indels in repeats.
+
+The engine is used by basic_check through normalize_engine, which runs the GWASLab
+normalization with the trimming replaced.
+"""
+
+import contextlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from gwaslab import g_Sumstats
+from gwaslab.hm.hm_harmonize_sumstats import PADDING_VALUE
+from gwaslab.qc import qc_fix_sumstats
+
+from gwaspipe.fasta import _CODES, IndexedFasta
+
+# Digit of STATUS set by the normalization, as a power of ten from the right of the 7 digits
+STATUS_POWER = 100
+
+# Bases compared at once when looking for the common prefix and suffix of the alleles
+PREFIX_WIDTH = 16
+
+# Initial number of flanking bases fetched to left-align an indel
+FLANK_WIDTH = 16
+
+# Bases of the GWASLab base codes
+_BASES = np.full(256, ord("N"), dtype=np.uint8)
+_BASES[[2, 3, 4, 5, 6]] = list(b"ATCGN")
+
+# Contig names of the chromosomes GWASLab numbers
+_CONTIG_NAMES = {23: ("X",), 24: ("Y",), 25: ("MT", "M")}
+
+_engine_lock = threading.Lock()
+
+
+def _common_prefix(first, second, width):
+    """Return the length of the common prefix of each pair of strings."""
+    first_bytes = np.array(first, dtype=f"S{width}").view(np.uint8).reshape(len(first), width)
+    second_bytes = np.array(second, dtype=f"S{width}").view(np.uint8).reshape(len(second), width)
+    equal = first_bytes == second_bytes
+    lengths = np.where(equal.all(axis=1), width, equal.argmin(axis=1))
+    # The prefixes as long as the compared bases are measured in full
+    for i in np.flatnonzero(lengths == width):
+        lengths[i] = len(os.path.commonprefix([first[i], second[i]]))
+    return lengths
+
+
+def trim_pairs(nea, ea):
+    """
+    Return the lengths of the distinct allele pairs and of their common suffix and prefix.
+
+    Parameters
+    ----------
+    nea, ea : list of str
+        Non-effect and effect alleles of the distinct pairs
+
+    Returns
+    -------
+    tuple of np.ndarray
+        Lengths of the non-effect and effect alleles, of their common suffix and of their common prefix
+    """
+    nea_length = np.fromiter(map(len, nea), dtype=np.int64, count=len(nea))
+    ea_length = np.fromiter(map(len, ea), dtype=np.int64, count=len(ea))
+    shortest = np.minimum(nea_length, ea_length)
+    width = max(1, min(PREFIX_WIDTH, int(shortest.max(initial=0))))
+    nea = [a.encode("latin-1", "replace") for a in nea]
+    ea = [a.encode("latin-1", "replace") for a in ea]
+    suffix = _common_prefix([a[::-1] for a in nea], [a[::-1] for a in ea], width)
+    prefix = _common_prefix(nea, ea, width)
+    return nea_length, ea_length, np.minimum(suffix, shortest), np.minimum(prefix, shortest)
+
+
+def _change_digit(status, rows, before, after):
+    digit = (status // STATUS_POWER) % 10
+    return np.where(rows & (digit == before), status + (after - before) * STATUS_POWER, status)
+
+
+def trim(nea_length, ea_length, suffix, prefix, same, chunks):
+    """
+    Return the bases trimmed from the end and the start of the alleles of the variants, as GWASLab does.
+
+    GWASLab trims at most one base less than the longest allele of the chunk from each
+    side, which only limits the pairs of identical alleles, and does not trim the
+    chunks where all the variants are already normalized.
+
+    Parameters
+    ----------
+    nea_length, ea_length, suffix, prefix : np.ndarray
+        Lengths of the alleles and of their common suffix and prefix, see trim_pairs
+    same : np.ndarray
+        Whether the two alleles are identical
+    chunks : np.ndarray
+        Chunk of each variant
+
+    Returns
+    -------
+    tuple of np.ndarray
+        Bases trimmed from the end and from the start, whether each chunk was trimmed
+    """
+    normalized = ((nea_length == 1) | (ea_length == 1)) & ~same
+    n_chunks = int(chunks.max(initial=-1)) + 1
+    trimmed_chunks = np.ones(n_chunks, dtype=bool)
+    np.logical_and.at(trimmed_chunks, chunks, normalized)
+    trimmed_chunks = ~trimmed_chunks
+
+    def chunk_limit(lengths):
+        longest = np.zeros(n_chunks, dtype=np.int64)
+        np.maximum.at(longest, chunks, lengths)
+        return np.maximum(longest - 1, 0)[chunks]
+
+    shortest = np.minimum(nea_length, ea_length)
+    limit = np.where(trimmed_chunks[chunks], chunk_limit(np.maximum(nea_length, ea_length)), 0)
+    end = np.where(same, nea_length, np.minimum(suffix, shortest - 1)).clip(0, None)
+    end = np.minimum(end, limit)
+
+    nea_length, ea_length, shortest = nea_length - end, ea_length - end, shortest - end
+    limit = np.where(trimmed_chunks[chunks], chunk_limit(np.maximum(nea_length, ea_length)), 0)
+    start = np.where(same, nea_length, np.minimum(np.minimum(prefix, shortest), shortest - 1)).clip(0, None)
+    start = np.minimum(start, limit)
+    return end, start, trimmed_chunks
+
+
+def _contig(fasta, chrom):
+    """Return the FASTA contig of a GWASLab chromosome, None if it is missing."""
+    names = _CONTIG_NAMES.get(chrom, (str(chrom),))
+    for name in names:
+        for prefix in ("", "chr", "Chr", "CHR"):
+            if f"{prefix}{name}" in fasta.contigs:
+                return f"{prefix}{name}"
+    return None
+
+
+def left_align(fasta, name, pos, long_codes, lengths):
+    """
+    Return the number of bases each indel of a contig shifts to the left.
+
+    Parameters
+    ----------
+    fasta : IndexedFasta
+        Reference sequence
+    name : str
+        Contig of the indels
+    pos : np.ndarray
+        1-based position of the anchor base of each indel
+    long_codes : np.ndarray
+        Base codes of the longer allele of each indel, anchor base first, padded with PADDING_VALUE
+    lengths : np.ndarray
+        Number of inserted or deleted bases of each indel
+
+    Returns
+    -------
+    np.ndarray
+        Shift of each indel, 0 where the anchor base is not the reference base
+    """
+    shift = np.zeros(len(pos), dtype=np.int64)
+    rows = np.arange(len(pos))
+    width = FLANK_WIDTH
+    while len(rows):
+        # The flanking bases end with the anchor base and are followed by the indel sequence
+        flank = fasta.fetch(name, pos[rows] - width, width)
+        if width == FLANK_WIDTH:
+            anchored = flank[:, -1] == long_codes[rows, 0]
+            rows, flank = rows[anchored], flank[anchored]
+        bases = np.concatenate([flank, long_codes[rows, 1:]], axis=1)
+        before = width - 1 - np.arange(width)
+        after = before + lengths[rows, np.newaxis]
+        shifted = np.take_along_axis(bases, np.broadcast_to(before, after.shape), axis=1)
+        matches = (shifted == np.take_along_axis(bases, after, axis=1)) & (shifted >= 2) & (shifted <= 5)
+        shift[rows] = np.cumprod(matches, axis=1).sum(axis=1)
+        # The indels shifted through the whole flank are aligned again with a wider flank
+        rows = rows[shift[rows] == width]
+        width *= 4
+    # The anchor base stays on the contig
+    return np.minimum(shift, pos - 1)
+
+
+def _left_align_alleles(fasta, chrom, pos, nea, ea, threads=1):
+    """Return the positions and alleles of the indels left-aligned against the reference, and the shifted rows."""
+    nea_length = np.fromiter(map(len, nea), dtype=np.int64, count=len(nea))
+    ea_length = np.fromiter(map(len, ea), dtype=np.int64, count=len(ea))
+    long_allele = np.where(ea_length > nea_length, ea, nea)
+    indel = (np.minimum(nea_length, ea_length) == 1) & (nea_length != ea_length)
+    indel &= np.fromiter((a[:1] == b[:1] for a, b in zip(nea, ea)), dtype=bool, count=len(nea))
+    indel_rows = np.flatnonzero(indel)
+    groups = list(pd.Series(chrom[indel_rows]).groupby(chrom[indel_rows], sort=False).indices.items())
+
+    def align(group):
+        value, rows = group
+        rows = indel_rows[rows]
+        name = _contig(fasta, value)
+        if name is None:
+            return rows[:0], rows[:0], []
+        alleles = [a.encode("latin-1", "replace") for a in long_allele[rows]]
+        width = max(map(len, alleles))
+        codes = np.array(alleles, dtype=f"S{width}").view(np.uint8).reshape(len(rows), width)
+        codes = np.where(codes == 0, PADDING_VALUE, _CODES[codes])
+        lengths = np.abs(nea_length - ea_length)[rows]
+        shift = left_align(fasta, name, pos[rows], codes, lengths)
+        rows, shift, lengths = rows[shift > 0], shift[shift > 0], lengths[shift > 0]
+        if len(rows) == 0:
+            return rows, shift, []
+        # The shifted allele is the reference from the new anchor base, followed by the start of the
+        # indel sequence when it shifts by fewer bases than its length
+        reference = fasta.fetch(name, pos[rows] - 1 - shift, int(np.minimum(shift, lengths).max()) + 1)
+        shifted_alleles = []
+        for row, bases, j, k in zip(rows, reference, shift, lengths):
+            sequence = long_allele[row][1 : max(k - j, 0) + 1]
+            shifted_alleles.append(_BASES[bases[: min(j, k) + 1]].tobytes().decode() + sequence)
+        return rows, shift, shifted_alleles
+
+    pos, nea, ea = pos.copy(), nea.copy(), ea.copy()
+    shifted_rows = []
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        for rows, shift, shifted_alleles in executor.map(align, groups):
+            for row, allele in zip(rows, shifted_alleles):
+                if ea_length[row] > nea_length[row]:
+                    ea[row], nea[row] = allele, allele[0]
+                else:
+                    nea[row], ea[row] = allele, allele[0]
+            pos[rows] -= shift
+            shifted_rows.append(rows)
+    shifted = np.concatenate(shifted_rows) if shifted_rows else np.array([], dtype=np.int64)
+    return pos, nea, ea, shifted
+
+
+def left_align_sumstats(sumstats_obj, fasta, threads=1, log=None, verbose=True):
+    """
+    Left-align the indels of the sumstats against the reference sequence.
+
+    Parameters
+    ----------
+    sumstats_obj : gl.Sumstats
+        Sumstats with the indels trimmed
+    fasta : IndexedFasta
+        Reference sequence
+    threads : int, default=1
+        Number of threads left-aligning the chromosomes
+
+    Returns
+    -------
+    pd.DataFrame
+        Sumstats with the positions and alleles of the shifted indels updated
+    """
+    data = sumstats_obj.data
+    log.write(f" -Left-aligning the indels against {fasta.path}", verbose=verbose)
+    rows = np.flatnonzero(
+        data["EA"].notna().to_numpy() & data["NEA"].notna().to_numpy() & data["POS"].notna().to_numpy()
+    )
+    nea = data["NEA"].to_numpy(dtype=object)
+    ea = data["EA"].to_numpy(dtype=object)
+    pos, new_nea, new_ea, shifted = _left_align_alleles(
+        fasta,
+        data["CHR"].to_numpy(dtype=object)[rows],
+        data["POS"].to_numpy(dtype=np.int64, na_value=0)[rows],
+        nea[rows],
+        ea[rows],
+        threads=threads,
+    )
+    log.write(f" -Left-aligned {len(shifted)} indels", verbose=verbose)
+    if len(shifted) == 0:
+        return data
+    shifted_rows = rows[shifted]
+    data.iloc[shifted_rows, data.columns.get_loc("POS")] = pos[shifted]
+    for column, values in (("NEA", new_nea), ("EA", new_ea)):
+        if isinstance(data[column].dtype, pd.CategoricalDtype):
+            data[column] = data[column].cat.add_categories(
+                pd.Index(values[shifted]).unique().difference(data[column].cat.categories)
+            )
+        data.iloc[shifted_rows, data.columns.get_loc(column)] = values[shifted]
+    return data
+
+
+def normalize_alleles(
+    insumstats,
+    pos="POS",
+    nea="NEA",
+    ea="EA",
+    status="STATUS",
+    chunk=3000000,
+    log=None,
+    verbose=False,
+):
+    """
+    Normalize the indels, in place of GWASLab fastnormalizeallele.
+
+    Parameters
+    ----------
+    insumstats : pd.DataFrame
+        Position, alleles and STATUS of the variants to normalize
+    chunk : int, default=3000000
+        Number of variants GWASLab normalizes together
+
+    Returns
+    -------
+    tuple
+        Normalized variants and the index of the modified ones
+    """
+    log.write(f" -Number of variants to check:{len(insumstats)}", verbose=verbose)
+    pairs, (nea_uniques, ea_uniques) = _factorize_pairs(insumstats[nea], insumstats[ea])
+    nea_length, ea_length, suffix, prefix = (values[pairs] for values in trim_pairs(nea_uniques, ea_uniques))
+    same = (nea_uniques == ea_uniques)[pairs]
+    chunks = np.arange(len(insumstats)) // chunk
+    end, start, trimmed_chunks = trim(nea_length, ea_length, suffix, prefix, same, chunks)
+    log.write(f" -Trimming {len(nea_uniques)} distinct allele pairs", verbose=verbose)
+
+    rows = np.flatnonzero((end > 0) | (start > 0))
+    nea_values = nea_uniques[pairs].astype(object)
+    ea_values = ea_uniques[pairs].astype(object)
+    for values, lengths in ((nea_values, nea_length), (ea_values, ea_length)):
+        values[rows] = [a[s : n - e] for a, s, n, e in zip(values[rows], start[rows], lengths[rows], end[rows])]
+    pos_values = insumstats[pos].to_numpy(dtype=np.int64) + start
+
+    status_values = insumstats[status].to_numpy(dtype=np.int64)
+    nea_length, ea_length = nea_length - end - start, ea_length - end - start
+    normalized = ((nea_length == 1) | (ea_length == 1)) & ~same
+    status_values = _change_digit(status_values, normalized, 4, 0)
+    status_values = _change_digit(status_values, same, 4, 3)
+    status_values = _change_digit(status_values, normalized & trimmed_chunks[chunks], 5, 3)
+
+    normalized_pd = pd.DataFrame(
+        {
+            pos: pd.array(pos_values, dtype="Int64"),
+            nea: pd.array(nea_values, dtype="string"),
+            ea: pd.array(ea_values, dtype="string"),
+            status: pd.Series(status_values).astype(insumstats[status].dtype).array,
+        },
+        index=insumstats.index,
+    )
+    return normalized_pd, insumstats.index[rows].values
+
+
+def _factorize_pairs(nea, ea):
+    """Return the distinct pair of each variant and the alleles of the distinct pairs."""
+    nea_codes, nea_uniques = pd.factorize(nea)
+    ea_codes, ea_uniques = pd.factorize(ea)
+    pairs, pair_uniques = pd.factorize(nea_codes.astype(np.int64) * max(len(ea_uniques), 1) + ea_codes)
+    nea_uniques = np.asarray(nea_uniques, dtype=object)[pair_uniques // max(len(ea_uniques), 1)]
+    ea_uniques = np.asarray(ea_uniques, dtype=object)[pair_uniques % max(len(ea_uniques), 1)]
+    return pairs, (nea_uniques.astype(str), ea_uniques.astype(str))
+
+
+@contextlib.contextmanager
+def normalize_engine(threads=1, ref_seq=None):
+    """
+    Run the GWASLab normalization of basic_check with the vectorized trimming.
+
+    Parameters
+    ----------
+    threads : int, default=1
+        Number of threads left-aligning the chromosomes
+    ref_seq : str, optional
+        Uncompressed FASTA with a ``.fai`` index the indels are left-aligned against,
+        see gwaspipe.fasta.unsupported_reason
+    """
+    fasta = IndexedFasta(ref_seq) if ref_seq is not None else None
+    with _engine_lock:
+        parallelize_normalize = g_Sumstats._parallelize_normalize_allele
+        fast_normalize = qc_fix_sumstats.fastnormalizeallele
+
+        def normalize(sumstats_obj, **kwargs):
+            qc_fix_sumstats.fastnormalizeallele = normalize_alleles
+            try:
+                # The variants are trimmed at once in this process
+                data = parallelize_normalize(sumstats_obj, **{**kwargs, "threads": 1})
+            finally:
+                qc_fix_sumstats.fastnormalizeallele = fast_normalize
+            if fasta is not None:
+                data = left_align_sumstats(
+                    sumstats_obj,
+                    fasta,
+                    threads=threads,
+                    log=kwargs.get("log", sumstats_obj.log),
+                    verbose=kwargs.get("verbose", True),
+                )
+            return data
+
+        g_Sumstats._parallelize_normalize_allele = normalize
+        try:
+            yield
+        finally:
+            g_Sumstats._parallelize_normalize_allele = parallelize_normalize
@@ -6,8 +6,11 @@ data according to custom sorting rules and updating statistics accordingly.
 """
 
 from .constants import ORDER_MAPPING, TRANSLATE_TABLE_ORDER
+from .encoding import encode_alleles, pad_codes, swap_mask_from_codes
 from .main import order_alleles
-from .snpid import build_snpids, parallelbuildsnpid
+from .pairs import PAIR_CACHE, AllelePairCache, allele_pairs_should_swap, factorize_allele_pairs
+from .shared import shared_swap_mask
+from .snpid import build_previous_ids, build_snpids, join_columns, parallelbuildsnpid
 from .sorting import custom_alleles_sort
 from .vectorized import (
     _orderalleles_status_vec,
@@ -22,9 +25,19 @@ __all__ = [
     "orderalleles_status",
     "parallelorderalleles_status",
     "build_snpids",
+    "build_previous_ids",
     "parallelbuildsnpid",
+    "join_columns",
     "order_alleles",
     "_orderalleles_status_vec",
+    "encode_alleles",
+    "pad_codes",
+    "swap_mask_from_codes",
+    "shared_swap_mask",
+    "AllelePairCache",
+    "PAIR_CACHE",
+    "allele_pairs_should_swap",
+    "factorize_allele_pairs",
     "ORDER_MAPPING",
     "TRANSLATE_TABLE_ORDER",
 ]
@@ -0,0 +1,93 @@
+"""
+Byte-level allele encoding for the vectorized allele ordering.
+
+Alleles are translated with TRANSLATE_TABLE_ORDER and stored as one byte per
+character in a fixed-width ``S`` buffer, viewed as a uint8 matrix padded with zeros.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .constants import TRANSLATE_TABLE_ORDER
+
+
+def encode_alleles(alleles, width=None):
+    """
+    Encode alleles as a uint8 matrix in custom allele order.
+
+    Parameters
+    ----------
+    alleles : pd.Series
+        Alleles to encode, missing values are encoded as empty alleles
+    width : int, optional
+        Number of columns of the matrix, defaults to the longest allele
+
+    Returns
+    -------
+    tuple
+        ``(codes, lengths)``: the uint8 matrix with one row per allele, zero padded on
+        the right, and the length of each allele
+    """
+    if isinstance(getattr(alleles, "dtype", None), pd.CategoricalDtype):
+        # Encode the categories once and gather them through the category codes
+        cat_codes, cat_lengths = encode_alleles(alleles.cat.categories.to_series(), width)
+        # Missing values have code -1 and pick the trailing empty allele
+        cat_codes = np.vstack([cat_codes, np.zeros((1, cat_codes.shape[1]), dtype=np.uint8)])
+        cat_lengths = np.append(cat_lengths, 0)
+        index = alleles.cat.codes.to_numpy()
+        return cat_codes[index], cat_lengths[index]
+
+    translated = pd.Series(alleles, dtype=object).fillna("").str.translate(TRANSLATE_TABLE_ORDER)
+    lengths = translated.str.len().to_numpy(dtype=np.int64)
+    if width is None:
+        width = int(lengths.max()) if len(lengths) else 0
+    width = max(width, 1)
+
+    # Characters outside latin-1 cannot be stored in one byte and sort as "?"
+    raw = np.asarray(translated.str.encode("latin-1", errors="replace").to_numpy(), dtype=f"S{width}")
+    return raw.view(np.uint8).reshape(len(raw), width), lengths
+
+
+def pad_codes(codes, width):
+    """Pad an encoded allele matrix with zeros on the right up to width columns."""
+    if codes.shape[1] >= width:
+        return codes
+    return np.pad(codes, ((0, 0), (0, width - codes.shape[1])))
+
+
+def swap_mask_from_codes(ea_codes, ea_len, nea_codes, nea_len):
+    """
+    Custom ordering of encoded allele pairs, see custom_alleles_sort.
+
+    Parameters
+    ----------
+    ea_codes : np.ndarray
+        Encoded effect alleles, see encode_alleles
+    ea_len : np.ndarray
+        Length of the effect alleles
+    nea_codes : np.ndarray
+        Encoded non-effect alleles
+    nea_len : np.ndarray
+        Length of the non-effect alleles
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True where NEA sorts before EA and the alleles should be swapped
+    """
+    # First condition: swap if NEA is longer than EA
+    should_swap = nea_len > ea_len
+
+    # When NEA and EA have the same length, check if the first different value is smaller
+    equal_length = nea_len == ea_len
+    if equal_length.any():
+        width = max(ea_codes.shape[1], nea_codes.shape[1])
+        ea_equal = pad_codes(ea_codes[equal_length], width)
+        nea_equal = pad_codes(nea_codes[equal_length], width)
+
+        first_difference = np.argmax(nea_equal != ea_equal, axis=1)
+        ea_different_val = np.take_along_axis(ea_equal, first_difference[:, None], axis=1)
+        nea_different_val = np.take_along_axis(nea_equal, first_difference[:, None], axis=1)
+        should_swap[equal_length] = (nea_different_val < ea_different_val).flatten()
+
+    return should_swap
@@ -0,0 +1,135 @@
+"""
+Allele-pair ordering table.
+
+Almost all the rows of a summary statistics table come from a few dozen distinct
+(EA, NEA) pairs, so the swap decision is taken once per distinct pair and broadcast
+back to the rows through the pair codes.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Maximum number of allele pairs kept in the cache
+PAIR_CACHE_SIZE = 65536
+
+
+class AllelePairCache:
+    """Bounded LRU cache of the swap decisions for (EA, NEA) allele pairs."""
+
+    def __init__(self, maxsize=PAIR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._table = OrderedDict()
+
+    def __len__(self):
+        return len(self._table)
+
+    def clear(self):
+        self._table.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def should_swap(self, ea_alleles, nea_alleles, decide):
+        """
+        Return the swap decision for each allele pair.
+
+        Parameters
+        ----------
+        ea_alleles : np.ndarray
+            Effect allele of each distinct pair
+        nea_alleles : np.ndarray
+            Non-effect allele of each distinct pair
+        decide : callable
+            Function taking the EA and NEA pd.Series of the pairs missing from the cache
+            and returning their boolean swap decisions
+
+        Returns
+        -------
+        np.ndarray
+            Boolean array, True where the pair should be swapped
+        """
+        keys = list(zip(ea_alleles, nea_alleles))
+        decisions = np.zeros(len(keys), dtype=bool)
+        missing = []
+        for i, key in enumerate(keys):
+            decision = self._table.get(key)
+            if decision is None:
+                missing.append(i)
+            else:
+                self._table.move_to_end(key)
+                decisions[i] = decision
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            decisions[missing] = decide(pd.Series(ea_alleles[missing]), pd.Series(nea_alleles[missing]))
+            for i in missing:
+                self._table[keys[i]] = bool(decisions[i])
+            while len(self._table) > self.maxsize:
+                self._table.popitem(last=False)
+
+        return decisions
+
+
+PAIR_CACHE = AllelePairCache()
+
+
+def factorize_allele_pairs(ea_alleles, nea_alleles):
+    """
+    Encode the (EA, NEA) pairs as integer codes.
+
+    Parameters
+    ----------
+    ea_alleles : pd.Series
+        Effect alleles
+    nea_alleles : pd.Series
+        Non-effect alleles
+
+    Returns
+    -------
+    tuple
+        ``(pair_codes, ea_pairs, nea_pairs)``: the code of the pair of each row, -1 if
+        an allele is missing, and the effect and non-effect alleles of each distinct pair
+    """
+    ea_codes, ea_uniques = pd.factorize(ea_alleles)
+    nea_codes, nea_uniques = pd.factorize(nea_alleles)
+    width = max(len(nea_uniques), 1)
+
+    valid = (ea_codes >= 0) & (nea_codes >= 0)
+    pair_codes = np.full(len(ea_codes), -1, dtype=np.intp)
+    pair_codes[valid], pair_keys = pd.factorize(ea_codes[valid].astype(np.int64) * width + nea_codes[valid])
+
+    ea_pairs = np.asarray(ea_uniques, dtype=object)[pair_keys // width]
+    nea_pairs = np.asarray(nea_uniques, dtype=object)[pair_keys % width]
+    return pair_codes, ea_pairs, nea_pairs
+
+
+def allele_pairs_should_swap(ea_alleles, nea_alleles, decide, cache=PAIR_CACHE):
+    """
+    Decide the swap of each row once per distinct allele pair.
+
+    Parameters
+    ----------
+    ea_alleles : pd.Series
+        Effect alleles
+    nea_alleles : pd.Series
+        Non-effect alleles
+    decide : callable
+        Swap decision for the pairs missing from the cache, see AllelePairCache.should_swap
+    cache : AllelePairCache
+        Cache of the swap decisions, shared across calls by default
+
+    Returns
+    -------
+    tuple
+        ``(should_swap, n_pairs)``: boolean array with the decision for each row, False
+        where an allele is missing, and the number of distinct pairs
+    """
+    pair_codes, ea_pairs, nea_pairs = factorize_allele_pairs(ea_alleles, nea_alleles)
+    decisions = cache.should_swap(ea_pairs, nea_pairs, decide)
+    # Rows with a missing allele have code -1 and pick the trailing False
+    should_swap = np.append(decisions, False)[pair_codes]
+    return should_swap, len(ea_pairs)
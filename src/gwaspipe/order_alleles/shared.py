@@ -0,0 +1,147 @@
+"""
+Shared-memory parallel engine for the allele ordering.
+
+The integer codes of the EA/NEA alleles are copied once into shared memory and each
+worker keys the allele pairs of an index range in place. The swap is decided once per
+distinct pair in the parent, through the AllelePairCache, and the workers write the
+decisions of their rows into a shared boolean buffer, so no DataFrame partition is
+pickled or concatenated.
+"""
+
+from contextlib import ExitStack
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .pairs import PAIR_CACHE
+
+
+def _share(array, stack):
+    """
+    Copy an array into a new shared memory block released when the stack closes.
+
+    Returns the spec to attach to the block and the shared array, which must be
+    deleted before the stack closes.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    stack.callback(shm.unlink)
+    stack.callback(shm.close)
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+    return (shm.name, array.shape, array.dtype.str), shared
+
+
+def _attach(spec):
+    """Attach to a shared memory block created by _share."""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _pair_keys_range(specs, width, start, stop):
+    """Worker: write the pair keys of the rows in [start, stop) and return their distinct keys."""
+    shms, arrays = zip(*(_attach(spec) for spec in specs))
+    ea_codes, nea_codes, keys = arrays
+    keys[start:stop] = ea_codes[start:stop].astype(np.int64) * width + nea_codes[start:stop]
+    distinct = np.unique(keys[start:stop])
+    del ea_codes, nea_codes, keys, arrays
+    for shm in shms:
+        shm.close()
+    return distinct
+
+
+def _broadcast_range(specs, pair_keys, decisions, start, stop):
+    """Worker: write the swap decision of the rows in [start, stop) from the decisions of the distinct pairs."""
+    shms, arrays = zip(*(_attach(spec) for spec in specs))
+    keys, out = arrays
+    out[start:stop] = decisions[np.searchsorted(pair_keys, keys[start:stop])]
+    del keys, out, arrays
+    for shm in shms:
+        shm.close()
+
+
+def _allele_codes(alleles):
+    """
+    Return the integer code of each allele and the distinct alleles, missing alleles
+    are coded as a trailing None.
+    """
+    if isinstance(getattr(alleles, "dtype", None), pd.CategoricalDtype):
+        codes, uniques = alleles.cat.codes.to_numpy(), alleles.cat.categories
+    else:
+        codes, uniques = pd.factorize(alleles)
+    uniques = np.append(np.asarray(uniques, dtype=object), None)
+    return np.where(codes < 0, len(uniques) - 1, codes).astype(np.int32), uniques
+
+
+def shared_swap_mask(ea_alleles, nea_alleles, n_cores=1, cache=PAIR_CACHE):
+    """
+    Compute the swap mask of each row on n_cores processes through shared memory.
+
+    The allele codes, free for categorical alleles, are copied once into shared memory.
+    In a first pass, each worker keys the (EA, NEA) pairs of its index range and returns
+    its distinct pairs. The swap of each distinct pair is decided once in the parent,
+    through the cache, and in a second pass each worker writes the decisions of its rows
+    into a shared boolean buffer.
+
+    Parameters
+    ----------
+    ea_alleles : pd.Series
+        Effect alleles
+    nea_alleles : pd.Series
+        Non-effect alleles
+    n_cores : int, default=1
+        Number of worker processes, the mask is computed in process if 1
+    cache : AllelePairCache
+        Cache of the swap decisions, shared across calls by default
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True where NEA sorts before EA and the alleles should be swapped, False
+        where an allele is missing as in allele_pairs_should_swap
+    """
+    # Imported here, the vectorized engine imports this module
+    from .vectorized import _should_swap_vec
+
+    ea_codes, ea_uniques = _allele_codes(ea_alleles)
+    nea_codes, nea_uniques = _allele_codes(nea_alleles)
+    n_rows = len(ea_codes)
+    width = len(nea_uniques)
+
+    def decide(pair_keys):
+        ea_pairs, nea_pairs = pair_keys // width, pair_keys % width
+        # Pairs with a missing allele, coded last, are not swapped
+        complete = (ea_pairs < len(ea_uniques) - 1) & (nea_pairs < width - 1)
+        decisions = np.zeros(len(pair_keys), dtype=bool)
+        decisions[complete] = cache.should_swap(
+            ea_uniques[ea_pairs[complete]], nea_uniques[nea_pairs[complete]], _should_swap_vec
+        )
+        return decisions
+
+    if n_cores <= 1 or n_rows < n_cores:
+        pair_keys, inverse = np.unique(ea_codes.astype(np.int64) * width + nea_codes, return_inverse=True)
+        return decide(pair_keys)[inverse]
+
+    with ExitStack() as stack:
+        ea_spec, _ = _share(ea_codes, stack)
+        nea_spec, _ = _share(nea_codes, stack)
+        keys_spec, _ = _share(np.zeros(n_rows, dtype=np.int64), stack)
+        out_spec, out = _share(np.zeros(n_rows, dtype=bool), stack)
+        del ea_codes, nea_codes, _
+
+        bounds = np.linspace(0, n_rows, n_cores + 1, dtype=np.int64)
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+        with Pool(n_cores) as pool:
+            distinct = pool.starmap(
+                _pair_keys_range, [((ea_spec, nea_spec, keys_spec), width, start, stop) for start, stop in ranges]
+            )
+            pair_keys = np.unique(np.concatenate(distinct))
+            decisions = decide(pair_keys)
+            pool.starmap(
+                _broadcast_range, [((keys_spec, out_spec), pair_keys, decisions, start, stop) for start, stop in ranges]
+            )
+
+        should_swap = out.copy()
+        del out
+    return should_swap
@@ -2,15 +2,66 @@
 SNP ID building functionality.
 """
 
-from functools import partial
-from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from gwaslab.info.g_Log import Log
-from gwaslab.qc.qc_fix_sumstats import _df_split
 
+from gwaspipe.variant_ids import replace_separator
 
-def build_snpids(sumstats, chrom="CHR", pos="POS", nea="NEA", ea="EA", snpid="SNPID"):
+
+def _to_arrow(values):
+    """Convert a column to an Arrow array without copying numeric buffers, decoding categories."""
+    array = pa.array(values, from_pandas=True)
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+    return array
+
+
+def join_columns(columns, sep=":", n_threads=1):
+    """
+    Join columns element-wise into an Arrow-backed string Series.
+
+    The string kernels of pyarrow release the GIL, so the rows are split in
+    n_threads contiguous slices joined concurrently, and the joined slices are the
+    chunks of the resulting column.
+
+    Parameters
+    ----------
+    columns : list of pd.Series
+        Columns to join, all with the same index
+    sep : str, default=':'
+        Separator between the values
+    n_threads : int, default=1
+        Number of threads
+
+    Returns
+    -------
+    pd.Series
+        Series with dtype string[pyarrow], missing where any of the values is missing
+    """
+    arrays = [_to_arrow(column) for column in columns]
+    n_rows = len(arrays[0])
+
+    def join(start, stop):
+        sliced = [pc.cast(array.slice(start, stop - start), pa.string()) for array in arrays]
+        return pc.binary_join_element_wise(*sliced, sep)
+
+    bounds = np.linspace(0, n_rows, max(min(n_threads, n_rows), 1) + 1, dtype=np.int64)
+    if len(bounds) > 2:
+        with ThreadPoolExecutor(len(bounds) - 1) as executor:
+            chunks = list(executor.map(join, bounds[:-1], bounds[1:]))
+    else:
+        chunks = [join(0, n_rows)]
+
+    joined = pa.chunked_array(chunks, type=pa.string())
+    return pd.Series(pd.arrays.ArrowStringArray(joined), index=columns[0].index)
+
+
+def build_snpids(sumstats, chrom="CHR", pos="POS", nea="NEA", ea="EA", snpid="SNPID", n_threads=1):
     """
     Build SNPID column in format CHR:POS:EA:NEA.
 
@@ -28,21 +79,50 @@ def build_snpids(sumstats, chrom="CHR", pos="POS", nea="NEA", ea="EA", snpid="SN
         Column name for effect allele
     snpid : str, default='SNPID'
         Column name for SNP ID
+    n_threads : int, default=1
+        Number of threads, see join_columns
 
     Returns
     -------
     pd.Series
         Series containing built SNPID strings
     """
-    return (
-        sumstats[chrom].astype("string")
-        + ":"
-        + sumstats[pos].astype("string")
-        + ":"
-        + sumstats[ea].astype("string")
-        + ":"
-        + sumstats[nea].astype("string")
-    )
+    return join_columns([sumstats[chrom], sumstats[pos], sumstats[ea], sumstats[nea]], n_threads=n_threads)
+
+
+def build_previous_ids(sumstats, bcfliftover=False, n_threads=1):
+    """
+    Build the identifiers of the input variants in one pass.
+
+    The GWASLab SNPID (CHR:POS:EA:NEA) is built once and reused as PREVIOUS_ID
+    when the input has no SNPID column.
+
+    Parameters
+    ----------
+    sumstats : pd.DataFrame
+        Summary statistics dataframe
+    bcfliftover : bool, default=False
+        Whether the input comes from bcftools liftover, with the previous ID in rsID
+        as CHR_POS_EA_NEA
+    n_threads : int, default=1
+        Number of threads, see join_columns
+
+    Returns
+    -------
+    dict
+        PREVIOUS_ID_GWASLAB, PREVIOUS_rsID if rsID is in the input, and PREVIOUS_ID columns
+    """
+    gwaslab_snpid = build_snpids(sumstats, n_threads=n_threads)
+    previous_ids = {"PREVIOUS_ID_GWASLAB": gwaslab_snpid}
+    if "rsID" in sumstats.columns:
+        previous_ids["PREVIOUS_rsID"] = sumstats["rsID"].astype("string")
+    if bcfliftover:
+        previous_ids["PREVIOUS_ID"] = replace_separator(sumstats["rsID"], "_", ":")
+    elif "SNPID" in sumstats.columns:
+        previous_ids["PREVIOUS_ID"] = sumstats["SNPID"].astype("string")
+    else:
+        previous_ids["PREVIOUS_ID"] = gwaslab_snpid
+    return previous_ids
 
 
 def parallelbuildsnpid(
@@ -51,6 +131,8 @@ def parallelbuildsnpid(
     """
     Build SNPID column in format CHR:POS:EA:NEA in parallel.
 
+    The SNPIDs are joined by the pyarrow string kernels on n_cores threads, see join_columns.
+
     Parameters
     ----------
     sumstats : pd.DataFrame
@@ -66,7 +148,7 @@ def parallelbuildsnpid(
     snpid : str, default='SNPID'
         Column name for SNP ID
     n_cores : int, default=1
-        Number of cores for parallel processing
+        Number of threads for parallel processing
     verbose : bool, default=True
         Whether to print verbose output
     log : Log
@@ -80,18 +162,7 @@ def parallelbuildsnpid(
 
     if snpid in sumstats.columns:
         log.write(f"Start to build SNPID column on {n_cores} cores...", verbose=verbose)
-
-        if n_cores > 1:
-            df_split = _df_split(sumstats[[chrom, pos, ea, nea]], n_cores)
-            pool = Pool(n_cores)
-            map_func = partial(build_snpids, chrom=chrom, pos=pos, nea=nea, ea=ea, snpid=snpid)
-            snpids = pd.concat(pool.map(map_func, df_split))
-            pool.close()
-            pool.join()
-        else:
-            snpids = build_snpids(sumstats, chrom=chrom, pos=pos, nea=nea, ea=ea, snpid=snpid)
-
-        sumstats[snpid] = snpids
+        sumstats[snpid] = build_snpids(sumstats, chrom=chrom, pos=pos, nea=nea, ea=ea, snpid=snpid, n_threads=n_cores)
         log.write("Finished building SNPID column.", verbose=verbose)
     else:
         log.warning(f"'{snpid}' column is not found in the DataFrame. Skipping the build of SNPID.", verbose=verbose)
@@ -2,19 +2,36 @@
 Vectorized allele ordering functionality.
 """
 
-from functools import partial
-from multiprocessing import Pool
-
-import numpy as np
-import pandas as pd
 from gwaslab.info.g_Log import Log
 from gwaslab.info.g_vchange_status import vchange_status
-from gwaslab.qc.qc_fix_sumstats import _df_split
 
-from .constants import TRANSLATE_TABLE_ORDER
+from .encoding import encode_alleles, swap_mask_from_codes
+from .pairs import PAIR_CACHE, allele_pairs_should_swap
+from .shared import shared_swap_mask
 from .sorting import custom_alleles_sort
 
 
+def _should_swap_vec(ea_alleles, nea_alleles):
+    """
+    Vectorized custom ordering of allele pairs, see custom_alleles_sort.
+
+    Parameters
+    ----------
+    ea_alleles : pd.Series
+        Effect alleles
+    nea_alleles : pd.Series
+        Non-effect alleles
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True where NEA sorts before EA and the alleles should be swapped
+    """
+    ea_codes, ea_len = encode_alleles(ea_alleles)
+    nea_codes, nea_len = encode_alleles(nea_alleles)
+    return swap_mask_from_codes(ea_codes, ea_len, nea_codes, nea_len)
+
+
 def _orderalleles_status_vec(sumstats, nea="NEA", ea="EA", status="STATUS", verbose=True, log=Log()):
     """
     Vectorized status ordering for fast processing of large datasets.
@@ -42,40 +59,7 @@ def _orderalleles_status_vec(sumstats, nea="NEA", ea="EA", status="STATUS", verb
     if sumstats.empty:
         return sumstats
 
-    # Translate the strings to integer numpy arrays in a very fast way
-    _ea = sumstats[ea]
-    max_len_ea = _ea.str.len().max()
-    _ea = _ea.str.translate(TRANSLATE_TABLE_ORDER).to_numpy().astype(f"<U{max_len_ea}")
-    _ea = _ea.view("<u4").reshape(-1, max_len_ea).astype(np.uint8)
-
-    _nea = sumstats[nea]
-    max_len_nea = _nea.str.len().max()
-    _nea = _nea.str.translate(TRANSLATE_TABLE_ORDER).to_numpy().astype(f"<U{max_len_nea}")
-    _nea = _nea.view("<u4").reshape(-1, max_len_nea).astype(np.uint8)
-
-    ea_non_zero = np.sum(_ea != 0, axis=1)
-    nea_non_zero = np.sum(_nea != 0, axis=1)
-
-    # First condition: swap if NEA is longer than EA
-    should_swap = nea_non_zero > ea_non_zero
-
-    # When NEA and EA have the same length, check if the first different value is smaller
-    equal_length = nea_non_zero == ea_non_zero
-    ea_equal = _ea[equal_length]
-    nea_equal = _nea[equal_length]
-    max_shape = max(ea_equal.shape[1], nea_equal.shape[1]) if ea_equal.shape[0] > 0 else 0
-
-    if max_shape > 0:
-        if ea_equal.shape[1] > nea_equal.shape[1]:
-            nea_equal = np.pad(nea_equal, ((0, 0), (0, max_shape - _nea.shape[1])))
-        elif ea_equal.shape[1] < nea_equal.shape[1]:
-            ea_equal = np.pad(ea_equal, ((0, 0), (0, max_shape - _ea.shape[1])))
-
-        first_difference = np.argmax(nea_equal != ea_equal, axis=1)
-        ea_different_val = np.take_along_axis(ea_equal, first_difference[:, None], axis=1)
-        nea_different_val = np.take_along_axis(nea_equal, first_difference[:, None], axis=1)
-        cond_ordering = (nea_different_val < ea_different_val).flatten()
-        should_swap[equal_length] = cond_ordering
+    should_swap = _should_swap_vec(sumstats[ea], sumstats[nea])
 
     log.write(
         f"  -For Flipped match ({sum(should_swap)} matches): convert STATUS xxxxx[0123456789]x to xxxxx3x...",
@@ -86,11 +70,14 @@ def _orderalleles_status_vec(sumstats, nea="NEA", ea="EA", status="STATUS", verb
     return sumstats
 
 
-def vectorizedorderalleles_status(sumstats, nea="NEA", ea="EA", status="STATUS", verbose=True, log=Log()):
+def vectorizedorderalleles_status(
+    sumstats, nea="NEA", ea="EA", status="STATUS", verbose=True, log=Log(), cache=PAIR_CACHE
+):
     """
-    Vectorized allele ordering wrapper with threshold for large/small alleles.
+    Vectorized allele ordering through the table of distinct allele pairs.
 
-    Uses fast vectorized operations for processing speed.
+    The (EA, NEA) pairs are factorized and the swap is decided once per distinct pair,
+    reusing the decisions kept in the cache, then broadcast back to the rows.
 
     Parameters
     ----------
@@ -106,6 +93,8 @@ def vectorizedorderalleles_status(sumstats, nea="NEA", ea="EA", status="STATUS",
         Whether to print verbose output
     log : Log
         Log object for recording operations
+    cache : AllelePairCache
+        Cache of the swap decisions, shared across calls by default
 
     Returns
     -------
@@ -120,18 +109,17 @@ def vectorizedorderalleles_status(sumstats, nea="NEA", ea="EA", status="STATUS",
     _start_function = ".order_alleles()"
     _must_args = {}
 
-    max_len = 4  # chosen threshold for vectorized processing
-    condition = (sumstats[nea].str.len() <= max_len) & (sumstats[ea].str.len() <= max_len)
+    if sumstats.empty:
+        return sumstats
 
-    log.write(f" -Changing status for records with ( len(NEA) <= {max_len} and len(EA) <= {max_len} )", verbose=verbose)
-    sumstats_cond = sumstats[condition]
-    out = _orderalleles_status_vec(sumstats_cond, nea=nea, ea=ea, status=status, verbose=verbose, log=log)
-    sumstats.loc[condition, status] = out[status]
+    should_swap, n_pairs = allele_pairs_should_swap(sumstats[ea], sumstats[nea], _should_swap_vec, cache=cache)
+    log.write(f" -Changed status based on {n_pairs} distinct allele pairs", verbose=verbose)
 
-    log.write(f" -Changing status for records with ( len(NEA) > {max_len} or len(EA) > {max_len} )", verbose=verbose)
-    sumstats_not_cond = sumstats[~condition]
-    out = _orderalleles_status_vec(sumstats_not_cond, nea=nea, ea=ea, status=status, verbose=verbose, log=log)
-    sumstats.loc[~condition, status] = out[status]
+    log.write(
+        f"  -For Flipped match ({should_swap.sum()} matches): convert STATUS xxxxx[0123456789]x to xxxxx3x...",
+        verbose=verbose,
+    )
+    sumstats.loc[should_swap, status] = vchange_status(sumstats.loc[should_swap, status], 6, "0123456789", "3" * 10)
 
     log.write(_end_line, verbose=verbose)
 
@@ -182,6 +170,9 @@ def parallelorderalleles_status(sumstats, nea="NEA", ea="EA", status="STATUS", n
     """
     Parallel allele ordering for distributed processing across multiple cores.
 
+    The encoded alleles are placed in shared memory once and the workers compute the
+    swap mask over index ranges in place, see shared_swap_mask.
+
     Parameters
     ----------
     sumstats : pd.DataFrame
@@ -212,15 +203,17 @@ def parallelorderalleles_status(sumstats, nea="NEA", ea="EA", status="STATUS", n
     _start_function = ".order_alleles()"
     _must_args = {}
 
-    if n_cores > 1:
-        df_split = _df_split(sumstats, n_cores)
-        pool = Pool(n_cores)
-        map_func = partial(orderalleles_status, ea=ea, nea=nea, status=status, verbose=verbose, log=log)
-        sumstats = pd.concat(pool.map(map_func, df_split))
-        pool.close()
-        pool.join()
-    else:
-        sumstats = orderalleles_status(sumstats, ea=ea, nea=nea, status=status, verbose=verbose, log=log)
+    if sumstats.empty:
+        return sumstats
+
+    log.write(f" -Computing allele order on {n_cores} cores through shared memory...", verbose=verbose)
+    should_swap = shared_swap_mask(sumstats[ea], sumstats[nea], n_cores=n_cores)
+
+    log.write(
+        f"  -For Flipped match ({should_swap.sum()} matches): convert STATUS xxxxx[0123456789]x to xxxxx3x...",
+        verbose=verbose,
+    )
+    sumstats.loc[should_swap, status] = vchange_status(sumstats.loc[should_swap, status], 6, "0123456789", "3" * 10)
 
     log.write(_end_line, verbose=verbose)
     return sumstats
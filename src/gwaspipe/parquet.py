@@ -0,0 +1,203 @@
+"""
+Parquet output laid out for region queries.
+
+The rows are sorted by chromosome and position and each chromosome is written in its own
+row groups of at most row_group_size rows, with the min/max statistics and the page index
+of the columns, so a reader filtering on the chromosome and the position (e.g. pyarrow or
+DuckDB) only reads the row groups and the pages overlapping the region. The chromosome and
+allele columns are dictionary-encoded. The ``row_groups`` layout writes a single file, the
+``hive`` layout one file per chromosome, in ``<output>/<CHR header>=<chromosome>/``.
+
+The columns, their names and the chromosome labels are those of the GWASLab parquet output,
+see gwaspipe.writer.
+"""
+
+import copy
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from gwaslab.bd.bd_common_data import get_format_dict, get_formats_list
+
+from gwaspipe.fanout import SharedEncoding
+from gwaspipe.writer import NON_TABULAR_FORMATS, _chr_labels, _coordinate_order, _default_xymt, _output_columns
+
+LAYOUTS = ("row_groups", "hive")
+
+DEFAULT_ROW_GROUP_SIZE = 65_536
+
+# Columns dictionary-encoded when written
+DICTIONARY_COLUMNS = ("CHR", "EA", "NEA", "REF", "ALT")
+
+# to_format parameters handled by the Parquet writer
+SUPPORTED_PARAMS = frozenset(
+    {"fmt", "tab_fmt", "cols", "no_status", "output_log", "xymt_number", "xymt", "chr_prefix", "id_use", "verbose"}
+)
+
+
+def unsupported_reason(data, path, gl_params):
+    """
+    Return why the Parquet writer cannot write the output, None if it can.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Summary statistics dataframe
+    path : str
+        Output path prefix
+    gl_params : dict
+        to_format parameters
+
+    Returns
+    -------
+    str or None
+        Reason to fall back to the GWASLab writer
+    """
+    unsupported = sorted(set(gl_params) - SUPPORTED_PARAMS)
+    if unsupported:
+        return f"parameters {', '.join(unsupported)}"
+    if "@" in path:
+        return "one file per chromosome"
+    fmt = gl_params.get("fmt", "gwaslab")
+    if fmt in NON_TABULAR_FORMATS or fmt not in get_formats_list():
+        return f"{fmt} format"
+    if gl_params.get("tab_fmt", "parquet") != "parquet":
+        return f"{gl_params['tab_fmt']} tabular format"
+    meta_data, rename_dictionary = get_format_dict(fmt, inverse=True)
+    written = [
+        col for col, _ in _output_columns(data, rename_dictionary, meta_data, gl_params.get("cols") or [], False)
+    ]
+    if "CHR" not in written or "POS" not in written:
+        return "output without CHR and POS"
+    if data["CHR"].isna().any() or data["POS"].isna().any():
+        return "missing CHR or POS"
+    return None
+
+
+def _chromosome_runs(codes):
+    """Return the start and the stop of the runs of rows of each chromosome."""
+    if len(codes) == 0:
+        return []
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+    stops = np.append(starts[1:], len(codes))
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def write_parquet(
+    sumstats,
+    path,
+    fmt="gwaslab",
+    tab_fmt="parquet",
+    cols=None,
+    no_status=False,
+    output_log=True,
+    xymt_number=False,
+    xymt=None,
+    chr_prefix="",
+    id_use="rsID",
+    layout="row_groups",
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    encoding=None,
+    verbose=True,
+):
+    """
+    Write the sumstats as Parquet sorted by position, in row groups aligned to the chromosomes.
+
+    Parameters
+    ----------
+    sumstats : gl.Sumstats
+        Sumstats object
+    path : str
+        Output path prefix, the format and the extension are appended as by GWASLab
+    fmt, tab_fmt, cols, no_status, output_log, xymt_number, xymt, chr_prefix
+        GWASLab to_format parameters
+    id_use : str
+        Unused, accepted for compatibility with the to_format parameters
+    layout : str, default="row_groups"
+        "row_groups" for a single file, "hive" for a directory with one file per chromosome
+    row_group_size : int
+        Maximum number of rows of a row group
+    encoding : SharedEncoding, optional
+        Column encodings shared with the other outputs of a fan-out stage, see gwaspipe.fanout
+    verbose : bool, default=True
+        Whether to print verbose output
+
+    Returns
+    -------
+    str
+        Output path, a directory for the hive layout
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown Parquet layout {layout}, expected one of {', '.join(LAYOUTS)}")
+    data = sumstats.data
+    log = copy.deepcopy(sumstats.log)
+    log.write("Start to convert the output sumstats in: ", fmt, " format", verbose=verbose)
+
+    meta_data, rename_dictionary = get_format_dict(fmt, inverse=True)
+    log_path = f"{path}.{fmt}.log"
+    path = f"{path}.{fmt}.parquet" if layout == "row_groups" else f"{path}.{fmt}"
+    log.write(" -Output path:", path, verbose=verbose)
+    columns = _output_columns(data, rename_dictionary, meta_data, cols or [], no_status)
+    log.write(" -Output columns: {}".format(",".join(header for _, header in columns)), verbose=verbose)
+
+    encoding = encoding if encoding is not None else SharedEncoding()
+    xymt = xymt if xymt is not None else _default_xymt(sumstats)
+    labels_key = ("CHR", xymt_number, tuple(xymt), chr_prefix)
+    chr_labels = encoding.get(labels_key, lambda: _chr_labels(sumstats, xymt_number, xymt, chr_prefix))
+    positions = data["POS"].to_numpy(dtype="int64")
+    order = encoding.get("coordinate_order", lambda: _coordinate_order(data["CHR"], positions))
+
+    frame = pd.DataFrame({header: chr_labels if col == "CHR" else data[col] for col, header in columns})
+    if order is not None:
+        log.write(" -Sorting the rows by CHR and POS...", verbose=verbose)
+        frame = frame.take(order)
+    frame = frame.reset_index(drop=True)
+    # Headers of CHR and POS as written, under their own names when they are written through cols
+    headers = dict(columns)
+    chr_header, pos_header = headers.get("CHR", "CHR"), headers.get("POS", "POS")
+    # Chromosomes in the order of the rows, e.g. 2 before 10
+    frame[chr_header] = pd.Categorical(frame[chr_header], categories=pd.unique(frame[chr_header]))
+    dictionary_headers = [header for col, header in columns if col in DICTIONARY_COLUMNS]
+    for header in dictionary_headers:
+        if not isinstance(frame[header].dtype, pd.CategoricalDtype):
+            frame[header] = frame[header].astype("category")
+    runs = _chromosome_runs(frame[chr_header].cat.codes.to_numpy())
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    options = {"use_dictionary": dictionary_headers, "write_statistics": True, "write_page_index": True}
+    log.write(
+        f" -Writing {len(runs)} chromosomes in row groups of at most {row_group_size} rows to: {path}...",
+        verbose=verbose,
+    )
+    if layout == "row_groups":
+        # Each row group holds a single chromosome sorted by POS, CHR is a string and is not declared
+        # since its labels are in numeric rather than lexicographic order, e.g. 2 before 10
+        sorting = [pq.SortingColumn(table.schema.get_field_index(pos_header))]
+        with pq.ParquetWriter(path, table.schema, sorting_columns=sorting, **options) as writer:
+            for start, stop in runs:
+                writer.write_table(table.slice(start, stop - start), row_group_size=row_group_size)
+    else:
+        # Written next to the output and moved in place, so no partition of a previous output is left
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        partition = table.drop_columns([chr_header])
+        options["use_dictionary"] = [header for header in dictionary_headers if header != chr_header]
+        sorting = [pq.SortingColumn(partition.schema.get_field_index(pos_header))]
+        for start, stop in runs:
+            directory = os.path.join(tmp_path, f"{chr_header}={frame[chr_header].iat[start]}")
+            os.makedirs(directory)
+            with pq.ParquetWriter(
+                os.path.join(directory, "part-0.parquet"), partition.schema, sorting_columns=sorting, **options
+            ) as writer:
+                writer.write_table(partition.slice(start, stop - start), row_group_size=row_group_size)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    if output_log:
+        log.write(" -Saving log file to: {}".format(log_path), verbose=verbose)
+        log.write("Finished outputting successfully!", verbose=verbose)
+        log.save(log_path, verbose=False)
+    return path
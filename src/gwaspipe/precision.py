@@ -0,0 +1,85 @@
+"""
+Vectorized detection of the number of decimals of float columns.
+
+The number of decimals of a value is the length of the text after the decimal point
+in its Python representation, e.g. 3 for ``0.125``, 1 for ``2.0``, 0 for ``1e-05`` and
+6 for ``1.25e-08`` (the exponent is counted). The shortest representation of all the
+values is formatted at once by Arrow, which produces the same digits as Python, and the
+Python representation length is derived from the digits and the decimal exponent.
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Python switches to the scientific notation outside of this decimal exponent range
+_POSITIONAL_EXPONENTS = (-4, 16)
+
+
+def _lengths(strings):
+    return pc.utf8_length(strings).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def _positions(strings, pattern):
+    return pc.find_substring(strings, pattern).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def decimal_places(values):
+    """
+    Return the number of decimals of each value.
+
+    Parameters
+    ----------
+    values : pd.Series
+        Float values, missing and non-finite values have no decimals
+
+    Returns
+    -------
+    np.ndarray
+        Number of decimals of each value
+    """
+    floats = np.asarray(values.astype("float64"), dtype=np.float64)
+    finite = np.isfinite(floats)
+    # Non-finite values are formatted as zero and masked at the end
+    shortest = pc.utf8_ltrim(pc.cast(pa.array(np.where(finite, floats, 0.0)), pa.string()), "-")
+    parts = pc.split_pattern(shortest, "e", max_splits=1)
+
+    # Decimal exponent written after the mantissa, only in scientific notation
+    exponent = np.zeros(len(floats), dtype=np.int64)
+    written = pc.list_slice(parts, 1, 2)
+    exponent[pc.list_parent_indices(written).to_numpy()] = pc.cast(
+        pc.utf8_ltrim(pc.list_flatten(written), "+"), pa.int64()
+    ).to_numpy()
+
+    mantissa = pc.list_element(parts, 0)
+    length = _lengths(mantissa)
+    point = _positions(mantissa, ".")
+    has_point = point >= 0
+    int_length = np.where(has_point, point, length)
+    # Zeros and decimal point before the first significant digit, and after the last one
+    head = length - _lengths(pc.utf8_ltrim(mantissa, "0."))
+    significant = _lengths(pc.utf8_trim(mantissa, "0."))
+    tail = length - head - significant
+    leading_zeros = head - (has_point & (point < head))
+    significant -= has_point & (point >= head) & (point < length - tail)
+    e10 = exponent + int_length - 1 - leading_zeros
+
+    zero = significant == 0
+    significant = np.where(zero, 1, significant)
+    e10 = np.where(zero, 0, e10)
+
+    positional = (e10 >= _POSITIONAL_EXPONENTS[0]) & (e10 < _POSITIONAL_EXPONENTS[1])
+    # Positional notation always has a decimal point, e.g. 2.0
+    positional_places = np.maximum(1, significant - 1 - e10)
+    # Scientific notation has a decimal point only with two or more digits, e.g. 1.25e-08
+    exponent_length = np.where(np.abs(e10) >= 100, 5, 4)
+    scientific_places = np.where(significant > 1, significant - 1 + exponent_length, 0)
+    places = np.where(positional, positional_places, scientific_places)
+    return np.where(finite, places, 0)
+
+
+def max_decimal_places(values):
+    """Return the maximum number of decimals of the values, 0 if there are no values."""
+    if len(values) == 0:
+        return 0
+    return int(decimal_places(values).max())
@@ -0,0 +1,104 @@
+"""
+Column projection driven by the run sequence.
+
+The columns needed by a run are the core variant columns, the columns read by each
+enabled step and the columns written by each enabled output format, as listed in the
+formatbook. Only those columns are read from the input. The projection is disabled
+when any enabled step can use every column, e.g. a ``gwaslab`` output, which writes
+all the columns of the table.
+"""
+
+import json
+
+# Columns always kept: the variant identity and the status code
+CORE_COLUMNS = frozenset({"SNPID", "rsID", "CHR", "POS", "EA", "NEA", "REF", "ALT", "STATUS"})
+
+# Statistics that fill_data can derive from each other
+STATISTIC_COLUMNS = frozenset(
+    {"BETA", "SE", "P", "MLOG10P", "Z", "CHISQ", "T", "F", "OR", "OR_95L", "OR_95U", "EAF", "MAF", "N"}
+)
+
+# Columns read by each step besides the core columns
+STEP_COLUMNS = {
+    "basic_check": frozenset({"EAF"}),
+    "infer_build": frozenset(),
+    "fill_data": STATISTIC_COLUMNS,
+    "harmonize": frozenset({"EAF"}),
+    "liftover": frozenset(),
+    "sort_alphabetically": frozenset({"EAF"}),
+    "check_ambiguous_snps": frozenset({"EAF", "BETA", "SE"}),
+    "annotate_genes": frozenset({"P", "MLOG10P"}),
+    "report_harmonization_summary": frozenset(),
+    "report_min_pvalue": frozenset({"MLOG10P"}),
+    "report_loci": frozenset({"P", "MLOG10P", "EAF", "BETA", "SE"}),
+    "report_inflation_factors": frozenset({"Z"}),
+    "qq_manhattan_plots": frozenset({"P", "MLOG10P"}),
+    # The mapping columns are built from the core columns
+    "write_snp_mapping": frozenset(),
+}
+
+# Steps writing the table in the output format set by fmt in gl_params
+WRITE_STEPS = ("write_regenie", "write_ldsc", "write_metal", "write_tsv", "write_fastgwa", "write_vcf")
+
+
+def load_formatbook(formatbook_path):
+    with open(formatbook_path) as fp:
+        return json.load(fp)
+
+
+def output_columns(fmt, formatbook):
+    """
+    Return the GWASLab columns written in an output format, None if it writes every column.
+
+    Parameters
+    ----------
+    fmt : str
+        Output format
+    formatbook : dict
+        Formatbook, see load_formatbook
+
+    Returns
+    -------
+    frozenset or None
+        Columns mapped in the format, restricted to format_col_order when the format has one
+    """
+    if not fmt or fmt == "gwaslab" or fmt not in formatbook:
+        return None
+    format_dict = formatbook[fmt].get("format_dict", {})
+    col_order = formatbook[fmt].get("meta_data", {}).get("format_col_order")
+    if col_order:
+        return frozenset(format_dict[col] for col in col_order if col in format_dict)
+    return frozenset(format_dict.values())
+
+
+def required_columns(run_sequence, step_config, formatbook):
+    """
+    Return the columns needed by the enabled steps of the run sequence.
+
+    Parameters
+    ----------
+    run_sequence : tuple
+        Ordered step names
+    step_config : callable
+        Function returning the ``(params, gl_params)`` of a step, e.g. ``ConfigurationManager.step``
+    formatbook : dict
+        Formatbook, see load_formatbook
+
+    Returns
+    -------
+    frozenset or None
+        GWASLab column names, None if all the columns are needed
+    """
+    columns = set(CORE_COLUMNS)
+    for step in run_sequence:
+        params, gl_params = step_config(step)
+        if not params.get("run", False):
+            continue
+        if step in WRITE_STEPS:
+            step_columns = output_columns(gl_params.get("fmt"), formatbook)
+        else:
+            step_columns = STEP_COLUMNS.get(step)
+        if step_columns is None:
+            return None
+        columns |= step_columns
+    return frozenset(columns)
@@ -0,0 +1,244 @@
+"""
+Persistent cache of the reference allele frequencies used by harmonize.
+
+The strand of the palindromic SNPs and the alignment of the indistinguishable indels
+are inferred from the allele frequencies of the ref_infer VCF. GWASLab reads them in
+a dictionary built from the whole VCF at the start of every run. This cache stores
+them once per reference, in a directory shared between runs, as sorted 64-bit codes
+of the ``chrom:pos:ref:alt`` keys and their frequencies in NumPy files, which are
+memory-mapped read-only by the runs and looked up by binary search. GWASLab looks up
+one key at a time, so the code of a key is an 8-byte BLAKE2b digest of the key, and it
+is searched with bisect among the codes sharing its leading bits.
+
+The key of an entry is the identity of the reference (path, size and modification
+time), ref_alt_freq, the variant category and the GWASLab version, so a changed
+reference builds a new entry. An entry is built by one run while the others wait on
+a lock, written aside and moved in place, and the least recently used entries are
+evicted above the size limit.
+"""
+
+import bisect
+import fcntl
+import hashlib
+import importlib.metadata
+import os
+import tempfile
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from gwaslab.cache_manager import FILTER_FN, PALINDROMIC_INDEL, cache_exists, get_cache_path, load_h5py_cache
+
+from gwaspipe.step_cache import StepCache, _digest
+
+DEFAULT_MAX_SIZE = "50GB"
+
+# Version of the layout of the entries, 2 for the BLAKE2b codes
+CACHE_FORMAT = 2
+
+# Leading bits of the codes indexing the offsets of a lookup
+BUCKET_BITS = 16
+
+
+def reference_key(ref_infer, ref_alt_freq, category=PALINDROMIC_INDEL):
+    """
+    Return the key of the cache entry of a reference.
+
+    Parameters
+    ----------
+    ref_infer : str
+        Path to the reference VCF
+    ref_alt_freq : str
+        INFO field of the alternative allele frequency
+    category : str
+        GWASLab cache category, the variants kept in the cache
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest
+    """
+    stat = os.stat(ref_infer)
+    gwaslab_version = importlib.metadata.version("gwaslab")
+    identity = (os.path.realpath(ref_infer), stat.st_size, stat.st_mtime_ns)
+    return _digest(identity, ref_alt_freq, category, gwaslab_version, CACHE_FORMAT)
+
+
+def _code(key):
+    """Return the 64-bit code of a ``chrom:pos:ref:alt`` key."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def _codes(keys):
+    """Return the 64-bit codes of the ``chrom:pos:ref:alt`` keys."""
+    return np.fromiter(map(_code, keys), dtype=np.uint64, count=len(keys))
+
+
+def _read_contig(ref_infer, contig, ref_alt_freq, category):
+    from pysam import VariantFile
+
+    filter_fn = FILTER_FN[category]
+    keys, values = [], []
+    with VariantFile(ref_infer, drop_samples=True) as vcf:
+        for record in vcf.fetch(contig):
+            for alt in record.alts or ():
+                if filter_fn(ref=record.ref, alt=alt):
+                    keys.append(f"{record.chrom}:{record.pos}:{record.ref}:{alt}")
+                    value = record.info[ref_alt_freq][0]
+                    values.append(np.nan if value is None else value)
+    return _codes(keys), np.asarray(values, dtype="float32")
+
+
+def read_reference(ref_infer, ref_alt_freq, category=PALINDROMIC_INDEL, threads=1):
+    """
+    Return the codes of the variants of a category in the reference and their frequencies.
+
+    A GWASLab cache of the reference with the same ref_alt_freq and category is read
+    instead of the VCF when it exists, otherwise the contigs are read on threads processes.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        Variant codes and frequencies
+    """
+    gwaslab_cache = get_cache_path(ref_infer)
+    if cache_exists(gwaslab_cache, ref_alt_freq, category):
+        cache = load_h5py_cache(gwaslab_cache, ref_alt_freq, category)
+        return _codes(list(cache)), np.asarray(list(cache.values()), dtype="float32")
+
+    from pysam import VariantFile
+
+    with VariantFile(ref_infer, drop_samples=True) as vcf:
+        contigs = list(vcf.header.contigs)
+    args = [(ref_infer, contig, ref_alt_freq, category) for contig in contigs]
+    if threads > 1:
+        with ProcessPoolExecutor(max_workers=threads) as executor:
+            parts = list(executor.map(_read_contig, *zip(*args)))
+    else:
+        parts = [_read_contig(*a) for a in args]
+    if not parts:
+        return np.empty(0, dtype="uint64"), np.empty(0, dtype="float32")
+    return np.concatenate([c for c, _ in parts]), np.concatenate([v for _, v in parts])
+
+
+class ReferenceLookup(Mapping):
+    """
+    Read-only mapping of the ``chrom:pos:ref:alt`` keys to the reference frequencies.
+
+    It is used as the cache of the GWASLab strand and indel inference, the missing
+    frequencies are None as in the GWASLab cache.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.codes = np.load(Path(self.path, "codes.npy"), mmap_mode="r")
+        self.values = np.load(Path(self.path, "values.npy"), mmap_mode="r")
+        # The keys are searched one at a time with Python integers, between the offsets of the
+        # codes sharing their BUCKET_BITS leading bits, which avoids the NumPy scalar overhead
+        starts = np.arange(2**BUCKET_BITS, dtype=np.uint64) << np.uint64(64 - BUCKET_BITS)
+        self._offsets = np.append(np.searchsorted(self.codes, starts), len(self.codes)).tolist()
+        self._view = memoryview(self.codes).cast("B").cast("Q") if len(self.codes) else []
+        # Index of the last key looked up, GWASLab checks a key before getting it
+        self._last = (None, -1)
+
+    def _index(self, key):
+        if self._last[0] == key:
+            return self._last[1]
+        code = _code(key)
+        bucket = code >> (64 - BUCKET_BITS)
+        hi = self._offsets[bucket + 1]
+        i = bisect.bisect_left(self._view, code, self._offsets[bucket], hi)
+        index = i if i < hi and self._view[i] == code else -1
+        self._last = (key, index)
+        return index
+
+    def __contains__(self, key):
+        return self._index(key) >= 0
+
+    def __getitem__(self, key):
+        index = self._index(key)
+        if index < 0:
+            raise KeyError(key)
+        value = float(self.values[index])
+        return None if np.isnan(value) else value
+
+    def __iter__(self):
+        raise TypeError("The keys of the reference cache are stored as codes and cannot be iterated")
+
+    def __len__(self):
+        return len(self.codes)
+
+    def get_cache(self):
+        """Return the mapping itself, for use as a GWASLab cache_loader."""
+        return self
+
+
+class ReferenceCache(StepCache):
+    """Size-bounded directory of the reference caches, shared between runs."""
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        super().__init__(path, max_size)
+
+    def get(self, key):
+        """Return the lookup of a key, None if it is not cached."""
+        path = Path(self.path, key)
+        if not self.path.is_dir():
+            return None
+        with self.lock(shared=True):
+            if not Path(path, ".complete").exists():
+                return None
+            try:
+                # Touch the entry, the least recently used entries are evicted first
+                os.utime(path)
+                return ReferenceLookup(path)
+            except (OSError, ValueError):
+                # Removed by another run since it was checked
+                return None
+
+    def put(self, key, codes, values):
+        """Store the codes and the frequencies of a key and evict the least recently used entries."""
+        order = np.argsort(codes, kind="stable")
+        codes, values = codes[order], values[order]
+        # Keep the last of the duplicated keys, as the GWASLab dictionary does
+        last = np.append(codes[1:] != codes[:-1], True)[: len(codes)]
+        path = Path(self.path, key)
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Written aside under a unique name, the runs sharing the cache may store the same entry
+        tmp_path = Path(tempfile.mkdtemp(prefix=f".{key}.", suffix=".tmp", dir=self.path))
+        np.save(Path(tmp_path, "codes.npy"), codes[last])
+        np.save(Path(tmp_path, "values.npy"), values[last])
+        Path(tmp_path, ".complete").touch()
+        self._replace(tmp_path, path)
+
+    def open(self, key, read):
+        """
+        Return the lookup of a key, building it with read if it is not cached.
+
+        Parameters
+        ----------
+        key : str
+            Entry key, see reference_key
+        read : callable
+            Function returning the variant codes and frequencies, see read_reference
+
+        Returns
+        -------
+        ReferenceLookup
+            Memory-mapped lookup of the entry
+        """
+        lookup = self.get(key)
+        if lookup is not None:
+            return lookup
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Only one run builds an entry, the others wait and open it
+        with open(Path(self.path, f".{key}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                lookup = self.get(key)
+                if lookup is None:
+                    self.put(key, *read())
+                    lookup = self.get(key)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return lookup
@@ -0,0 +1,132 @@
+"""
+Mapping between the input and the output variants, written by write_snp_mapping.
+
+EQUALS tells whether the output SNPID is the input variant ID, FLIPPED whether both
+alleles of the variant changed since the input, e.g. swapped by harmonize or
+sort_alphabetically. The input alleles are kept as categorical columns when the
+input is loaded, see previous_alleles, so FLIPPED compares allele codes instead of
+parsing the variant IDs.
+
+The compact mapping is an Arrow IPC (Feather) file with one 64-bit integer code per
+output and input variant, the position and the EQUALS and FLIPPED flags, stored as
+bitmaps. The variant codes are a hash of the IDs, so the mappings of different
+studies are joined on integers. CHR is stored as the GWASLab chromosome numbers, or
+as dictionary-encoded labels when a label has no number.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from gwaspipe.genes import chrom_numbers
+from gwaspipe.variant_ids import parse_variant_ids
+
+# Columns holding the input alleles
+PREVIOUS_ALLELES = {"EA": "PREVIOUS_EA", "NEA": "PREVIOUS_NEA"}
+
+COMPACT_SUFFIX = "snp_mapping.arrow"
+
+
+def previous_alleles(sumstats):
+    """Return the input alleles as categorical columns, to be compared with the output alleles."""
+    return {previous: sumstats[col].astype("category") for col, previous in PREVIOUS_ALLELES.items()}
+
+
+def _allele_changed(current, previous):
+    """Return whether the current allele differs from the previous one, False if either is missing."""
+    current = current if isinstance(current.dtype, pd.CategoricalDtype) else current.astype("category")
+    codes = current.cat.codes.to_numpy()
+    previous_codes = previous.cat.codes.to_numpy()
+    # Code of each previous category among the current categories, -1 if it is not one of them
+    previous_in_current = current.cat.categories.get_indexer(previous.cat.categories)
+    mapped = previous_in_current[previous_codes]
+    return (codes >= 0) & (previous_codes >= 0) & (mapped != codes)
+
+
+def flipped_alleles(data, alleles_in_snpid=True):
+    """
+    Return whether both alleles of each variant changed since the input.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Summary statistics dataframe with the PREVIOUS_ID_GWASLAB column
+    alleles_in_snpid : bool, default=True
+        Whether the SNPID is built from the EA and NEA columns, e.g. by sort_alphabetically.
+        The alleles are then compared with the input alleles kept by previous_alleles,
+        otherwise they are parsed from SNPID and PREVIOUS_ID_GWASLAB
+
+    Returns
+    -------
+    pd.Series
+        Boolean FLIPPED column
+    """
+    if alleles_in_snpid and all(col in data.columns for col in PREVIOUS_ALLELES.values()):
+        flipped = np.ones(len(data), dtype=bool)
+        for col, previous in PREVIOUS_ALLELES.items():
+            flipped &= _allele_changed(data[col], data[previous])
+        return pd.Series(flipped, index=data.index)
+    alleles = parse_variant_ids(data["SNPID"], fields=(None, None, "EA", "NEA"))
+    previous_alleles = parse_variant_ids(data["PREVIOUS_ID_GWASLAB"], fields=(None, None, "EA", "NEA"))
+    flipped = (alleles["EA"] != previous_alleles["EA"]) & (alleles["NEA"] != previous_alleles["NEA"])
+    return flipped.fillna(False).astype(bool)
+
+
+def variant_codes(ids):
+    """Return a 64-bit integer code of each variant ID, 0 for the missing IDs."""
+    values = ids.astype("string").to_numpy(dtype=object, na_value="")
+    codes = pd.util.hash_array(values, categorize=False)
+    codes[values == ""] = 0
+    return codes
+
+
+def _chr_column(chrom):
+    """Return CHR as the uint8 GWASLab numbers, 0 where missing, or as dictionary-encoded labels if a label has none."""
+    numbers = chrom_numbers(chrom)
+    unmapped = np.isnan(numbers) & chrom.notna().to_numpy()
+    known = numbers[~np.isnan(numbers)]
+    if unmapped.any() or ((known < 0) | (known > 255) | (known != np.floor(known))).any():
+        return pa.array(chrom.astype("string"), type=pa.string()).dictionary_encode()
+    return pa.array(np.nan_to_num(numbers, nan=0).astype(np.uint8), type=pa.uint8())
+
+
+def write_compact_mapping(data, path, part=0):
+    """
+    Write the compact mapping of the variants.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Summary statistics dataframe with the EQUALS and FLIPPED columns
+    path : str
+        Output path prefix, the mapping is written in the directory ``<path>.snp_mapping.arrow``
+    part : int, default=0
+        Part number, e.g. the chunk index while streaming, a new output removes the other parts
+
+    Returns
+    -------
+    str
+        Path of the written part
+    """
+    directory = f"{path}.{COMPACT_SUFFIX}"
+    os.makedirs(directory, exist_ok=True)
+    if part == 0:
+        for name in os.listdir(directory):
+            if name.startswith("part-"):
+                os.remove(os.path.join(directory, name))
+    table = pa.table(
+        {
+            "VARIANT": pa.array(variant_codes(data["SNPID"]), type=pa.uint64()),
+            "PREVIOUS_VARIANT": pa.array(variant_codes(data["PREVIOUS_ID"]), type=pa.uint64()),
+            "CHR": _chr_column(data["CHR"]),
+            "POS": pa.array(data["POS"].to_numpy(dtype="int64", na_value=0), type=pa.uint32()),
+            "EQUALS": pa.array(data["EQUALS"].to_numpy(dtype=bool, na_value=False)),
+            "FLIPPED": pa.array(data["FLIPPED"].to_numpy(dtype=bool, na_value=False)),
+        }
+    )
+    part_path = os.path.join(directory, f"part-{part}.feather")
+    feather.write_feather(table, part_path, compression="zstd")
+    return part_path
@@ -0,0 +1,247 @@
+"""
+Content-addressed cache of the step results.
+
+The key of a step is chained from the key of the previous step and the step
+configuration, starting from a base key on the content of the input file, the
+formatbook, the gwaslab and gwaspipe versions and the load options. The leading
+steps of the run sequence that only transform the table are cached, so a run whose
+prefix is unchanged, e.g. after adding an output step, loads the result of that
+prefix instead of running it. The cache directory can be shared between runs and is
+bounded in size, evicting the least recently used entries.
+
+The runs sharing a cache directory lock it: an entry is restored under a shared lock,
+and stored or evicted under an exclusive one, so an entry is not removed while it is
+read. An entry removed before it is restored is a cache miss.
+"""
+
+import fcntl
+import hashlib
+import importlib.metadata
+import json
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from gwaspipe import __version__
+from gwaspipe.checkpoint import load_sumstats, save_sumstats
+
+# Steps whose only effect is on the Sumstats object
+TRANSFORM_STEPS = frozenset(
+    {
+        "basic_check",
+        "infer_build",
+        "fill_data",
+        "harmonize",
+        "liftover",
+        "sort_alphabetically",
+        "check_ambiguous_snps",
+        "annotate_genes",
+    }
+)
+
+DEFAULT_MAX_SIZE = "20GB"
+
+# Lock file of a cache directory, shared by the runs using it
+LOCK_FILENAME = ".lock"
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 2**10, "MB": 2**20, "GB": 2**30, "TB": 2**40}
+
+
+def parse_size(size):
+    """Return the number of bytes of a size given as an integer or a string such as '20GB'."""
+    if isinstance(size, int):
+        return size
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*", str(size).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {size}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of the content of a file."""
+    with open(path, "rb") as fp:
+        return hashlib.file_digest(fp, "sha256").hexdigest()
+
+
+def base_key(input_path, formatbook_path, **options):
+    """
+    Return the key of the loaded input.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the input file
+    formatbook_path : str
+        Path to the formatbook, if it exists
+    **options
+        Options changing the loaded table, e.g. the input format
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest
+    """
+    formatbook = file_digest(formatbook_path) if Path(formatbook_path).exists() else None
+    gwaslab_version = importlib.metadata.version("gwaslab")
+    return _digest(file_digest(input_path), formatbook, gwaslab_version, __version__, options)
+
+
+def step_keys(key, run_sequence, step_config):
+    """
+    Return the keys of the leading transform steps of the run sequence.
+
+    Parameters
+    ----------
+    key : str
+        Base key, see base_key
+    run_sequence : tuple
+        Ordered step names
+    step_config : callable
+        Function returning the ``(params, gl_params)`` of a step, e.g. ``ConfigurationManager.step``
+
+    Returns
+    -------
+    list
+        ``(step, key)`` of the steps up to the first enabled step that is not a transform step
+    """
+    keys = []
+    for step in run_sequence:
+        params, gl_params = step_config(step)
+        if params.get("run", False) and step not in TRANSFORM_STEPS:
+            break
+        key = _digest(key, step, params, gl_params)
+        keys.append((step, key))
+    return keys
+
+
+class CacheEntry:
+    """Cached Sumstats object of a step."""
+
+    def __init__(self, cache, path):
+        self.cache = cache
+        self.path = Path(path)
+        self._sumstats = None
+
+    def load(self):
+        """Load the entry under the shared lock of the cache, False if it was removed in between."""
+        with self.cache.lock(shared=True):
+            try:
+                # Touch the entry, the least recently used entries are evicted first
+                os.utime(self.path)
+                self._sumstats = load_sumstats(self.path)
+            except (OSError, ValueError):
+                return False
+        return True
+
+    def restore(self):
+        """Return the cached Sumstats object, loaded once."""
+        if self._sumstats is None and not self.load():
+            raise FileNotFoundError(f"The cache entry {self.path} was removed")
+        sumstats, self._sumstats = self._sumstats, None
+        return sumstats
+
+
+class StepCache:
+    """Size-bounded cache of the step results in a directory."""
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        self.path = Path(path)
+        self.max_size = parse_size(max_size)
+
+    @contextmanager
+    def lock(self, shared=False):
+        """Lock the cache directory between runs, shared to read an entry, exclusive to change the entries."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(Path(self.path, LOCK_FILENAME), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """Return the entry of a key, None if it is not cached."""
+        path = Path(self.path, key)
+        if not self.path.is_dir():
+            return None
+        # Checked under the lock, an entry being replaced by another run is not a miss
+        with self.lock(shared=True):
+            if not Path(path, ".complete").exists():
+                return None
+        return CacheEntry(self, path)
+
+    def longest_prefix(self, keys):
+        """Return the index in keys of the last step of the longest cached prefix, None if no step is cached."""
+        for i in range(len(keys) - 1, -1, -1):
+            if self.get(keys[i][1]) is not None:
+                return i
+        return None
+
+    def restore(self, keys):
+        """
+        Load the longest cached prefix of the steps.
+
+        Parameters
+        ----------
+        keys : list
+            ``(step, key)`` of the steps, see step_keys
+
+        Returns
+        -------
+        tuple
+            Index in keys of the last step of the prefix and its loaded CacheEntry, ``(None, None)``
+            if no step is cached. An entry removed by another run is skipped as a cache miss.
+        """
+        for i in range(len(keys) - 1, -1, -1):
+            entry = self.get(keys[i][1])
+            if entry is not None and entry.load():
+                return i, entry
+        return None, None
+
+    def put(self, key, sumstats):
+        """Store the Sumstats object of a key and evict the least recently used entries above the size limit."""
+        path = Path(self.path, key)
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Written aside under a unique name, the runs sharing the cache may store the same entry
+        tmp_path = Path(tempfile.mkdtemp(prefix=f".{key}.", suffix=".tmp", dir=self.path))
+        save_sumstats(sumstats, tmp_path)
+        Path(tmp_path, ".complete").touch()
+        self._replace(tmp_path, path)
+
+    def _replace(self, tmp_path, path):
+        """Move a written entry in place and evict the least recently used entries, under the exclusive lock."""
+        with self.lock():
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+            self._evict(keep=path.name)
+
+    def _entries(self):
+        entries = []
+        for path in self.path.iterdir():
+            if path.is_dir() and not path.name.startswith("."):
+                size = sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+                entries.append((path.stat().st_mtime, size, path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries until the cache fits its size limit."""
+        with self.lock():
+            self._evict(keep)
+
+    def _evict(self, keep=None):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if path.name == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
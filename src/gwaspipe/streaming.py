@@ -0,0 +1,143 @@
+"""
+Chunked streaming execution of the run sequence.
+
+Row-local steps are applied to the input one chunk at a time and the write steps
+append each chunk to their outputs, so that only a chunk of the table has to be
+resident in memory. Steps that need the whole table declare a fallback:
+
+- ``first_chunk``: the step runs on the first chunk and its result is reused for the
+  following chunks (e.g. the genome build inferred by ``infer_build``)
+- ``materialize``: the processed chunks are concatenated and this step, and all the
+  steps after it, run in memory on the whole table
+
+A row-local step also materializes when one of its GWASLab parameters compares rows,
+e.g. ``basic_check`` with ``remove_dup``, as duplicates may span two chunks.
+
+The columns of the chunks are resolved with private functions of the GWASLab input
+reader, available in the supported GWASLab versions. When they are missing, streaming
+is not supported and the input is loaded in memory, see STREAMING_SUPPORTED.
+"""
+
+import pandas as pd
+from gwaslab.info.g_Log import Log
+
+try:
+    from gwaslab.io.io_preformat_input import _apply_column_filters, _check_path_and_header, _load_format_config
+
+    STREAMING_SUPPORTED = True
+except ImportError:
+    STREAMING_SUPPORTED = False
+
+FIRST_CHUNK = "first_chunk"
+MATERIALIZE = "materialize"
+
+# Steps whose result for a row depends only on that row
+CHUNKED_STEPS = frozenset(
+    {
+        "basic_check",
+        "fill_data",
+        "sort_alphabetically",
+        "annotate_genes",
+        "write_snp_mapping",
+        "write_regenie",
+        "write_ldsc",
+        "write_metal",
+        "write_tsv",
+        "write_fastgwa",
+        "write_same_input_format",
+    }
+)
+
+# Declared fallbacks for steps that need the whole table, any other step materializes
+STEP_FALLBACKS = {
+    "infer_build": FIRST_CHUNK,
+    "check_ambiguous_snps": MATERIALIZE,
+    "report_inflation_factors": MATERIALIZE,
+}
+
+# GWASLab parameters of row-local steps comparing rows, the step materializes when one is set
+WHOLE_TABLE_PARAMS = {"basic_check": ("remove_dup",)}
+
+# Input formats that cannot be read in chunks
+UNCHUNKABLE_FORMATS = ("pickle", "checkpoint", "vcf")
+
+
+def step_fallback(step, gl_params=None):
+    """Return the fallback declared for a step with its GWASLab parameters, None if the step is row-local."""
+    if step in CHUNKED_STEPS:
+        if any((gl_params or {}).get(param, False) for param in WHOLE_TABLE_PARAMS.get(step, ())):
+            return MATERIALIZE
+        return None
+    return STEP_FALLBACKS.get(step, MATERIALIZE)
+
+
+def split_run_sequence(run_sequence, step_config):
+    """
+    Split the run sequence into the steps streamed chunk by chunk and the steps run in memory.
+
+    Parameters
+    ----------
+    run_sequence : tuple
+        Ordered step names
+    step_config : callable
+        Function returning the ``(params, gl_params)`` of a step, e.g. ``ConfigurationManager.step``
+
+    Returns
+    -------
+    tuple
+        ``(streamed, materialized)``: the materialized part starts at the first enabled step
+        that has to see the whole table
+    """
+    for i, step in enumerate(run_sequence):
+        params, gl_params = step_config(step)
+        if params.get("run", False) and step_fallback(step, gl_params) == MATERIALIZE:
+            return tuple(run_sequence[:i]), tuple(run_sequence[i:])
+    return tuple(run_sequence), ()
+
+
+def read_chunks(input_path, input_format, input_separator, chunk_size, include=None):
+    """
+    Read a summary statistics file in chunks of raw rows.
+
+    The columns and dtypes are resolved from the formatbook as ``gl.Sumstats`` does, so
+    each chunk can be passed to ``gl.Sumstats(chunk, fmt=input_format)``.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the summary statistics file
+    input_format : str
+        Formatbook format of the input
+    input_separator : str
+        Column separator
+    chunk_size : int
+        Number of rows per chunk
+    include : list, optional
+        GWASLab names of the columns to read, all the formatbook columns if None
+
+    Yields
+    ------
+    pd.DataFrame
+        Raw chunk with the input column names
+    """
+    log = Log()
+    meta_data, rename_dictionary, readargs, _ = _load_format_config(
+        fmt=input_format, readargs={"sep": input_separator}, other=[], log=log, verbose=False
+    )
+    inpath, _, _, _, _, usecols, dtype_dictionary = _check_path_and_header(
+        input_path, input_format, meta_data, readargs, [], {}, rename_dictionary, log, False
+    )
+    usecols = _apply_column_filters(include=include, usecols=usecols, rename_dictionary=rename_dictionary, log=log)
+    with pd.read_table(
+        inpath, usecols=set(usecols), dtype=dtype_dictionary, chunksize=chunk_size, **readargs
+    ) as reader:
+        yield from reader
+
+
+def concat_chunks(frames):
+    """Concatenate processed chunks, restoring the categorical columns merged as object."""
+    data = pd.concat(frames, ignore_index=True)
+    for col, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and col in data.columns:
+            data[col] = data[col].astype("category")
+    return data
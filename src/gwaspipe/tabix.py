@@ -0,0 +1,176 @@
+"""
+Tabix index of a BGZF output, built while writing.
+
+The writer reports the sequence, the position and the uncompressed offsets of each
+batch of lines, and the index is computed at the end from the block offsets of the
+BGZF writer, without reading the output again. The index is in the tabix (.tbi)
+format, with the binning scheme of htslib: 16 kbp leaf bins and a linear index of
+16 kbp windows.
+"""
+
+import struct
+
+import numpy as np
+import pandas as pd
+
+from gwaspipe.bgzf import BLOCK_SIZE, BgzfWriter
+
+# Largest position addressed by the .tbi binning scheme
+MAX_POSITION = 2**29
+
+_MIN_SHIFT = 14
+_DEPTH = 5
+# Pseudo-bin holding the offsets and the number of records of a sequence
+_META_BIN = 37450
+
+_TBI_GENERIC = 0
+
+
+def reg2bin(beg, end):
+    """Return the bins of the 0-based half-open intervals, see the SAM specification."""
+    beg = np.asarray(beg, dtype=np.int64)
+    last = np.asarray(end, dtype=np.int64) - 1
+    bins = np.zeros(beg.shape, dtype=np.int64)
+    assigned = np.zeros(beg.shape, dtype=bool)
+    for level in range(_DEPTH, 0, -1):
+        shift = _MIN_SHIFT + 3 * (_DEPTH - level)
+        fits = ~assigned & ((beg >> shift) == (last >> shift))
+        bins[fits] = ((1 << 3 * level) - 1) // 7 + (beg[fits] >> shift)
+        assigned |= fits
+    return bins
+
+
+class TabixIndexer:
+    """
+    Collect the lines of a BGZF output and write their tabix index.
+
+    Parameters
+    ----------
+    col_seq, col_beg, col_end : int
+        1-based columns of the sequence name, the start and the end positions
+    skip : int, default=1
+        Number of header lines
+    """
+
+    def __init__(self, col_seq, col_beg, col_end=None, skip=1):
+        self.col_seq = col_seq
+        self.col_beg = col_beg
+        self.col_end = col_end if col_end is not None else col_beg
+        self.skip = skip
+        self.names = []
+        self._name_ids = {}
+        self._seq_ids = []
+        self._positions = []
+        self._offsets = []
+
+    def add(self, names, positions, text_offset, text):
+        """
+        Add a batch of lines.
+
+        Parameters
+        ----------
+        names : np.ndarray
+            Sequence name of each line
+        positions : np.ndarray
+            1-based position of each line
+        text_offset : int
+            Uncompressed offset of the batch in the output
+        text : bytes
+            Lines of the batch
+        """
+        line_ends = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == ord("\n")) + 1
+        if len(line_ends) != len(names):
+            raise ValueError("Each line needs a sequence name and a position")
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        for name in uniques:
+            if name not in self._name_ids:
+                self._name_ids[name] = len(self.names)
+                self.names.append(name)
+        ids = np.array([self._name_ids[name] for name in uniques], dtype=np.int64)
+        self._seq_ids.append(ids[codes])
+        self._positions.append(np.asarray(positions, dtype=np.int64))
+        self._offsets.append(text_offset + np.concatenate(([0], line_ends)))
+
+    def write(self, path, block_offsets):
+        """
+        Write the index.
+
+        Parameters
+        ----------
+        path : str
+            Index path, usually the output path followed by .tbi
+        block_offsets : list
+            Offsets of the blocks of the output, see BgzfWriter.block_offsets
+        """
+        seq_ids = np.concatenate(self._seq_ids) if self._seq_ids else np.empty(0, dtype=np.int64)
+        positions = np.concatenate(self._positions) if self._positions else np.empty(0, dtype=np.int64)
+        same_seq = seq_ids[1:] == seq_ids[:-1]
+        # Sequence ids are numbered in order of appearance, so a sequence seen again has a smaller id
+        if np.any(seq_ids[1:] < seq_ids[:-1]) or np.any(same_seq & (positions[1:] < positions[:-1])):
+            raise ValueError("The lines must be sorted by sequence and position")
+        if np.any(positions < 1) or np.any(positions >= MAX_POSITION):
+            raise ValueError(f"Positions must be between 1 and {MAX_POSITION - 1} for a .tbi index")
+
+        block_offsets = np.asarray(block_offsets, dtype=np.uint64)
+
+        def voffsets(uoffsets):
+            uoffsets = np.concatenate(uoffsets) if uoffsets else np.empty(0, dtype=np.int64)
+            blocks = block_offsets[uoffsets // BLOCK_SIZE]
+            return (blocks << np.uint64(16)) | (uoffsets % BLOCK_SIZE).astype(np.uint64)
+
+        # Virtual offsets of the start and of the end of each line
+        vstarts = voffsets([offsets[:-1] for offsets in self._offsets])
+        vends = voffsets([offsets[1:] for offsets in self._offsets])
+
+        names = b"".join(name.encode() + b"\0" for name in self.names)
+        header = b"TBI\1" + struct.pack(
+            "<8i",
+            len(self.names),
+            _TBI_GENERIC,
+            self.col_seq,
+            self.col_beg,
+            self.col_end,
+            ord("#"),
+            self.skip,
+            len(names),
+        )
+        parts = [header, names]
+        beg = positions - 1
+        bins = reg2bin(beg, positions)
+        bounds = np.searchsorted(seq_ids, np.arange(len(self.names) + 1))
+        for seq_id in range(len(self.names)):
+            lo, hi = bounds[seq_id], bounds[seq_id + 1]
+            parts.append(_sequence_index(bins[lo:hi], beg[lo:hi], vstarts[lo:hi], vends[lo:hi]))
+
+        with BgzfWriter(path) as output:
+            output.write(b"".join(parts))
+
+
+def _sequence_index(bins, beg, vstarts, vends):
+    """Return the binning and linear index of the records of a sequence, sorted by position."""
+    # Chunks: runs of consecutive records in the same bin
+    run_starts = np.flatnonzero(np.concatenate(([True], bins[1:] != bins[:-1])))
+    run_ends = np.append(run_starts[1:], len(bins)) - 1
+    chunks = {}
+    for start, end in zip(run_starts.tolist(), run_ends.tolist()):
+        chunks.setdefault(int(bins[start]), []).append((int(vstarts[start]), int(vends[end])))
+    parts = [struct.pack("<i", len(chunks) + 1)]
+    for bin_id, bin_chunks in sorted(chunks.items()):
+        parts.append(struct.pack("<Ii", bin_id, len(bin_chunks)))
+        parts.append(struct.pack(f"<{2 * len(bin_chunks)}Q", *[offset for chunk in bin_chunks for offset in chunk]))
+    parts.append(struct.pack("<Ii", _META_BIN, 2))
+    parts.append(struct.pack("<4Q", int(vstarts[0]), int(vends[-1]), len(bins), 0))
+
+    # Linear index: offset of the first record starting in each window, the empty windows
+    # take the offset of the previous window, or of the first record before it
+    windows = beg >> _MIN_SHIFT
+    first = np.flatnonzero(np.concatenate(([True], windows[1:] != windows[:-1])))
+    linear = np.full(int(windows[-1]) + 1, vstarts[0], dtype=np.uint64)
+    filled = np.zeros(len(linear), dtype=bool)
+    linear[windows[first]] = vstarts[first]
+    filled[windows[first]] = True
+    last_filled = np.maximum.accumulate(np.where(filled, np.arange(len(linear)), 0))
+    linear = linear[last_filled]
+    parts.append(struct.pack("<i", len(linear)))
+    parts.append(linear.astype("<u8").tobytes())
+    return b"".join(parts)
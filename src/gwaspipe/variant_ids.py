@@ -0,0 +1,71 @@
+"""
+Vectorized parsing of delimited variant IDs.
+
+A variant ID column such as ``chr1_123_G_A_b38`` (GTEx) or ``1:123:A:G`` (GWASLab)
+is tokenized once with the pyarrow string kernels, and the requested fields are
+extracted as typed columns without building an expanded DataFrame per field.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Fields of the variant IDs, None skips the token
+GWASLAB_ID_FIELDS = ("CHR", "POS", "EA", "NEA")
+GTEX_ID_FIELDS = ("CHR", "POS", "NEA", "EA")
+
+# Fields parsed as integers
+INTEGER_FIELDS = ("POS",)
+
+_PANDAS_TYPES = {pa.int64(): pd.Int64Dtype(), pa.string(): pd.StringDtype("pyarrow")}
+
+
+def _to_arrow_strings(ids):
+    array = pa.array(ids, from_pandas=True)
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+    return pc.cast(array, pa.string())
+
+
+def _to_series(values, index):
+    return pd.Series(values.to_pandas(types_mapper=_PANDAS_TYPES.get).array, index=index)
+
+
+def parse_variant_ids(ids, sep=":", fields=GWASLAB_ID_FIELDS):
+    """
+    Split a variant ID column into typed field columns in a single pass.
+
+    Parameters
+    ----------
+    ids : pd.Series
+        Variant IDs
+    sep : str, default=':'
+        Separator between the fields of the IDs
+    fields : tuple, default=GWASLAB_ID_FIELDS
+        Name of each leading token of the IDs, None to skip a token. Further tokens
+        (e.g. the build suffix of GTEx IDs) are ignored
+
+    Returns
+    -------
+    pd.DataFrame
+        One column per named field, with the index of ids. POS is Int64 and the other
+        fields string[pyarrow]; all the fields are missing for IDs with fewer tokens
+    """
+    tokens = pc.split_pattern(_to_arrow_strings(ids), sep)
+    complete = pc.greater_equal(pc.list_value_length(tokens), len(fields))
+    tokens = pc.if_else(complete, tokens, pa.scalar(None, type=tokens.type))
+
+    parsed = {}
+    for position, field in enumerate(fields):
+        if field is None:
+            continue
+        values = pc.list_element(tokens, position)
+        if field in INTEGER_FIELDS:
+            values = pc.cast(values, pa.int64())
+        parsed[field] = _to_series(values, ids.index)
+    return pd.DataFrame(parsed, index=ids.index)
+
+
+def replace_separator(ids, sep, new_sep):
+    """Rewrite the separator of a variant ID column, e.g. 1_123_A_G to 1:123:A:G."""
+    return _to_series(pc.replace_substring(_to_arrow_strings(ids), sep, new_sep), ids.index)
@@ -0,0 +1,380 @@
+"""
+Native writer of the delimited-text output formats.
+
+The rows are formatted in batches with a single printf-style template per batch,
+the float columns with the fixed-precision format of each column, and the text is
+compressed as BGZF blocks on a thread pool, see gwaspipe.bgzf. The column mapping,
+the separator and the missing value of the output format are read from the
+formatbook. The decompressed output is identical to the output of the GWASLab
+``to_format`` writer, which is used instead when the output needs a feature that is
+not supported here, see unsupported_reason. With tabix, the rows are sorted by
+chromosome and position and the tabix index is built while writing, see
+gwaspipe.tabix.
+"""
+
+import copy
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from gwaslab.bd.bd_common_data import get_format_dict, get_formats_list, get_number_to_chr
+from gwaslab.io.io_to_formats import md5sum_file
+
+from gwaspipe.bgzf import DEFAULT_LEVEL, BgzfWriter
+from gwaspipe.fanout import SharedEncoding
+from gwaspipe.tabix import MAX_POSITION, TabixIndexer
+
+# Float formats applied by GWASLab, overridden by the float_formats parameter
+DEFAULT_FLOAT_FORMATS = {
+    "EAF": "{:.4g}",
+    "MAF": "{:.4g}",
+    "BETA": "{:.4f}",
+    "SE": "{:.4f}",
+    "BETA_95U": "{:.4f}",
+    "BETA_95L": "{:.4f}",
+    "Z": "{:.4f}",
+    "CHISQ": "{:.4f}",
+    "F": "{:.4f}",
+    "OR": "{:.4f}",
+    "OR_95U": "{:.4f}",
+    "OR_95L": "{:.4f}",
+    "HR": "{:.4f}",
+    "HR_95U": "{:.4f}",
+    "HR_95L": "{:.4f}",
+    "INFO": "{:.4f}",
+    "P": "{:.4e}",
+    "MLOG10P": "{:.4f}",
+    "DAF": "{:.4f}",
+}
+
+# to_format parameters handled by the native writer
+SUPPORTED_PARAMS = frozenset(
+    {
+        "fmt",
+        "tab_fmt",
+        "cols",
+        "no_status",
+        "output_log",
+        "float_formats",
+        "xymt_number",
+        "xymt",
+        "chr_prefix",
+        "md5sum",
+        "gzip",
+        "to_csvargs",
+        "id_use",
+        "verbose",
+    }
+)
+
+# to_csvargs keys handled by the native writer, GWASLab sets the separator and the missing value
+SUPPORTED_CSV_ARGS = frozenset({"compression", "mode", "header", "sep", "na_rep"})
+
+# Output formats written by GWASLab with their own layout
+NON_TABULAR_FORMATS = frozenset({"vcf", "bed", "vep", "annovar", "ssf"})
+
+FLOAT_DTYPES = ("Float32", "Float64", "float64", "float32", "float16", "float")
+
+DEFAULT_BATCH_ROWS = 200_000
+
+# Characters that make pandas quote a field
+_QUOTED_CHARACTERS = ('"', "\n", "\r")
+
+_PRINTF_FORMAT = re.compile(r"^\{:(\.\d+)?([eEfFgG])\}$")
+
+
+def unsupported_reason(data, path, gl_params):
+    """
+    Return why the native writer cannot write the output, None if it can.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Summary statistics dataframe
+    path : str
+        Output path prefix
+    gl_params : dict
+        to_format parameters
+
+    Returns
+    -------
+    str or None
+        Reason to fall back to the GWASLab writer
+    """
+    unsupported = sorted(set(gl_params) - SUPPORTED_PARAMS)
+    if unsupported:
+        return f"parameters {', '.join(unsupported)}"
+    if "@" in path:
+        return "one file per chromosome"
+    fmt = gl_params.get("fmt", "gwaslab")
+    if fmt in NON_TABULAR_FORMATS or fmt not in get_formats_list():
+        return f"{fmt} format"
+    if gl_params.get("tab_fmt", "tsv") not in ("tsv", "csv"):
+        return f"{gl_params['tab_fmt']} tabular format"
+    to_csvargs = gl_params.get("to_csvargs") or {}
+    unsupported = sorted(set(to_csvargs) - SUPPORTED_CSV_ARGS)
+    if unsupported:
+        return f"to_csvargs {', '.join(unsupported)}"
+    compression = to_csvargs.get("compression", "infer")
+    method = compression.get("method") if isinstance(compression, dict) else compression
+    if method not in ("infer", "gzip", None):
+        return f"{method} compression"
+    meta_data, rename_dictionary = get_format_dict(fmt, inverse=True)
+    sep = meta_data.get("format_separator", "\t")
+    for col in data.columns:
+        if col not in rename_dictionary and col not in (gl_params.get("cols") or []):
+            continue
+        values = data[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = pd.Series(values.cat.categories)
+        if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            text = "".join(map(str, values.dropna().tolist()))
+            if any(c in text for c in (sep, *_QUOTED_CHARACTERS)):
+                return f"{col} values that need quoting"
+        elif not (
+            pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)
+        ) or pd.api.types.is_complex_dtype(values):
+            return f"{col} column of dtype {values.dtype}"
+    return None
+
+
+def _default_xymt(sumstats):
+    chromosomes = getattr(sumstats, "chromosomes", None)
+    if chromosomes is None:
+        return ["X", "Y", "MT"]
+    xymt = list(chromosomes.sex_chromosomes[:2])
+    if chromosomes.mitochondrial:
+        xymt.append(chromosomes.mitochondrial)
+    return xymt or ["X", "Y", "MT"]
+
+
+def _chr_labels(sumstats, xymt_number, xymt, chr_prefix):
+    """Return the chromosome labels written, as GWASLab maps the chromosome numbers."""
+    values = sumstats.data["CHR"]
+    if not xymt_number and pd.api.types.is_integer_dtype(values):
+        species = sumstats.meta.get("gwaslab", {}).get("species", None)
+        return values.map(get_number_to_chr(xymt=xymt, prefix=chr_prefix, species=species))
+    if chr_prefix:
+        return chr_prefix + values.astype("string")
+    return values
+
+
+def _output_columns(data, rename_dictionary, meta_data, cols, no_status):
+    """Return the ``(column, header)`` pairs written, in the order of the output format."""
+    columns = []
+    for col in [col for col in data.columns if col in rename_dictionary] + list(cols):
+        if col not in columns:
+            columns.append(col)
+    if no_status and "STATUS" in columns:
+        columns.remove("STATUS")
+    headers = {col: rename_dictionary.get(col, col) for col in columns}
+    col_order = meta_data.get("format_col_order")
+    if col_order:
+        fixed = [col for header in col_order for col in columns if headers[col] == header]
+        columns = fixed + [col for col in columns if headers[col] not in col_order]
+    return [(col, headers[col]) for col in columns]
+
+
+def _column_formatter(values, float_format, na_rep):
+    """
+    Return the printf conversion of a column and the function converting the values of a slice or of row positions.
+
+    The float values with a format are formatted as by ``float_format.format``, missing
+    values included, the missing values of the other columns are written as na_rep.
+    """
+    dtype = str(values.dtype)
+    if float_format is not None and dtype in FLOAT_DTYPES:
+        floats = values.to_numpy(dtype="float64", na_value=np.nan)
+        match = _PRINTF_FORMAT.match(float_format)
+        if match:
+            return "%" + (match.group(1) or "") + match.group(2), lambda rows: floats[rows].tolist()
+        return "%s", lambda rows: [float_format.format(x) for x in floats[rows].tolist()]
+
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(values) and not missing.any():
+        array = values.to_numpy(dtype=bool)
+    elif pd.api.types.is_integer_dtype(values) and not missing.any():
+        array = values.to_numpy(dtype="int64")
+    elif pd.api.types.is_float_dtype(values):
+        # Shortest representation, as written by pandas
+        floats = values.to_numpy(dtype=getattr(values.dtype, "numpy_dtype", values.dtype), na_value=np.nan)
+        array = np.where(missing, na_rep, floats.astype(str)).astype(object)
+    else:
+        array = values.to_numpy(dtype=object, na_value=na_rep)
+    return "%s", lambda rows: array[rows].tolist()
+
+
+def _tabix_unsupported_reason(data, columns, compress, append):
+    """Return why the output cannot be indexed with tabix, None if it can."""
+    if not compress:
+        return "uncompressed output"
+    if append:
+        return "appended output"
+    written = [col for col, _ in columns]
+    if "CHR" not in written or "POS" not in written:
+        return "output without CHR and POS"
+    if data["CHR"].isna().any() or data["POS"].isna().any():
+        return "missing CHR or POS"
+    if len(data) and (data["POS"].min() < 1 or data["POS"].max() >= MAX_POSITION):
+        return f"POS outside of 1-{MAX_POSITION - 1}"
+    return None
+
+
+def _coordinate_order(chromosomes, positions):
+    """Return the row positions sorting by chromosome and position, None if already sorted."""
+    if pd.api.types.is_integer_dtype(chromosomes):
+        chromosomes = chromosomes.to_numpy(dtype="int64")
+    else:
+        chromosomes = chromosomes.astype(str).to_numpy(dtype=str)
+    same_chr = chromosomes[1:] == chromosomes[:-1]
+    if np.all((chromosomes[1:] > chromosomes[:-1]) | (same_chr & (positions[1:] >= positions[:-1]))):
+        return None
+    return np.lexsort((positions, chromosomes))
+
+
+def write_tabular(
+    sumstats,
+    path,
+    fmt="gwaslab",
+    tab_fmt="tsv",
+    cols=None,
+    no_status=False,
+    output_log=True,
+    float_formats=None,
+    xymt_number=False,
+    xymt=None,
+    chr_prefix="",
+    md5sum=False,
+    gzip=True,
+    to_csvargs=None,
+    id_use="rsID",
+    threads=1,
+    batch_rows=DEFAULT_BATCH_ROWS,
+    tabix=False,
+    encoding=None,
+    verbose=True,
+):
+    """
+    Write the sumstats in a delimited-text output format.
+
+    Parameters
+    ----------
+    sumstats : gl.Sumstats
+        Sumstats object
+    path : str
+        Output path prefix, the format and the extension are appended as by GWASLab
+    fmt, tab_fmt, cols, no_status, output_log, float_formats, xymt_number, xymt, chr_prefix, md5sum, gzip, to_csvargs
+        GWASLab to_format parameters
+    id_use : str
+        Unused, accepted for compatibility with the to_format parameters
+    threads : int, default=1
+        Number of compression threads
+    batch_rows : int
+        Number of rows formatted at once
+    tabix : bool, default=False
+        Whether to sort the rows by chromosome and position and to write the tabix index
+        of the output, at the output path followed by .tbi
+    encoding : SharedEncoding, optional
+        Column encodings shared with the other outputs of a fan-out stage, see gwaspipe.fanout
+    verbose : bool, default=True
+        Whether to print verbose output
+
+    Returns
+    -------
+    str
+        Output path
+    """
+    data = sumstats.data
+    to_csvargs = dict(to_csvargs or {})
+    log = copy.deepcopy(sumstats.log)
+    log.write("Start to convert the output sumstats in: ", fmt, " format", verbose=verbose)
+
+    formats = {**DEFAULT_FLOAT_FORMATS, **(float_formats or {})}
+    formats = {col: f for col, f in formats.items() if col in data.columns and str(data[col].dtype) in FLOAT_DTYPES}
+    log.write(" -Formatting statistics ...", verbose=verbose)
+    log.write("  - Columns       :", list(formats), verbose=verbose)
+    log.write("  - Output formats:", list(formats.values()), verbose=verbose)
+
+    meta_data, rename_dictionary = get_format_dict(fmt, inverse=True)
+    compression = to_csvargs.pop("compression", "infer")
+    level = compression.get("compresslevel", DEFAULT_LEVEL) if isinstance(compression, dict) else DEFAULT_LEVEL
+    log_path = f"{path}.{fmt}.log"
+    path = f"{path}.{fmt}.{tab_fmt}.gz" if gzip else f"{path}.{fmt}.{tab_fmt}"
+    compress = path.endswith(".gz") or isinstance(compression, dict) or compression == "gzip"
+    sep = meta_data.get("format_separator", "\t")
+    na_rep = meta_data.get("format_na", to_csvargs.get("na_rep", ""))
+    log.write(" -Start outputting sumstats in " + fmt + " format...", verbose=verbose)
+    log.write(" -Output path:", path, verbose=verbose)
+
+    columns = _output_columns(data, rename_dictionary, meta_data, cols or [], no_status)
+    log.write(" -Output columns: {}".format(",".join(header for _, header in columns)), verbose=verbose)
+
+    formatters = []
+    encoding = encoding if encoding is not None else SharedEncoding()
+    xymt = xymt if xymt is not None else _default_xymt(sumstats)
+    labels_key = ("CHR", xymt_number, tuple(xymt), chr_prefix)
+    for col, _ in columns:
+        if col == "CHR":
+            chr_names = encoding.get(labels_key, lambda: _chr_labels(sumstats, xymt_number, xymt, chr_prefix))
+            key = (col, formats.get(col), na_rep, labels_key)
+            formatters.append(encoding.get(key, lambda: _column_formatter(chr_names, formats.get("CHR"), na_rep)))
+        else:
+            key = (col, formats.get(col), na_rep)
+            formatters.append(encoding.get(key, lambda: _column_formatter(data[col], formats.get(col), na_rep)))
+
+    line_terminator = os.linesep
+    template = sep.replace("%", "%%").join(spec for spec, _ in formatters) + line_terminator
+    mode = "ab" if to_csvargs.get("mode", "w").startswith("a") else "wb"
+    write_header = to_csvargs.get("header", True)
+
+    indexer = None
+    order = None
+    if tabix:
+        reason = _tabix_unsupported_reason(data, columns, compress, mode == "ab")
+        if reason is None:
+            written = [col for col, _ in columns]
+            indexer = TabixIndexer(written.index("CHR") + 1, written.index("POS") + 1, skip=1 if write_header else 0)
+            positions = data["POS"].to_numpy(dtype="int64")
+            order = encoding.get("coordinate_order", lambda: _coordinate_order(data["CHR"], positions))
+            chr_names = chr_names.astype(str).to_numpy(dtype=object)
+            if order is not None:
+                log.write(" -Sorting the rows by CHR and POS for the tabix index...", verbose=verbose)
+                chr_names, positions = chr_names[order], positions[order]
+        else:
+            log.write(f" -Tabix index not supported for {reason}, writing without index", verbose=verbose)
+
+    log.write(" -Writing sumstats to: {}...".format(path), verbose=verbose)
+    if compress:
+        output = BgzfWriter(path, mode=mode, level=level, threads=threads)
+    else:
+        output = open(path, mode)
+    with output:
+        text_offset = 0
+        if write_header:
+            text = (sep.join(header for _, header in columns) + line_terminator).encode()
+            output.write(text)
+            text_offset += len(text)
+        for start in range(0, len(data), batch_rows):
+            stop = min(start + batch_rows, len(data))
+            batch = slice(start, stop) if order is None else order[start:stop]
+            rows = np.empty((stop - start, len(formatters)), dtype=object)
+            for i, (_, convert) in enumerate(formatters):
+                rows[:, i] = convert(batch)
+            text = ((template * (stop - start)) % tuple(rows.ravel().tolist())).encode()
+            if indexer is not None:
+                indexer.add(chr_names[start:stop], positions[start:stop], text_offset, text)
+            output.write(text)
+            text_offset += len(text)
+
+    if indexer is not None:
+        log.write(" -Writing the tabix index to: {}.tbi".format(path), verbose=verbose)
+        indexer.write(f"{path}.tbi", output.block_offsets)
+
+    if md5sum:
+        md5sum_file(path, log, verbose)
+    if output_log:
+        log.write(" -Saving log file to: {}".format(log_path), verbose=verbose)
+        log.write("Finished outputting successfully!", verbose=verbose)
+        log.save(log_path, verbose=False)
+    return path
@@ -0,0 +1,46 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+from gwaspipe.bgzf import BLOCK_SIZE, EOF_BLOCK, BgzfWriter, compress_block
+
+
+class TestBgzf(unittest.TestCase):
+    """Tests for the BGZF writer."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name, "test.gz")
+        self.data = b"".join(f"1\t{pos}\tA\tG\t0.{pos}\n".encode() for pos in range(50000))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_compress_block(self):
+        """Test a block is a gzip member with its size in the BC extra field."""
+        block = compress_block(b"abc")
+        self.assertEqual(block[12:14], b"BC")
+        self.assertEqual(int.from_bytes(block[16:18], "little") + 1, len(block))
+        self.assertEqual(gzip.decompress(block), b"abc")
+
+    def test_write(self):
+        """Test the decompressed content over several writes and threads."""
+        with BgzfWriter(self.path, threads=3) as output:
+            output.write(self.data[:1000])
+            output.write(self.data[1000:])
+        self.assertGreater(len(self.data), 2 * BLOCK_SIZE)
+        self.assertEqual(gzip.decompress(self.path.read_bytes()), self.data)
+        self.assertTrue(self.path.read_bytes().endswith(EOF_BLOCK))
+
+    def test_append(self):
+        """Test appending blocks to an existing file."""
+        with BgzfWriter(self.path) as output:
+            output.write(b"header\n")
+        with BgzfWriter(self.path, mode="ab") as output:
+            output.write(self.data)
+        self.assertEqual(gzip.decompress(self.path.read_bytes()), b"header\n" + self.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
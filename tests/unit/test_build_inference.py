@@ -0,0 +1,96 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import gwaslab as gl
+import numpy as np
+import pandas as pd
+from gwaslab.info.g_vchange_status import vchange_status
+
+from gwaspipe.build_inference import (
+    BuildCache,
+    infer_build,
+    input_key,
+    position_codes,
+    sample_rows,
+    set_inferred_build,
+)
+
+
+class TestBuildInference(unittest.TestCase):
+    """Tests for the sampled genome build inference."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        chrom = rng.integers(1, 23, 20000)
+        pos = rng.integers(1, 10**8, 20000)
+        self.hapmap = {
+            "19": np.unique(position_codes(chrom[:10000], pos[:10000])),
+            "38": np.unique(position_codes(chrom[10000:], pos[10000:])),
+        }
+        # hg19 variants, a fifth of them in HapMap3
+        n = 200000
+        rows = rng.integers(0, 10000, n // 5)
+        self.data = pd.DataFrame(
+            {
+                "CHR": pd.array(np.concatenate([chrom[rows], rng.integers(1, 23, n - n // 5)]), dtype="Int64"),
+                "POS": pd.array(np.concatenate([pos[rows], rng.integers(1, 10**8, n - n // 5)]), dtype="Int64"),
+            }
+        ).sort_values(["CHR", "POS"], ignore_index=True)
+
+    def test_sampled(self):
+        """Test the build is inferred from a sample of the variants."""
+        build, counts, tested = infer_build(self.data, self.hapmap)
+        self.assertEqual(build, "19")
+        self.assertLess(tested, len(self.data) // 10)
+        self.assertGreater(counts[0], counts[1])
+
+    def test_inconclusive_sample(self):
+        """Test all the variants are matched when the samples are not conclusive."""
+        data = self.data.iloc[:100]
+        build, counts, tested = infer_build(data, {"19": self.hapmap["19"], "38": self.hapmap["19"]})
+        self.assertEqual((build, tested), ("Unknown", 100))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_sample_rows(self):
+        """Test one row is drawn from each block."""
+        rows = sample_rows(1000, 100, np.random.default_rng(1))
+        np.testing.assert_array_equal(rows // 10, np.arange(100))
+
+    def test_status(self):
+        """Test the STATUS codes are changed as by GWASLab."""
+        data = self.data.iloc[:50].assign(EA="A", NEA="G", BETA=0.1, SE=0.1, P=0.5)
+        for build in ("19", "38"):
+            sumstats = gl.Sumstats(data.copy(), fmt="gwaslab", verbose=False)
+            expected = vchange_status(sumstats.data["STATUS"], 1, "9", "1" if build == "19" else "3")
+            if build == "38":
+                expected = vchange_status(expected, 2, "9", "8")
+            set_inferred_build(sumstats, build)
+            pd.testing.assert_series_equal(sumstats.data["STATUS"], expected, check_names=False, check_dtype=False)
+            self.assertEqual(sumstats.meta["gwaslab"]["genome_build"], build)
+
+    def test_status_dtype(self):
+        """Test the STATUS codes keep their dtype, e.g. the compact int32 of the dtype plan."""
+        data = self.data.iloc[:50].assign(EA="A", NEA="G", BETA=0.1, SE=0.1, P=0.5)
+        for dtype in ("Int64", "int32"):
+            sumstats = gl.Sumstats(data.copy(), fmt="gwaslab", verbose=False)
+            sumstats.data["STATUS"] = sumstats.data["STATUS"].astype(dtype)
+            set_inferred_build(sumstats, "38")
+            self.assertEqual(sumstats.data["STATUS"].dtype, dtype)
+            self.assertTrue(sumstats.data["STATUS"].astype(str).str.startswith("38").all())
+
+    def test_sidecar(self):
+        """Test the inferred build is stored by input and initial build."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = Path(tmp_dir, "input.tsv")
+            input_path.write_text("CHR\tPOS\n")
+            cache = BuildCache(Path(tmp_dir, "cache"))
+            key = input_key(input_path, "99")
+            self.assertIsNone(cache.get(key))
+            cache.put(key, "38", [1, 100], 4096)
+            self.assertEqual(BuildCache(Path(tmp_dir, "cache")).get(key), "38")
+            self.assertNotEqual(key, input_key(input_path, "19"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import gwaslab as gl
+import pandas as pd
+
+from gwaspipe.checkpoint import DEFAULT_CHECKPOINT_STEPS, Checkpoint, resolve_checkpoint_steps, run_fingerprint
+
+
+class TestRunFingerprint(unittest.TestCase):
+    """Tests for the run_fingerprint function."""
+
+    def setUp(self):
+        self.input_path = "tests/data/test_sumstats.tsv"
+
+    def test_stable(self):
+        """Test the fingerprint of the same run is stable."""
+        config = {"run_sequence": {1: "basic_check"}}
+        self.assertEqual(
+            run_fingerprint(self.input_path, config, input_file_format="regenie"),
+            run_fingerprint(self.input_path, config, input_file_format="regenie"),
+        )
+
+    def test_config_and_options_change(self):
+        """Test the fingerprint changes with the configuration and the options."""
+        fingerprint = run_fingerprint(self.input_path, {"n_cores": 1}, input_file_format="regenie")
+        self.assertNotEqual(fingerprint, run_fingerprint(self.input_path, {"n_cores": 2}, input_file_format="regenie"))
+        self.assertNotEqual(fingerprint, run_fingerprint(self.input_path, {"n_cores": 1}, input_file_format="gtex"))
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Tests for the Checkpoint class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name, "checkpoint")
+        self.sumstats = gl.Sumstats("tests/data/test_sumstats.tsv", fmt="regenie", sep=" ", verbose=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resolve_steps(self):
+        """Test the checkpoint configuration values."""
+        self.assertEqual(resolve_checkpoint_steps(True), DEFAULT_CHECKPOINT_STEPS)
+        self.assertEqual(resolve_checkpoint_steps(None), ())
+        self.assertEqual(resolve_checkpoint_steps(["harmonize"]), ("harmonize",))
+
+    def test_save_and_restore(self):
+        """Test the restored Sumstats object has the same data, metadata and log."""
+        checkpoint = Checkpoint(self.path, "abc")
+        self.assertIsNone(checkpoint.completed_step())
+        checkpoint.save(self.sumstats, "basic_check")
+        self.assertEqual(len(self.sumstats.data), 3)
+
+        self.assertEqual(checkpoint.completed_step(), "basic_check")
+        restored = checkpoint.restore()
+        pd.testing.assert_frame_equal(restored.data, self.sumstats.data)
+        self.assertEqual(restored.meta, self.sumstats.meta)
+        self.assertEqual(restored.log.log_text, self.sumstats.log.log_text)
+
+    def test_other_run_is_not_resumed(self):
+        """Test a checkpoint of a different run is ignored."""
+        Checkpoint(self.path, "abc").save(self.sumstats, "basic_check")
+        self.assertIsNone(Checkpoint(self.path, "def").completed_step())
+
+    def test_clear(self):
+        """Test clearing the checkpoint."""
+        checkpoint = Checkpoint(self.path, "abc")
+        checkpoint.save(self.sumstats, "basic_check")
+        checkpoint.clear()
+        self.assertIsNone(checkpoint.completed_step())
+        self.assertEqual(list(self.path.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
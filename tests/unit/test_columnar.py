@@ -0,0 +1,80 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import gwaslab as gl
+import pandas as pd
+import pyarrow as pa
+
+from gwaspipe.columnar import SUMSTATS_METADATA_KEY, _ShellPickler, dump_sumstats, load_sumstats
+from gwaspipe.dtypes import DEFAULT_DTYPE_PLAN, apply_dtype_plan
+
+
+class TestColumnar(unittest.TestCase):
+    """Tests for the dump_sumstats and load_sumstats functions."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name, "sumstats.feather")
+        self.sumstats = gl.Sumstats("tests/data/test_sumstats.tsv", fmt="regenie", sep=" ", verbose=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        """Test the loaded Sumstats object has the same data, metadata and log."""
+        dump_sumstats(self.sumstats, self.path)
+        self.assertEqual(len(self.sumstats.data), 3)
+        loaded = load_sumstats(self.path)
+        pd.testing.assert_frame_equal(loaded.data, self.sumstats.data)
+        self.assertEqual(loaded.meta, self.sumstats.meta)
+        self.assertEqual(loaded.log.log_text, self.sumstats.log.log_text)
+
+    def test_sumstats_not_mutated(self):
+        """Test the table of the Sumstats object stays whole while the shell is pickled."""
+        data, real_dump = self.sumstats.data, _ShellPickler.dump
+
+        def dump(pickler, shell):
+            self.assertIs(self.sumstats.data, data)
+            return real_dump(pickler, shell)
+
+        with patch.object(_ShellPickler, "dump", dump):
+            dump_sumstats(self.sumstats, self.path)
+        self.assertEqual(len(load_sumstats(self.path).data), 3)
+
+    def test_shell_holds_no_rows(self):
+        """Test the pickled shell does not grow with the table and the log is rebound on load."""
+        dump_sumstats(self.sumstats, self.path)
+        small = pa.ipc.open_file(str(self.path)).schema.metadata[SUMSTATS_METADATA_KEY]
+        self.sumstats.data = pd.concat([self.sumstats.data] * 10000, ignore_index=True)
+        dump_sumstats(self.sumstats, self.path)
+        large = pa.ipc.open_file(str(self.path)).schema.metadata[SUMSTATS_METADATA_KEY]
+        self.assertLess(len(large), len(small) + 1024)
+        loaded = load_sumstats(self.path, columns={"CHR"})
+        self.assertIs(loaded.log._sumstats_obj, loaded)
+        self.assertEqual(len(loaded.data), 30000)
+
+    def test_compact_dtypes(self):
+        """Test the compact dtypes of the dtype plan are kept."""
+        apply_dtype_plan(self.sumstats.data, DEFAULT_DTYPE_PLAN, verbose=False)
+        dump_sumstats(self.sumstats, self.path)
+        pd.testing.assert_series_equal(load_sumstats(self.path).data.dtypes, self.sumstats.data.dtypes)
+
+    def test_columns(self):
+        """Test only the selected columns are loaded and the data is writable."""
+        dump_sumstats(self.sumstats, self.path)
+        loaded = load_sumstats(self.path, columns={"CHR", "POS", "MISSING"})
+        self.assertEqual(list(loaded.data.columns), ["CHR", "POS"])
+        loaded.data.loc[0, "POS"] = 1
+        self.assertEqual(loaded.data.loc[0, "POS"], 1)
+
+    def test_not_a_checkpoint(self):
+        """Test a Feather file without the Sumstats object is rejected."""
+        self.sumstats.data.to_feather(self.path)
+        with self.assertRaises(ValueError):
+            load_sumstats(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
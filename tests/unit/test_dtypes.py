@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from gwaslab.info.g_Log import Log
+
+from gwaspipe.dtypes import DEFAULT_DTYPE_PLAN, apply_dtype_plan, resolve_dtype_plan
+
+
+class TestResolveDtypePlan(unittest.TestCase):
+    """Tests for the resolve_dtype_plan function."""
+
+    def test_values(self):
+        """Test the configuration values of dtype_plan."""
+        self.assertEqual(resolve_dtype_plan(True), DEFAULT_DTYPE_PLAN)
+        self.assertEqual(resolve_dtype_plan(None), {})
+        self.assertEqual(resolve_dtype_plan({"POS": "uint32"}), {"POS": "uint32"})
+
+
+class TestApplyDtypePlan(unittest.TestCase):
+    """Tests for the apply_dtype_plan function."""
+
+    def setUp(self):
+        self.log = Log()
+        self.data = pd.DataFrame(
+            {
+                "CHR": pd.array([1, 2, 23], dtype="Int64"),
+                "POS": pd.array([1000, 2000, 3000], dtype="Int64"),
+                "EA": pd.Categorical(["A", "T", "AT"]),
+                "NEA": pd.Categorical(["G", "A", "A"]),
+                "STATUS": [1980099, 1980099, 1980099],
+                "BETA": [0.1, 0.2, 0.3],
+            }
+        )
+
+    def test_default_plan(self):
+        """Test the default plan casts to compact dtypes and reports the memory."""
+        report = apply_dtype_plan(self.data, DEFAULT_DTYPE_PLAN, log=self.log, verbose=False)
+        self.assertEqual(self.data["CHR"].dtype, np.uint8)
+        self.assertEqual(self.data["POS"].dtype, np.uint32)
+        self.assertEqual(self.data["STATUS"].dtype, np.int32)
+        self.assertEqual(self.data["POS"].tolist(), [1000, 2000, 3000])
+        self.assertEqual(set(report), {"CHR", "POS", "EA", "NEA", "STATUS"})
+        self.assertLess(report["POS"][1], report["POS"][0])
+
+    def test_shared_allele_dictionary(self):
+        """Test allele columns share the same categories."""
+        apply_dtype_plan(self.data, {"EA": "allele", "NEA": "allele"}, log=self.log, verbose=False)
+        self.assertEqual(self.data["EA"].dtype, self.data["NEA"].dtype)
+        self.assertEqual(list(self.data["EA"].cat.categories), ["A", "AT", "G", "T"])
+        self.assertEqual(self.data["NEA"].tolist(), ["G", "A", "A"])
+
+    def test_values_not_fitting_are_kept(self):
+        """Test columns whose values do not fit the planned dtype are unchanged."""
+        self.data["CHR"] = pd.array([1, None, 3], dtype="Int64")
+        self.data["POS"] = ["1", "2", "3"]
+        report = apply_dtype_plan(self.data, {"CHR": "uint8", "POS": "uint32"}, log=self.log, verbose=False)
+        self.assertEqual(report, {})
+        self.assertEqual(self.data["CHR"].dtype, pd.Int64Dtype())
+
+    def test_float32(self):
+        """Test optional float32 statistics."""
+        apply_dtype_plan(self.data, {"BETA": "float32", "MISSING": "float32"}, log=self.log, verbose=False)
+        self.assertEqual(self.data["BETA"].dtype, np.float32)
+
+    def test_missing_values_fit_float(self):
+        """Test missing values fit a float dtype."""
+        self.data["BETA"] = [0.1, np.nan, 0.3]
+        self.data["EAF"] = pd.array([None, 0.5, 0.25], dtype="Float64")
+        report = apply_dtype_plan(self.data, {"BETA": "float32", "EAF": "float32"}, log=self.log, verbose=False)
+        self.assertEqual(set(report), {"BETA", "EAF"})
+        self.assertEqual(self.data["EAF"].dtype, np.float32)
+        self.assertTrue(np.isnan(self.data["BETA"][1]) and np.isnan(self.data["EAF"][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
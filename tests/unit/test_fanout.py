@@ -0,0 +1,92 @@
+import threading
+import unittest
+
+from gwaspipe.fanout import SharedEncoding, group_output_steps, run_sinks
+
+
+def _step_config(enabled):
+    def step(step_name):
+        return {"run": step_name in enabled}, {}
+
+    return step
+
+
+class TestGroupOutputSteps(unittest.TestCase):
+    """Tests for the group_output_steps function."""
+
+    def test_consecutive_outputs(self):
+        """Test consecutive output steps form one stage."""
+        run_sequence = ("basic_check", "harmonize", "write_tsv", "write_parquet", "write_regenie")
+        stages = group_output_steps(run_sequence, _step_config(run_sequence))
+        self.assertEqual(stages, [["basic_check"], ["harmonize"], ["write_tsv", "write_parquet", "write_regenie"]])
+
+    def test_outputs_separated_by_a_step(self):
+        """Test output steps separated by another step are in different stages."""
+        run_sequence = ("write_tsv", "sort_alphabetically", "write_parquet")
+        stages = group_output_steps(run_sequence, _step_config(run_sequence))
+        self.assertEqual(stages, [["write_tsv"], ["sort_alphabetically"], ["write_parquet"]])
+
+    def test_disabled_steps(self):
+        """Test disabled steps do not end a stage."""
+        run_sequence = ("write_tsv", "harmonize", "write_parquet")
+        stages = group_output_steps(run_sequence, _step_config({"write_tsv", "write_parquet"}))
+        self.assertEqual(stages, [["write_tsv", "harmonize", "write_parquet"]])
+
+    def test_prepared_output_starts_a_stage(self):
+        """Test an output step changing the table starts a new stage."""
+        run_sequence = ("write_tsv", "write_snp_mapping", "write_parquet", "write_vcf")
+        stages = group_output_steps(run_sequence, _step_config(run_sequence))
+        self.assertEqual(stages, [["write_tsv"], ["write_snp_mapping", "write_parquet"], ["write_vcf"]])
+
+
+class TestRunSinks(unittest.TestCase):
+    """Tests for the run_sinks function."""
+
+    def test_same_key_in_order(self):
+        """Test the outputs with the same key run in order, and all the outputs run."""
+        calls = []
+        lock = threading.Lock()
+
+        def sink(name):
+            def run():
+                with lock:
+                    calls.append(name)
+
+            return run
+
+        sinks = [("a", sink("a1")), (None, sink("b")), ("a", sink("a2")), (None, sink("c"))]
+        run_sinks(sinks, threads=3)
+        self.assertEqual(sorted(calls), ["a1", "a2", "b", "c"])
+        self.assertLess(calls.index("a1"), calls.index("a2"))
+
+    def test_exception(self):
+        """Test an exception is raised once the other outputs are done."""
+        calls = []
+
+        def fail():
+            raise RuntimeError("failed")
+
+        with self.assertRaises(RuntimeError):
+            run_sinks([(None, fail), (None, lambda: calls.append("done"))], threads=2)
+        self.assertEqual(calls, ["done"])
+
+
+class TestSharedEncoding(unittest.TestCase):
+    """Tests for the SharedEncoding class."""
+
+    def test_computed_once(self):
+        """Test a value is computed once per key."""
+        encoding = SharedEncoding()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(encoding.get("CHR", compute), 1)
+        self.assertEqual(encoding.get("CHR", compute), 1)
+        self.assertEqual(encoding.get("POS", compute), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
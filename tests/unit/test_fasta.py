@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import gwaslab as gl
+import numpy as np
+import pandas as pd
+
+from gwaspipe.fasta import IndexedFasta, fasta_engine, unsupported_reason
+
+
+def write_fasta(path, sequences, line_bases=10):
+    """Write the sequences as a FASTA with its .fai index."""
+    offset = 0
+    with open(path, "w") as fasta, open(f"{path}.fai", "w") as fai:
+        for name, sequence in sequences.items():
+            header = f">{name} description\n"
+            fasta.write(header)
+            offset += len(header)
+            fai.write(f"{name}\t{len(sequence)}\t{offset}\t{line_bases}\t{line_bases + 1}\n")
+            for start in range(0, len(sequence), line_bases):
+                line = sequence[start : start + line_bases]
+                fasta.write(f"{line}\n")
+                offset += len(line) + 1
+
+
+class TestIndexedFasta(unittest.TestCase):
+    """Tests for the memory-mapped FASTA."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp_dir.name, "ref.fa"))
+        rng = np.random.default_rng(0)
+        self.sequences = {
+            name: "".join(rng.choice(list("ACGTNacgt"), length)) for name, length in (("1", 2000), ("2", 1500))
+        }
+        write_fasta(self.path, self.sequences)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_fetch(self):
+        """Test windows across line ends and beyond the contig."""
+        fasta = IndexedFasta(self.path)
+        bases = fasta.fetch("2", np.array([0, 8, 1498]), 4)
+        codes = {"A": 2, "T": 3, "C": 4, "G": 5, "N": 6}
+        sequence = self.sequences["2"].upper()
+        self.assertEqual(bases[0].tolist(), [codes[b] for b in sequence[0:4]])
+        self.assertEqual(bases[1].tolist(), [codes[b] for b in sequence[8:12]])
+        self.assertEqual(bases[2].tolist(), [codes[b] for b in sequence[1498:]] + [100, 100])
+
+    def test_same_status_as_gwaslab(self):
+        """Test check_ref gives the same STATUS with the memory-mapped FASTA as with GWASLab."""
+        rng = np.random.default_rng(1)
+        complement = str.maketrans("ACGT", "TGCA")
+        rows = []
+        for chrom in (1, 2):
+            sequence = self.sequences[str(chrom)].upper()
+            for pos in rng.integers(1, len(sequence) + 10, 300):
+                ref = sequence[pos - 1 : pos + 1] or "A"
+                alt = str(rng.choice(["A", "C", "G", "T", "AT"]))
+                rows += [
+                    (chrom, pos, alt, ref),
+                    (chrom, pos, ref, alt),
+                    (chrom, pos, alt, ref.translate(complement)[::-1]),
+                    (chrom, pos, ref + "T", ref),
+                ]
+        data = pd.DataFrame(rows, columns=["CHR", "POS", "EA", "NEA"]).assign(BETA=0.1, SE=0.1, P=0.5)
+
+        statuses = []
+        for mmap in (False, True):
+            sumstats = gl.Sumstats(data.copy(), fmt="gwaslab", verbose=False)
+            sumstats.basic_check(verbose=False)
+            if mmap:
+                with fasta_engine(threads=2):
+                    sumstats.check_ref(self.path, verbose=False)
+            else:
+                sumstats.check_ref(self.path, verbose=False)
+            statuses.append(sumstats.data["STATUS"])
+        pd.testing.assert_series_equal(statuses[1], statuses[0])
+        self.assertGreater(statuses[0].floordiv(10).mod(10).nunique(), 4)
+
+    def test_unsupported(self):
+        """Test the FASTA files read by GWASLab."""
+        self.assertIsNone(unsupported_reason(self.path))
+        self.assertIsNotNone(unsupported_reason(f"{self.path}.gz"))
+        self.assertIsNotNone(unsupported_reason(str(Path(self.tmp_dir.name, "other.fa"))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gwaspipe.genes import CACHE_SUFFIX, UNKNOWN, annotate_genes, open_gene_index
+
+# Overlapping genes, genes sharing an end, genes at the same distance of a position and chrX/XY genes
+GENE_LIST = """CHR START END GENE_NAME
+1 1000 2000 A
+1 1500 3000 B
+1 5000 6000 C
+1 5500 6000 D
+1 7000 8000 E
+2 100 200 F
+2 300 400 G
+X 1000 2000 H
+XY 3000 4000 I
+"""
+
+
+def naive_closest(genes, chrom, pos, max_distance):
+    """Closest genes of a variant, compared with all the genes of its chromosome as in GWASLab."""
+    start, end, names = genes.get(chrom, (np.array([]), np.array([]), np.array([])))
+    inside = (start <= pos) & (pos <= end)
+    if inside.any():
+        return ",".join(names[inside]), 0
+    distance = np.minimum(np.where(pos < start, start - pos, np.inf), np.where(pos > end, pos - end, np.inf))
+    if len(start) == 0 or distance.min() >= max_distance:
+        return UNKNOWN, max_distance
+    closest = distance == distance.min()
+    sign = -1 if pos < start[closest][0] else 1
+    return ",".join(names[closest]), sign * int(distance.min())
+
+
+class TestGenes(unittest.TestCase):
+    """Tests for the nearest-gene annotation."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.gene_list = str(Path(self.tmp_dir.name, "glist-test.txt"))
+        Path(self.gene_list).write_text(GENE_LIST)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_as_naive(self):
+        """Test the closest genes and distances of all the positions around the genes."""
+        gene_list = pd.read_csv(self.gene_list, sep=" ").replace({"CHR": {"X": "23", "XY": "23"}})
+        genes = {
+            int(chrom): (group["START"].to_numpy(), group["END"].to_numpy(), group["GENE_NAME"].to_numpy())
+            for chrom, group in gene_list.groupby("CHR")
+        }
+        data = pd.DataFrame(
+            {
+                "CHR": np.repeat([1, 2, 3, 23], 9000),
+                "POS": np.tile(np.arange(1, 9001), 4),
+            }
+        )
+        for max_distance in (700, 1000000):
+            index = open_gene_index(self.gene_list, max_distance=max_distance, verbose=False)
+            annotated = annotate_genes(data.copy(), index, verbose=False)
+            expected = [naive_closest(genes, c, p, max_distance) for c, p in zip(data["CHR"], data["POS"])]
+            self.assertEqual(list(zip(annotated["GENE"], annotated["LOCATION"])), expected)
+        # 4000 is 1000 bp downstream of B and upstream of C, 6500 downstream of C and D and upstream of E
+        self.assertEqual(expected[3999], ("B,C", 1000))
+        self.assertEqual(expected[6499], ("C,D,E", 500))
+
+    def test_chromosome_names(self):
+        """Test chromosome names and missing positions."""
+        data = pd.DataFrame({"CHR": ["chr1", "X", None, "MT"], "POS": pd.array([1200, 3500, 100, 100], dtype="Int64")})
+        annotate_genes(data, open_gene_index(self.gene_list, verbose=False), verbose=False)
+        self.assertEqual(data["GENE"].tolist(), ["A", "I", None, UNKNOWN])
+        self.assertEqual(data["LOCATION"].tolist(), [0, 0, pd.NA, 1000000])
+
+    def test_sig_level(self):
+        """Test only the significant variants are annotated."""
+        data = pd.DataFrame({"CHR": [1, 1, 2], "POS": [1200, 5200, 150], "MLOG10P": [9.0, 2.0, 8.0]})
+        annotate_genes(data, open_gene_index(self.gene_list, verbose=False), sig_level=5e-8, verbose=False)
+        self.assertEqual(data["GENE"].tolist(), ["A", None, "F"])
+        self.assertEqual(data["LOCATION"].tolist(), [0, pd.NA, 0])
+
+    def test_compiled_once(self):
+        """Test the compiled gene list is reused, and compiled again when the gene list changes."""
+        cache_path = Path(self.tmp_dir.name, "compiled")
+        open_gene_index(self.gene_list, cache_path=cache_path, verbose=False)
+        index = open_gene_index(self.gene_list, cache_path=cache_path, verbose=False)
+        self.assertIsInstance(index.arrays["segment"], np.memmap)
+        Path(self.gene_list).write_text(GENE_LIST.replace(" F", " J"))
+        os.utime(self.gene_list, ns=(0, 0))
+        data = annotate_genes(
+            pd.DataFrame({"CHR": [2], "POS": [150]}),
+            open_gene_index(self.gene_list, cache_path=cache_path, verbose=False),
+            verbose=False,
+        )
+        self.assertEqual(data.at[0, "GENE"], "J")
+        self.assertEqual(len(list(cache_path.glob(f"*.{CACHE_SUFFIX}"))), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
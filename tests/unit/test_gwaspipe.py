@@ -1,11 +1,16 @@
+import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import gwaslab as gl
 import pandas as pd
+import pysam
+from gwaslab.info.g_Log import Log
 
-from gwaspipe.gwaspipe import SumstatsManager
+from gwaspipe.columnar import dump_sumstats
+from gwaspipe.gwaspipe import SumstatsManager, prepare_output_step, setup_harmonize_cache
+from gwaspipe.reference_cache import ReferenceLookup
 
 
 class TestSumstatsManager(unittest.TestCase):
@@ -61,6 +66,26 @@ class TestSumstatsManager(unittest.TestCase):
         self.assertIsNotNone(sm.mysumstats)
         pickle_path.unlink()
 
+    def test_init_with_checkpoint_format(self):
+        """Test initialization with checkpoint format, reading only the needed columns."""
+        sumstats = gl.Sumstats(str(self.test_data_path), fmt="regenie", sep=" ", verbose=False)
+        checkpoint_path = Path("tests/data/test.feather")
+        dump_sumstats(sumstats, checkpoint_path)
+
+        sm = SumstatsManager(
+            input_path=str(checkpoint_path),
+            input_format="checkpoint",
+            input_separator="\t",
+            input_study=None,
+            formatbook_path=self.formatbook_path,
+            pid=self.pid,
+            bcfliftover=self.bcfliftover,
+            columns=frozenset({"SNPID", "CHR", "POS", "EA", "NEA", "STATUS"}),
+        )
+        checkpoint_path.unlink()
+        self.assertEqual(sm.mysumstats.meta, sumstats.meta)
+        self.assertEqual(list(sm.mysumstats.data.columns), ["SNPID", "CHR", "POS", "EA", "NEA", "STATUS"])
+
     def test_make_gwaslab_snpid(self):
         """Test _make_gwaslab_snpid method."""
         # Use a test file that has CHR, POS, EA, NEA columns
@@ -78,6 +103,34 @@ class TestSumstatsManager(unittest.TestCase):
         self.assertIsInstance(snpid, pd.Series)
         self.assertTrue(all(snpid.str.contains(":")))
 
+    def test_previous_alleles(self):
+        """Test the input alleles are kept for write_snp_mapping only, and dropped once FLIPPED is computed."""
+        kwargs = dict(
+            input_path="tests/data/test_with_chr_pos.pkl",
+            input_format="pickle",
+            input_separator="\t",
+            input_study=None,
+            formatbook_path=self.formatbook_path,
+            pid=True,
+            bcfliftover=self.bcfliftover,
+        )
+        self.assertNotIn("PREVIOUS_EA", SumstatsManager(**kwargs).mysumstats.data.columns)
+        sm = SumstatsManager(**kwargs, previous_alleles=True)
+        self.assertIn("PREVIOUS_EA", sm.mysumstats.data.columns)
+        prepare_output_step(sm, "write_snp_mapping", "test")
+        self.assertIn("FLIPPED", sm.mysumstats.data.columns)
+        self.assertNotIn("PREVIOUS_EA", sm.mysumstats.data.columns)
+        self.assertNotIn("PREVIOUS_NEA", sm.mysumstats.data.columns)
+
+    def test_write_vcf_sampled_build(self):
+        """Test write_vcf infers the build with the sampling configured on infer_build."""
+        sm = MagicMock()
+        sm.build_sampling = {"sampled": True, "sample_size": 1024}
+        sm.mysumstats.meta = {"gwaslab": {}}
+        prepare_output_step(sm, "write_vcf", "test")
+        sm.infer_build.assert_called_once_with(sampled=True, sample_size=1024)
+        self.assertEqual(sm.mysumstats.meta["gwaslab"]["study_name"], "test")
+
     def test_float_dict_custom(self):
         """Test float_dict_custom method."""
         # Use a test file that has BETA column
@@ -96,6 +149,24 @@ class TestSumstatsManager(unittest.TestCase):
         self.assertIsInstance(float_dict, dict)
         self.assertIn("BETA", float_dict)
 
+    def test_float_dict_custom_cached(self):
+        """Test the number of decimals is cached until invalidated."""
+        sm = SumstatsManager(
+            input_path="tests/data/test_with_beta.pkl",
+            input_format="pickle",
+            input_separator="\t",
+            input_study=None,
+            formatbook_path=self.formatbook_path,
+            pid=self.pid,
+            bcfliftover=self.bcfliftover,
+        )
+        sm.mysumstats.data["BETA"] = 0.125
+        self.assertEqual(sm.float_dict_custom({})["BETA"], "{:.3f}")
+        sm.mysumstats.data["BETA"] = 0.5
+        self.assertEqual(sm.float_dict_custom({})["BETA"], "{:.3f}")
+        sm.invalidate_float_decimals()
+        self.assertEqual(sm.float_dict_custom({})["BETA"], "{:.1f}")
+
     def test_order_alleles(self):
         """Test order_alleles method."""
         sm = SumstatsManager(
@@ -112,6 +183,110 @@ class TestSumstatsManager(unittest.TestCase):
         self.assertEqual(sm.mysumstats.data.shape, initial_shape)
 
 
+class TestSetupHarmonizeCache(unittest.TestCase):
+    """Tests for the setup_harmonize_cache function."""
+
+    def setUp(self):
+        self.cm = MagicMock()
+        self.cm.run_sequence = ("harmonize", "write_pickle")
+        self.cm.config = {"reference_cache": {"path": "reference_cache"}}
+        self.cm.step.return_value = ({"run": True}, {"ref_infer": "reference.vcf.gz"})
+
+    @patch("gwaspipe.gwaspipe.reference_key", return_value="0" * 64)
+    @patch("gwaspipe.gwaspipe.ReferenceCache")
+    def test_harmonize_remaining(self, mock_reference_cache, mock_reference_key):
+        """Test the reference cache is opened when harmonize remains to run."""
+        setup_harmonize_cache(self.cm, Log())
+        mock_reference_cache.assert_called_once()
+        self.assertIn("cache_options", self.cm.step.return_value[1]["infer_strand_kwargs"])
+
+    def test_harmonize_with_reference_lookup(self):
+        """Test harmonize infers the strand of the palindromic SNPs from the opened reference cache."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vcf = Path(tmp_dir, "reference.vcf")
+            vcf.write_text(
+                "##fileformat=VCFv4.2\n##contig=<ID=1>\n"
+                '##INFO=<ID=AF,Number=A,Type=Float,Description="Allele frequency">\n'
+                "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+                "1\t100\t.\tA\tT\t.\t.\tAF=0.1\n"
+                "1\t200\t.\tC\tG\t.\t.\tAF=0.9\n"
+            )
+            gl_params = {
+                "basic_check": False,
+                "ref_infer": pysam.tabix_index(str(vcf), preset="vcf"),
+                "ref_alt_freq": "AF",
+                "verbose": False,
+            }
+            self.cm.config = {"reference_cache": {"path": str(Path(tmp_dir, "cache"))}, "n_cores": 1}
+            self.cm.step.return_value = ({"run": True}, gl_params)
+            setup_harmonize_cache(self.cm, Log())
+            lookup = gl_params["infer_strand_kwargs"]["cache_options"]["cache_loader"]
+            self.assertIsInstance(lookup, ReferenceLookup)
+
+            data = pd.DataFrame(
+                {
+                    "SNPID": ["1:100:A:T", "1:200:C:G"],
+                    "CHR": [1, 1],
+                    "POS": [100, 200],
+                    "EA": ["T", "G"],
+                    "NEA": ["A", "C"],
+                    "EAF": [0.12, 0.12],
+                    "BETA": [0.1, 0.2],
+                    "SE": [0.01, 0.01],
+                }
+            )
+            sumstats = gl.Sumstats(
+                data, snpid="SNPID", chrom="CHR", pos="POS", ea="EA", nea="NEA", eaf="EAF", beta="BETA", se="SE"
+            )
+            # Standardized and normalized SNPs whose strand is not inferred yet
+            sumstats.data["STATUS"] = 1960008
+            sumstats.harmonize(**gl_params)
+            self.assertIn("Using cache for strand inference", sumstats.log.log_text)
+            # Palindromic SNP on the + strand, and on the - strand, flipped
+            self.assertEqual(sumstats.data["STATUS"].astype(int).tolist(), [1960001, 1960002])
+            self.assertEqual(sumstats.data["BETA"].tolist(), [0.1, -0.2])
+
+    @patch("gwaspipe.gwaspipe.ReferenceCache")
+    def test_resumed_after_harmonize(self, mock_reference_cache):
+        """Test the reference cache is not opened when the run resumes after harmonize."""
+        setup_harmonize_cache(self.cm, Log(), ("write_pickle",))
+        mock_reference_cache.assert_not_called()
+        self.cm.step.assert_not_called()
+
+    @patch("gwaspipe.gwaspipe.setup_harmonize_cache")
+    @patch("gwaspipe.gwaspipe.StepCache")
+    @patch("gwaspipe.gwaspipe.ConfigurationManager")
+    @patch("gwaspipe.gwaspipe.SumstatsManager")
+    def test_restored_after_harmonize(self, mock_sm_class, mock_cm_class, mock_step_cache_class, mock_setup):
+        """Test the harmonize cache is not set up when the step cache restores the steps up to harmonize."""
+        import sys
+
+        from gwaspipe.gwaspipe import main
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mock_cm = MagicMock()
+            mock_cm.log_file_path = Path(tmp_dir, "test.log")
+            mock_cm.formatbook_path = Path(tmp_dir, "formatbook.json")
+            mock_cm.root_path = Path(tmp_dir)
+            mock_cm.run_sequence = ("harmonize", "write_pickle")
+            mock_cm.filename_settings = (None, None)
+            mock_cm.config = {"step_cache": {"path": tmp_dir}}
+            mock_cm.step.side_effect = lambda step: ({"run": step == "harmonize"}, {})
+            mock_cm_class.return_value = mock_cm
+            restore_from = MagicMock()
+            mock_step_cache_class.return_value.restore.return_value = (0, restore_from)
+
+            testargs = ["gwaspipe", "-c", "config.yaml", "-i", "tests/data/test_sumstats.tsv", "-f", "plink_pvar"]
+            with patch.object(sys, "argv", testargs):
+                try:
+                    main()
+                except SystemExit:
+                    pass
+
+        self.assertIs(mock_sm_class.call_args.kwargs["restore_from"], restore_from)
+        self.assertNotIn("harmonize", mock_setup.call_args.args[2])
+
+
 class TestCLIOptions(unittest.TestCase):
     """Tests for CLI option parsing."""
 
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import gwaslab as gl
+import numpy as np
+import pandas as pd
+from sumstats_liftover import liftover_df as sumstats_liftover_df
+
+from gwaspipe.liftover import CACHE_SUFFIX, liftover_df, liftover_engine
+
+# Forward chain of chr1 with a gap, reverse chain of chr2 onto chr3 and overlapping chains of chrX
+CHAIN = """chain 1000 chr1 10000 + 100 700 chr1 12000 + 200 850 1
+200 50 100
+400
+
+chain 900 chr2 5000 + 0 1000 chr3 8000 - 1000 2000 2
+1000
+
+chain 500 chrX 9000 + 0 600 chrX 9000 + 3000 3600 3
+600
+
+chain 800 chrX 9000 + 300 500 chr7 20000 + 100 300 4
+200
+"""
+
+
+class TestLiftover(unittest.TestCase):
+    """Tests for the compiled chain liftover."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.chain_path = str(Path(self.tmp_dir.name, "test.over.chain"))
+        Path(self.chain_path).write_text(CHAIN)
+        rng = np.random.default_rng(0)
+        self.data = pd.DataFrame(
+            {
+                "CHR": rng.choice([1, 2, 23, 5], 2000),
+                "POS": rng.integers(1, 1200, 2000),
+            }
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_as_sumstats_liftover(self):
+        """Test the lifted positions, chromosomes and strands, from the chain and from the cache."""
+        expected = sumstats_liftover_df(self.data, self.chain_path)
+        for _ in range(2):
+            pd.testing.assert_frame_equal(liftover_df(self.data, self.chain_path, verbose=False), expected)
+        self.assertEqual(len(list(Path(self.tmp_dir.name).glob(f"*.{CACHE_SUFFIX}"))), 1)
+        self.assertEqual(set(expected["STRAND_LIFT"].dropna()), {"+", "-"})
+        self.assertEqual(set(expected["CHR_LIFT"].dropna()), {"1", "3", "X", "7"})
+
+    def test_chain_changed(self):
+        """Test a changed chain file is compiled again."""
+        liftover_df(self.data, self.chain_path, verbose=False)
+        Path(self.chain_path).write_text(CHAIN.replace("chr3", "chr4"))
+        os.utime(self.chain_path, ns=(0, 0))
+        lifted = liftover_df(self.data, self.chain_path, verbose=False)
+        self.assertIn("4", set(lifted["CHR_LIFT"].dropna()))
+        self.assertEqual(len(list(Path(self.tmp_dir.name).glob(f"*.{CACHE_SUFFIX}"))), 2)
+
+    def test_same_as_gwaslab(self):
+        """Test the GWASLab liftover gives the same sumstats with the compiled chain."""
+        data = self.data.assign(EA="A", NEA="G", BETA=0.1, SE=0.1, P=0.5)
+        results = []
+        for compiled in (False, True):
+            sumstats = gl.Sumstats(data.copy(), fmt="gwaslab", build="19", verbose=False)
+            sumstats.basic_check(verbose=False)
+            cache_path = Path(self.tmp_dir.name, "compiled")
+            if compiled:
+                with liftover_engine(cache_path=cache_path, verbose=False):
+                    sumstats.liftover(chain_path=self.chain_path, to_build="38", verbose=False)
+            else:
+                sumstats.liftover(chain_path=self.chain_path, to_build="38", verbose=False)
+            results.append(sumstats.data)
+        pd.testing.assert_frame_equal(results[1], results[0])
+        self.assertTrue(any(cache_path.iterdir()))
+
+
+if __name__ == "__main__":
+    unittest.main()
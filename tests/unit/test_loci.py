@@ -0,0 +1,104 @@
+import unittest
+
+import gwaslab as gl
+import numpy as np
+import pandas as pd
+
+from gwaspipe.loci import find_loci
+
+
+def naive_clump(data, window):
+    """Lead variants of the greedy distance clumping, one lead at a time over all the remaining variants."""
+    remaining = data[data["MLOG10P"] >= -np.log10(5e-8)].sort_values(["CHR", "POS"], kind="stable")
+    leads = []
+    while len(remaining):
+        lead = remaining.loc[remaining["MLOG10P"].idxmax()]
+        leads.append((lead["CHR"], lead["POS"], lead["SNPID"]))
+        near = (remaining["CHR"] == lead["CHR"]) & ((remaining["POS"] - lead["POS"]).abs() <= window)
+        remaining = remaining[~near]
+    return [snpid for _, _, snpid in sorted(leads)]
+
+
+class TestLoci(unittest.TestCase):
+    """Tests for the extraction of the loci."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 50000
+        self.data = pd.DataFrame(
+            {
+                "SNPID": [f"v{i}" for i in range(n)],
+                "CHR": rng.integers(1, 24, n),
+                "POS": rng.integers(1, 2 * 10**7, n),
+                "EA": "A",
+                "NEA": "G",
+                "BETA": 0.1,
+                "SE": 0.01,
+                "MLOG10P": np.round(np.where(rng.random(n) < 0.02, rng.uniform(6, 20, n), rng.exponential(1, n)), 1),
+            }
+        )
+
+    def test_same_as_gwaslab(self):
+        """Test the lead variants of the gwaslab method are those of GWASLab get_lead, ties included."""
+        loci = find_loci(self.data, method="gwaslab", verbose=False)
+        sumstats = gl.Sumstats(self.data.copy(), fmt="gwaslab", build="19", verbose=False)
+        leads = sumstats.get_lead(verbose=False)
+        self.assertEqual(loci["SNPID"].tolist(), leads["SNPID"].tolist())
+        self.assertEqual(loci["LOCUS"].tolist(), list(range(1, len(leads) + 1)))
+
+    def test_same_as_naive_clump(self):
+        """Test the lead variants of the clump method are those of a naive greedy clumping."""
+        loci = find_loci(self.data, windowsizekb=250, verbose=False)
+        self.assertEqual(loci["SNPID"].tolist(), naive_clump(self.data, 250000))
+        self.assertEqual(loci["N_SIG"].sum(), (self.data["MLOG10P"] >= -np.log10(5e-8)).sum())
+
+    def test_methods(self):
+        """Test a chain of significant variants is one locus with gwaslab and is clumped around its leads."""
+        data = pd.DataFrame(
+            {
+                "SNPID": list("abcd"),
+                "CHR": 1,
+                "POS": [100, 400100, 800100, 1200100],
+                "MLOG10P": [20.0, 10.0, 15.0, 9.0],
+            }
+        )
+        clumped = find_loci(data, verbose=False)
+        self.assertEqual(clumped["SNPID"].tolist(), ["a", "c"])
+        self.assertEqual(clumped["START"].tolist(), [100, 800100])
+        self.assertEqual(clumped["END"].tolist(), [400100, 1200100])
+        self.assertEqual(clumped["N_SIG"].tolist(), [2, 2])
+        chained = find_loci(data, method="gwaslab", verbose=False)
+        self.assertEqual(chained["SNPID"].tolist(), ["a"])
+        self.assertEqual((chained.at[0, "START"], chained.at[0, "END"], chained.at[0, "N_SIG"]), (100, 1200100, 4))
+        with self.assertRaises(ValueError):
+            find_loci(data, method="ld", verbose=False)
+
+    def test_loci(self):
+        """Test the boundaries and the number of significant variants of the loci."""
+        data = pd.DataFrame(
+            {
+                "SNPID": list("abcdefg"),
+                "CHR": ["1", "1", "1", "1", "2", "X", "X"],
+                "POS": [100, 400000, 850000, 1500000, 100, 100, 200],
+                "P": [1e-9, 1e-10, 1e-9, 1e-20, 1e-12, 1e-3, np.nan],
+            }
+        )
+        for method in ("clump", "gwaslab"):
+            loci = find_loci(data.sample(frac=1, random_state=1), method=method, verbose=False)
+            self.assertEqual(loci["SNPID"].tolist(), ["b", "d", "e"])
+            self.assertEqual(loci["START"].tolist(), [100, 1500000, 100])
+            self.assertEqual(loci["END"].tolist(), [850000, 1500000, 100])
+            self.assertEqual(loci["N_SIG"].tolist(), [3, 1, 1])
+            self.assertEqual(loci["CHR"].tolist(), ["1", "1", "2"])
+
+    def test_no_loci(self):
+        """Test an empty table without significant variants."""
+        data = pd.DataFrame({"CHR": [1, 2], "POS": [100, 200], "MLOG10P": [1.0, 7.0]})
+        for method in ("clump", "gwaslab"):
+            loci = find_loci(data, sig_level=1e-8, method=method, verbose=False)
+            self.assertEqual(len(loci), 0)
+            self.assertIn("N_SIG", loci.columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import gwaslab as gl
+import numpy as np
+import pandas as pd
+
+from gwaspipe.fasta import IndexedFasta
+from gwaspipe.normalize import _left_align_alleles, normalize_engine, trim_pairs
+from tests.unit.test_fasta import write_fasta
+
+
+def naive_left_align(sequence, pos, nea, ea):
+    """Left-align an indel by shifting one base at a time, as in VCF normalization."""
+    while nea[-1] == ea[-1]:
+        nea, ea = nea[:-1], ea[:-1]
+        if not nea or not ea:
+            if pos == 1:
+                return pos, sequence[0] + nea, sequence[0] + ea
+            pos -= 1
+            nea, ea = sequence[pos - 1] + nea, sequence[pos - 1] + ea
+    while len(nea) > 1 and len(ea) > 1 and nea[0] == ea[0]:
+        nea, ea, pos = nea[1:], ea[1:], pos + 1
+    return pos, nea, ea
+
+
+class TestNormalize(unittest.TestCase):
+    """Tests for the vectorized indel normalization."""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def random_allele(self):
+        return "".join(self.rng.choice(list("ACGT"), self.rng.integers(1, 6)))
+
+    def test_trim_pairs(self):
+        """Test the lengths of the alleles and of their common suffix and prefix."""
+        long_allele = "ACGT" * 10
+        lengths = trim_pairs(["ATTG", "A", long_allele, ""], ["AG", "A", long_allele + "C", "T"])
+        self.assertEqual([v.tolist() for v in lengths], [[4, 1, 40, 0], [2, 1, 41, 1], [1, 1, 0, 0], [1, 1, 40, 0]])
+
+    def test_same_as_gwaslab(self):
+        """Test basic_check normalizes the indels as GWASLab, with small chunks."""
+        rows = []
+        for _ in range(2000):
+            nea, ea = self.random_allele(), self.random_allele()
+            if self.rng.random() < 0.3:
+                ea = nea + ea
+            if self.rng.random() < 0.2:
+                nea, ea = nea + "TT", ea + "TT"
+            if self.rng.random() < 0.02:
+                ea = nea
+            rows.append((int(self.rng.integers(1, 3)), int(self.rng.integers(100, 10000)), ea, nea))
+        data = pd.DataFrame(rows, columns=["CHR", "POS", "EA", "NEA"]).assign(BETA=0.1, SE=0.1, P=0.5)
+
+        results = []
+        for fast in (False, True):
+            sumstats = gl.Sumstats(data.copy(), fmt="gwaslab", verbose=False)
+            if fast:
+                with normalize_engine():
+                    sumstats.basic_check(verbose=False, normalize_allele_kwargs={"chunk": 50})
+            else:
+                sumstats.basic_check(verbose=False, normalize_allele_kwargs={"chunk": 50})
+            results.append(sumstats.data.astype({"EA": "string", "NEA": "string"}))
+        pd.testing.assert_frame_equal(results[1], results[0])
+        self.assertGreater((results[0]["POS"] != data["POS"]).sum(), 0)
+
+    def test_left_align(self):
+        """Test the indels are left-aligned against the reference as shifting one base at a time."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = str(Path(tmp_dir, "ref.fa"))
+            # Few bases make long repeats
+            sequences = {name: "".join(self.rng.choice(list("AC"), 3000)) for name in ("1", "X")}
+            sequences["X"] = sequences["X"][:1000] + "AC" * 40 + sequences["X"][1000:]
+            write_fasta(path, sequences)
+
+            rows = []
+            for chrom, name in ((1, "1"), (23, "X")):
+                sequence = sequences[name]
+                for pos in self.rng.integers(1, len(sequence) - 10, 300):
+                    pos = int(pos)
+                    length = int(self.rng.integers(1, 5))
+                    deleted = sequence[pos - 1 : pos + length]
+                    inserted = sequence[pos - 1] + self.random_allele()[:length]
+                    rows += [(chrom, pos, sequence[pos - 1], deleted), (chrom, pos, inserted, sequence[pos - 1])]
+            rows.append((1, 5, "G", "GA"))
+            chrom, pos, nea, ea = (np.array(v, dtype=object) for v in zip(*rows))
+
+            new_pos, new_nea, new_ea, shifted = _left_align_alleles(
+                IndexedFasta(path), chrom, pos.astype(np.int64), nea, ea, threads=2
+            )
+        expected = [
+            naive_left_align(sequences["1" if c == 1 else "X"], p, n, e) if n[0] == e[0] and n[0] != "G" else (p, n, e)
+            for c, p, n, e in rows
+        ]
+        self.assertEqual(list(zip(new_pos.tolist(), new_nea, new_ea)), expected)
+        self.assertEqual(sorted(shifted.tolist()), [i for i, e in enumerate(expected) if e[0] != rows[i][1]])
+        self.assertGreater(len(shifted), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ from gwaspipe.order_alleles import (
     ORDER_MAPPING,
     TRANSLATE_TABLE_ORDER,
     _orderalleles_status_vec,
+    build_previous_ids,
     build_snpids,
     custom_alleles_sort,
     order_alleles,
@@ -328,6 +329,58 @@ class TestBuildSnpids(unittest.TestCase):
         result = build_snpids(df, chrom="CHROM", pos="POSITION", ea="A1", nea="A2")
         self.assertEqual(result.tolist(), ["1:500:C:G"])
 
+    def test_arrow_backed_result(self):
+        """Test categorical alleles and the Arrow-backed string result."""
+        df = pd.DataFrame(
+            {
+                "CHR": pd.array([1, 2, 3], dtype="Int64"),
+                "POS": [1000, 2000, 3000],
+                "EA": pd.Categorical(["A", "T", None]),
+                "NEA": pd.Categorical(["T", "A", "G"]),
+            },
+            index=[10, 11, 12],
+        )
+        result = build_snpids(df, n_threads=2)
+        self.assertEqual(result.dtype, pd.StringDtype("pyarrow"))
+        self.assertEqual(result.index.tolist(), [10, 11, 12])
+        self.assertEqual(result.iloc[:2].tolist(), ["1:1000:A:T", "2:2000:T:A"])
+        self.assertTrue(pd.isna(result.iloc[2]))
+
+
+class TestBuildPreviousIds(unittest.TestCase):
+    """Tests for the build_previous_ids function."""
+
+    def setUp(self):
+        self.test_data = pd.DataFrame(
+            {
+                "CHR": [1, 2],
+                "POS": [1000, 2000],
+                "EA": ["A", "T"],
+                "NEA": ["T", "A"],
+            }
+        )
+
+    def test_without_snpid(self):
+        """Test PREVIOUS_ID is the GWASLab SNPID when the input has no SNPID."""
+        result = build_previous_ids(self.test_data)
+        self.assertEqual(list(result), ["PREVIOUS_ID_GWASLAB", "PREVIOUS_ID"])
+        self.assertEqual(result["PREVIOUS_ID"].tolist(), ["1:1000:A:T", "2:2000:T:A"])
+        self.assertIs(result["PREVIOUS_ID"], result["PREVIOUS_ID_GWASLAB"])
+
+    def test_with_snpid_and_rsid(self):
+        """Test PREVIOUS_ID and PREVIOUS_rsID come from the input columns."""
+        df = self.test_data.assign(SNPID=["a", "b"], rsID=["rs1", "rs2"])
+        result = build_previous_ids(df)
+        self.assertEqual(list(result), ["PREVIOUS_ID_GWASLAB", "PREVIOUS_rsID", "PREVIOUS_ID"])
+        self.assertEqual(result["PREVIOUS_ID"].tolist(), ["a", "b"])
+        self.assertEqual(result["PREVIOUS_rsID"].tolist(), ["rs1", "rs2"])
+
+    def test_bcfliftover(self):
+        """Test PREVIOUS_ID comes from rsID with bcfliftover."""
+        df = self.test_data.assign(SNPID=["a", "b"], rsID=["1_900_A_T", "2_1900_T_A"])
+        result = build_previous_ids(df, bcfliftover=True)
+        self.assertEqual(result["PREVIOUS_ID"].tolist(), ["1:900:A:T", "2:1900:T:A"])
+
 
 class TestParallelBuildSnpid(unittest.TestCase):
     """Tests for the parallelbuildsnpid function."""
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gwaspipe.order_alleles import encode_alleles, pad_codes
+from gwaspipe.order_alleles.vectorized import _should_swap_vec
+
+
+class TestEncodeAlleles(unittest.TestCase):
+    """Tests for the encode_alleles function."""
+
+    def test_custom_order_codes(self):
+        """Test nucleotides are encoded in custom allele order."""
+        codes, lengths = encode_alleles(pd.Series(["A", "C", "G", "T"]))
+        self.assertEqual(codes.dtype, np.uint8)
+        self.assertEqual(codes[:, 0].tolist(), [1, 2, 3, 4])
+        self.assertEqual(lengths.tolist(), [1, 1, 1, 1])
+
+    def test_one_byte_per_character(self):
+        """Test the matrix is as wide as the longest allele and zero padded."""
+        codes, lengths = encode_alleles(pd.Series(["ACGT", "T"], dtype="category"))
+        self.assertEqual(codes.shape, (2, 4))
+        self.assertEqual(codes.nbytes, 8)
+        self.assertEqual(codes[1].tolist(), [4, 0, 0, 0])
+        self.assertEqual(lengths.tolist(), [4, 1])
+
+    def test_width_and_missing(self):
+        """Test an explicit width and missing alleles encoded as empty."""
+        codes, lengths = encode_alleles(pd.Series(["A", None]), width=3)
+        self.assertEqual(codes.tolist(), [[1, 0, 0], [0, 0, 0]])
+        self.assertEqual(lengths.tolist(), [1, 0])
+
+    def test_empty(self):
+        """Test encoding an empty series."""
+        codes, lengths = encode_alleles(pd.Series([], dtype=object))
+        self.assertEqual(codes.shape[0], 0)
+        self.assertEqual(len(lengths), 0)
+
+    def test_pad_codes(self):
+        """Test padding to a wider matrix."""
+        codes, _ = encode_alleles(pd.Series(["AC"]))
+        self.assertEqual(pad_codes(codes, 4).tolist(), [[1, 2, 0, 0]])
+        self.assertIs(pad_codes(codes, 1), codes)
+
+
+class TestShouldSwapVec(unittest.TestCase):
+    """Tests for the _should_swap_vec function with long indels."""
+
+    def test_long_indel(self):
+        """Test a long allele does not change the decisions of the other rows."""
+        ea = pd.Series(["T", "A", "A" * 300, "AC"])
+        nea = pd.Series(["A", "T", "G", "AG"])
+        self.assertEqual(_should_swap_vec(ea, nea).tolist(), [True, False, False, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import itertools
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gwaspipe.order_alleles import (
+    AllelePairCache,
+    allele_pairs_should_swap,
+    custom_alleles_sort,
+    factorize_allele_pairs,
+)
+from gwaspipe.order_alleles.vectorized import _should_swap_vec
+
+
+class TestFactorizeAllelePairs(unittest.TestCase):
+    """Tests for the factorize_allele_pairs function."""
+
+    def test_distinct_pairs(self):
+        """Test rows with the same alleles share a pair code."""
+        ea = pd.Series(["A", "T", "A", "C"], dtype="category")
+        nea = pd.Series(["G", "A", "G", "G"], dtype="category")
+        pair_codes, ea_pairs, nea_pairs = factorize_allele_pairs(ea, nea)
+        self.assertEqual(len(ea_pairs), 3)
+        self.assertEqual(pair_codes[0], pair_codes[2])
+        decoded = [(ea_pairs[c], nea_pairs[c]) for c in pair_codes]
+        self.assertEqual(decoded, list(zip(ea, nea)))
+
+    def test_missing_alleles(self):
+        """Test rows with a missing allele get code -1."""
+        ea = pd.Series(["A", None, "A"])
+        nea = pd.Series(["G", "T", np.nan])
+        pair_codes, ea_pairs, _ = factorize_allele_pairs(ea, nea)
+        self.assertEqual(pair_codes.tolist(), [0, -1, -1])
+        self.assertEqual(len(ea_pairs), 1)
+
+
+class TestAllelePairCache(unittest.TestCase):
+    """Tests for the AllelePairCache class."""
+
+    def test_decide_called_only_for_new_pairs(self):
+        """Test cached pairs are not decided again."""
+        cache = AllelePairCache()
+        calls = []
+
+        def decide(ea, nea):
+            calls.append(len(ea))
+            return _should_swap_vec(ea, nea)
+
+        cache.should_swap(np.array(["A", "T"], dtype=object), np.array(["G", "A"], dtype=object), decide)
+        decisions = cache.should_swap(np.array(["T", "C"], dtype=object), np.array(["A", "G"], dtype=object), decide)
+        self.assertEqual(calls, [2, 1])
+        self.assertEqual(decisions.tolist(), [True, False])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_bounded_size(self):
+        """Test the least recently used pairs are evicted."""
+        cache = AllelePairCache(maxsize=2)
+        alleles = np.array(["A", "C", "G"], dtype=object)
+        cache.should_swap(alleles, np.array(["T", "T", "T"], dtype=object), _should_swap_vec)
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 0)
+
+
+class TestAllelePairsShouldSwap(unittest.TestCase):
+    """Tests for the allele_pairs_should_swap function."""
+
+    def test_matches_custom_alleles_sort(self):
+        """Test the pair decisions agree with custom_alleles_sort."""
+        alleles = ["".join(p) for n in range(1, 4) for p in itertools.product("ACGT", repeat=n)]
+        pairs = [(a, b) for a in alleles for b in alleles if a != b]
+        ea = pd.Series([a for a, _ in pairs])
+        nea = pd.Series([b for _, b in pairs])
+        should_swap, n_pairs = allele_pairs_should_swap(ea, nea, _should_swap_vec, cache=AllelePairCache())
+        expected = [custom_alleles_sort([a, b]) != [a, b] for a, b in pairs]
+        self.assertEqual(n_pairs, len(pairs))
+        self.assertEqual(should_swap.tolist(), expected)
+
+    def test_missing_alleles_not_swapped(self):
+        """Test rows with a missing allele are not swapped."""
+        ea = pd.Series(["T", None])
+        nea = pd.Series(["A", "A"])
+        should_swap, _ = allele_pairs_should_swap(ea, nea, _should_swap_vec, cache=AllelePairCache())
+        self.assertEqual(should_swap.tolist(), [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import itertools
+import unittest
+
+import numpy as np
+import pandas as pd
+from gwaslab.info.g_Log import Log
+
+from gwaspipe.order_alleles import (
+    AllelePairCache,
+    allele_pairs_should_swap,
+    orderalleles_status,
+    parallelorderalleles_status,
+    shared_swap_mask,
+)
+from gwaspipe.order_alleles.vectorized import _should_swap_vec
+
+
+class TestSharedSwapMask(unittest.TestCase):
+    """Tests for the shared_swap_mask function."""
+
+    def setUp(self):
+        alleles = ["".join(p) for n in range(1, 3) for p in itertools.product("ACGT", repeat=n)]
+        rng = np.random.default_rng(0)
+        self.ea = pd.Series(pd.Categorical(rng.choice(alleles, 1000)))
+        self.nea = pd.Series(pd.Categorical(rng.choice(alleles, 1000)))
+
+    def test_multi_core_matches_in_process(self):
+        """Test the mask computed by the workers equals the in process one."""
+        expected = _should_swap_vec(self.ea, self.nea)
+        np.testing.assert_array_equal(shared_swap_mask(self.ea, self.nea, n_cores=3), expected)
+        np.testing.assert_array_equal(shared_swap_mask(self.ea, self.nea, n_cores=1), expected)
+
+    def test_fewer_rows_than_cores(self):
+        """Test small inputs are computed in process."""
+        mask = shared_swap_mask(pd.Series(["T"]), pd.Series(["A"]), n_cores=4)
+        self.assertEqual(mask.tolist(), [True])
+
+    def test_missing_alleles(self):
+        """Test rows with a missing allele are not swapped, as by the vectorized engine."""
+        ea = pd.Series(pd.Categorical(["AT", None, "A", "T"]))
+        nea = pd.Series(pd.Categorical(["A", "A", "AT", None]))
+        expected, _ = allele_pairs_should_swap(ea, nea, _should_swap_vec, AllelePairCache())
+        self.assertEqual(expected.tolist(), [False, False, True, False])
+        for n_cores in (1, 2):
+            self.assertEqual(shared_swap_mask(ea, nea, n_cores=n_cores).tolist(), expected.tolist())
+            self.assertEqual(
+                shared_swap_mask(ea.astype(object), nea.astype(object), n_cores=n_cores).tolist(), expected.tolist()
+            )
+
+    def test_decided_once_per_pair(self):
+        """Test the swap of each distinct pair is decided once through the cache."""
+        cache = AllelePairCache()
+        shared_swap_mask(self.ea, self.nea, n_cores=3, cache=cache)
+        n_pairs = len(set(zip(self.ea, self.nea)))
+        self.assertEqual(len(cache), n_pairs)
+        object_mask = shared_swap_mask(self.ea.astype(object), self.nea.astype(object), n_cores=2, cache=cache)
+        np.testing.assert_array_equal(object_mask, _should_swap_vec(self.ea, self.nea))
+        self.assertEqual(len(cache), n_pairs)
+
+
+class TestParallelOrderAllelesStatusShared(unittest.TestCase):
+    """Tests for parallelorderalleles_status through shared memory."""
+
+    def test_matches_row_wise_ordering(self):
+        """Test the parallel statuses equal the row-wise ones."""
+        alleles = ["".join(p) for n in range(1, 4) for p in itertools.product("ACGT", repeat=n)]
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame(
+            {
+                "EA": rng.choice(alleles, 500),
+                "NEA": rng.choice(alleles, 500),
+                "STATUS": np.full(500, 9999999),
+            }
+        )
+        result = parallelorderalleles_status(df.copy(), n_cores=2, verbose=False, log=Log())
+        expected = orderalleles_status(df.copy(), verbose=False, log=Log())
+        self.assertEqual(result["STATUS"].astype(int).tolist(), expected["STATUS"].astype(int).tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import gwaslab as gl
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from gwaspipe.parquet import unsupported_reason, write_parquet
+
+
+class TestWriteParquet(unittest.TestCase):
+    """Tests for the Parquet writer."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        n = 2000
+        data = pd.DataFrame(
+            {
+                "SNPID": [f"id{i}" for i in range(n)],
+                "CHR": rng.integers(1, 24, n),
+                "POS": rng.integers(1, 10**8, n),
+                "EA": pd.Categorical(rng.choice(["A", "C", "G", "T"], n)),
+                "NEA": pd.Categorical(rng.choice(["A", "C", "G", "T"], n)),
+                "BETA": rng.normal(size=n),
+                "P": rng.random(n),
+                "STATUS": rng.integers(1000000, 9999999, n),
+            }
+        )
+        self.sumstats = gl.Sumstats(data, fmt="gwaslab", verbose=False)
+        self.sumstats.data = data
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_rows_as_gwaslab(self):
+        """Test the columns and the rows are those of the GWASLab output, sorted by position."""
+        self.sumstats.to_format(
+            str(Path(self.tmp_dir.name, "gwaslab")), fmt="gwaslab", tab_fmt="parquet", verbose=False
+        )
+        path = write_parquet(self.sumstats, str(Path(self.tmp_dir.name, "native")), verbose=False)
+        expected = pd.read_parquet(Path(self.tmp_dir.name, "gwaslab.gwaslab.parquet"))
+        output = pd.read_parquet(path)
+        self.assertEqual(list(output.columns), list(expected.columns))
+        expected = expected.sort_values(["CHR", "POS"], key=lambda x: x.map({"X": 23}).fillna(x).astype(int))
+        pd.testing.assert_frame_equal(
+            output.astype({"CHR": str}), expected.reset_index(drop=True), check_categorical=False
+        )
+
+    def test_row_groups(self):
+        """Test the row groups hold one chromosome and have the position statistics."""
+        path = write_parquet(self.sumstats, str(Path(self.tmp_dir.name, "native")), row_group_size=50, verbose=False)
+        metadata = pq.ParquetFile(path).metadata
+        pos_index = pq.ParquetFile(path).schema_arrow.get_field_index("POS")
+        table = pq.read_table(path)
+        start = 0
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            self.assertLessEqual(row_group.num_rows, 50)
+            rows = table.slice(start, row_group.num_rows).to_pandas()
+            self.assertEqual(rows["CHR"].nunique(), 1)
+            statistics = row_group.column(pos_index).statistics
+            self.assertEqual((statistics.min, statistics.max), (rows["POS"].min(), rows["POS"].max()))
+            self.assertEqual(row_group.sorting_columns, (pq.SortingColumn(pos_index),))
+            start += row_group.num_rows
+
+    def test_region_query(self):
+        """Test reading a region with filters on the hive layout."""
+        path = write_parquet(self.sumstats, str(Path(self.tmp_dir.name, "native")), layout="hive", verbose=False)
+        self.assertTrue(Path(path, "CHR=X", "part-0.parquet").exists())
+        region = (ds.field("CHR") == "2") & (ds.field("POS") >= 10**7) & (ds.field("POS") < 2 * 10**7)
+        table = ds.dataset(path, partitioning="hive").to_table(filter=region)
+        data = self.sumstats.data
+        expected = data[(data["CHR"] == 2) & (data["POS"] >= 10**7) & (data["POS"] < 2 * 10**7)]
+        self.assertEqual(sorted(table.column("POS").to_pylist()), sorted(expected["POS"].tolist()))
+
+    def test_position_through_cols(self):
+        """Test CHR and POS written under their own names through cols, when the format does not rename them."""
+        for layout in ("row_groups", "hive"):
+            with self.subTest(layout=layout):
+                path = write_parquet(
+                    self.sumstats,
+                    str(Path(self.tmp_dir.name, layout)),
+                    fmt="cojo",
+                    cols=["CHR", "POS"],
+                    layout=layout,
+                    verbose=False,
+                )
+                files = [path] if layout == "row_groups" else sorted(Path(path).glob("CHR=*/part-0.parquet"))
+                for file in files:
+                    metadata = pq.ParquetFile(file).metadata
+                    pos_index = pq.ParquetFile(file).schema_arrow.get_field_index("POS")
+                    self.assertGreaterEqual(pos_index, 0)
+                    self.assertEqual(metadata.row_group(0).sorting_columns, (pq.SortingColumn(pos_index),))
+
+    def test_unsupported(self):
+        """Test the outputs falling back to the GWASLab writer."""
+        data = self.sumstats.data
+        self.assertIsNone(unsupported_reason(data, "out", {"fmt": "gwaslab", "tab_fmt": "parquet"}))
+        self.assertIsNotNone(unsupported_reason(data, "out", {"fmt": "gwaslab", "hapmap3": True}))
+        self.assertIsNotNone(unsupported_reason(data, "out", {"fmt": "gwaslab", "tab_fmt": "tsv"}))
+        self.assertIsNotNone(unsupported_reason(data.drop(columns="POS"), "out", {"fmt": "gwaslab"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gwaspipe.precision import decimal_places, max_decimal_places
+
+
+def python_decimal_places(values):
+    return [len(str(x).split(".")[-1]) if "." in str(x) else 0 for x in values]
+
+
+class TestDecimalPlaces(unittest.TestCase):
+    """Tests for the decimal_places and max_decimal_places functions."""
+
+    def test_positional_and_scientific(self):
+        """Test the decimals match the Python representation of each value."""
+        values = pd.Series([0.125, 2.0, 0.0, -3.25, 1e-05, 1.25e-08, 1e16, 2.5e16, 1.5e-100, 123456.789])
+        self.assertEqual(decimal_places(values).tolist(), [3, 1, 1, 2, 0, 6, 0, 5, 6, 3])
+
+    def test_missing_and_non_finite(self):
+        """Test missing and non-finite values have no decimals."""
+        values = pd.Series([0.5, None, np.inf], dtype="Float64")
+        self.assertEqual(decimal_places(values).tolist(), [1, 0, 0])
+
+    def test_random_values(self):
+        """Test random values against the Python representation."""
+        rng = np.random.default_rng(0)
+        values = pd.Series(np.concatenate([rng.normal(size=1000), 10 ** rng.uniform(-300, 300, size=1000)]))
+        self.assertEqual(decimal_places(values).tolist(), python_decimal_places(values))
+
+    def test_float32(self):
+        """Test float32 values are represented as Python floats."""
+        values = pd.Series([0.1, 0.25], dtype="float32")
+        self.assertEqual(decimal_places(values).tolist(), python_decimal_places(values))
+
+    def test_max(self):
+        """Test the maximum number of decimals."""
+        self.assertEqual(max_decimal_places(pd.Series([0.5, 0.125])), 3)
+        self.assertEqual(max_decimal_places(pd.Series([], dtype="float64")), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
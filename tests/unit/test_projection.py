@@ -0,0 +1,94 @@
+import unittest
+from pathlib import Path
+
+from gwaspipe.gwaspipe import SumstatsManager
+from gwaspipe.projection import CORE_COLUMNS, load_formatbook, output_columns, required_columns
+from gwaspipe.streaming import read_chunks
+
+
+def _step_config(steps):
+    def step(step_name):
+        return {"run": step_name in steps}, steps.get(step_name, {})
+
+    return step
+
+
+class TestOutputColumns(unittest.TestCase):
+    """Tests for the output_columns function."""
+
+    def setUp(self):
+        self.formatbook = load_formatbook("src/gwaspipe/data/formatbook.json")
+
+    def test_format_col_order(self):
+        """Test the columns of a format with format_col_order."""
+        columns = output_columns("snp_mapping", self.formatbook)
+        self.assertEqual(columns, {"SNPID", "PREVIOUS_ID", "EQUALS", "FLIPPED"})
+
+    def test_gwaslab_writes_all_columns(self):
+        """Test gwaslab and unknown formats need every column."""
+        self.assertIsNone(output_columns("gwaslab", self.formatbook))
+        self.assertIsNone(output_columns("unknown", self.formatbook))
+        self.assertIsNone(output_columns(None, self.formatbook))
+
+
+class TestRequiredColumns(unittest.TestCase):
+    """Tests for the required_columns function."""
+
+    def setUp(self):
+        self.formatbook = load_formatbook("src/gwaspipe/data/formatbook.json")
+
+    def test_projection(self):
+        """Test the columns of the enabled steps and outputs are collected."""
+        steps = {"basic_check": {}, "report_inflation_factors": {}, "write_ldsc": {"fmt": "ldsc"}}
+        columns = required_columns(
+            ("basic_check", "report_inflation_factors", "write_ldsc"), _step_config(steps), self.formatbook
+        )
+        self.assertTrue(CORE_COLUMNS <= columns)
+        self.assertIn("Z", columns)
+        self.assertIn("EAF", columns)
+        self.assertNotIn("CHISQ", columns)
+
+    def test_disabled_steps_are_ignored(self):
+        """Test disabled steps do not disable the projection."""
+        columns = required_columns(("basic_check", "write_tsv"), _step_config({"basic_check": {}}), self.formatbook)
+        self.assertEqual(columns, CORE_COLUMNS | {"EAF"})
+
+    def test_steps_using_all_columns(self):
+        """Test steps that can use any column disable the projection."""
+        steps = {"write_tsv": {"fmt": "gwaslab"}}
+        self.assertIsNone(required_columns(("write_tsv",), _step_config(steps), self.formatbook))
+        steps = {"write_parquet": {"fmt": "ldsc"}}
+        self.assertIsNone(required_columns(("write_parquet",), _step_config(steps), self.formatbook))
+
+
+class TestProjectedLoad(unittest.TestCase):
+    """Tests for loading only the projected columns."""
+
+    def setUp(self):
+        self.test_data_path = "tests/data/test_sumstats.tsv"
+        self.columns = frozenset(CORE_COLUMNS | {"BETA"})
+
+    def test_sumstats_manager(self):
+        """Test SumstatsManager reads only the projected columns."""
+        sm = SumstatsManager(
+            input_path=self.test_data_path,
+            input_format="regenie",
+            input_separator=" ",
+            input_study=None,
+            formatbook_path=Path("data/formatbook.json"),
+            pid=False,
+            bcfliftover=False,
+            columns=self.columns,
+        )
+        self.assertIn("BETA", sm.mysumstats.data.columns)
+        self.assertNotIn("SE", sm.mysumstats.data.columns)
+
+    def test_read_chunks(self):
+        """Test chunks contain only the projected columns."""
+        chunk = next(read_chunks(self.test_data_path, "regenie", " ", 2, include=sorted(self.columns)))
+        self.assertIn("BETA", chunk.columns)
+        self.assertNotIn("SE", chunk.columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
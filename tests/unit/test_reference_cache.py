@@ -0,0 +1,87 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from gwaspipe.reference_cache import ReferenceCache, _codes, reference_key
+
+
+class TestReferenceCache(unittest.TestCase):
+    """Tests for the ReferenceCache class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name, "cache")
+        self.keys = ["1:100:A:T", "1:200:AT:A", "2:50:C:G", "1:100:A:T"]
+        self.values = np.array([0.1, np.nan, 0.3, 0.4], dtype="float32")
+        self.reads = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self):
+        self.reads += 1
+        time.sleep(0.05)
+        return _codes(self.keys), self.values
+
+    def test_lookup(self):
+        """Test the lookup matches the GWASLab dictionary, missing frequencies are None."""
+        lookup = ReferenceCache(self.path).open("a", self.read)
+        self.assertEqual(len(lookup), 3)
+        self.assertIn("1:100:A:T", lookup)
+        self.assertAlmostEqual(lookup["1:100:A:T"], 0.4, places=6)
+        self.assertIsNone(lookup["1:200:AT:A"])
+        self.assertNotIn("1:100:T:A", lookup)
+        self.assertIsNone(lookup.get("3:1:A:T"))
+        self.assertIs(lookup.get_cache(), lookup)
+
+    def test_lookup_buckets(self):
+        """Test every key is found among the codes sharing its leading bits."""
+        keys = [f"{chrom}:{pos}:A:T" for chrom in range(1, 23) for pos in range(0, 100000, 97)]
+        values = np.arange(len(keys), dtype="float32")
+        lookup = ReferenceCache(self.path).open("b", lambda: (_codes(keys), values))
+        self.assertEqual([lookup[key] for key in keys], values.tolist())
+        self.assertFalse(any(key.replace("A:T", "T:A") in lookup for key in keys[:1000]))
+
+    def test_built_once(self):
+        """Test concurrent opens of a missing entry build it once."""
+        cache = ReferenceCache(self.path)
+        lookups = []
+        threads = [threading.Thread(target=lambda: lookups.append(cache.open("a", self.read))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.reads, 1)
+        self.assertEqual([len(lookup) for lookup in lookups], [3] * 4)
+        self.assertIsNotNone(ReferenceCache(self.path).open("a", self.read))
+        self.assertEqual(self.reads, 1)
+
+    def test_evict(self):
+        """Test the least recently used entries are evicted above the size limit."""
+        cache = ReferenceCache(self.path)
+        cache.open("a", self.read)
+        entry_size = sum(f.stat().st_size for f in Path(self.path, "a").iterdir())
+        os.utime(Path(self.path, "a"), (0, 0))
+        cache.max_size = entry_size
+        cache.open("b", self.read)
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("b"))
+
+    def test_reference_key(self):
+        """Test the key changes with the reference file and ref_alt_freq."""
+        ref_infer = Path(self.tmp_dir.name, "ref.vcf.gz")
+        ref_infer.write_bytes(b"v1")
+        key = reference_key(ref_infer, "AF")
+        self.assertEqual(key, reference_key(ref_infer, "AF"))
+        self.assertNotEqual(key, reference_key(ref_infer, "AF_EUR"))
+        ref_infer.write_bytes(b"v2 changed")
+        self.assertNotEqual(key, reference_key(ref_infer, "AF"))
+
+
+if __name__ == "__main__":
+    unittest.main()
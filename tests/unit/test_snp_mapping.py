@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+
+from gwaspipe.order_alleles import build_snpids
+from gwaspipe.snp_mapping import flipped_alleles, previous_alleles, variant_codes, write_compact_mapping
+
+
+class TestSnpMapping(unittest.TestCase):
+    """Tests for the SNP mapping."""
+
+    def setUp(self):
+        self.data = pd.DataFrame(
+            {
+                "CHR": [1, 1, 2, 2, 3],
+                "POS": [10, 20, 30, 40, 50],
+                "EA": pd.Categorical(["A", "G", "AT", "C", None]),
+                "NEA": pd.Categorical(["G", "T", "A", "G", "T"]),
+            }
+        )
+        self.data["SNPID"] = build_snpids(self.data)
+        self.data["PREVIOUS_ID"] = self.data["SNPID"]
+        self.data["PREVIOUS_ID_GWASLAB"] = self.data["SNPID"]
+        for col, values in previous_alleles(self.data).items():
+            self.data[col] = values
+        # Swap the alleles of the first three variants, and change only EA of the fourth
+        self.data["EA"] = pd.Categorical(["G", "T", "A", "T", None])
+        self.data["NEA"] = pd.Categorical(["A", "G", "AT", "G", "T"])
+        self.data["SNPID"] = build_snpids(self.data)
+
+    def test_flipped_from_codes(self):
+        """Test the alleles compared by code match the alleles parsed from the IDs."""
+        expected = [True, True, True, False, False]
+        self.assertEqual(flipped_alleles(self.data).tolist(), expected)
+        self.assertEqual(flipped_alleles(self.data, alleles_in_snpid=False).tolist(), expected)
+
+    def test_flipped_without_previous_alleles(self):
+        """Test the alleles are parsed from the IDs when the input alleles were not kept."""
+        data = self.data.drop(columns=["PREVIOUS_EA", "PREVIOUS_NEA"])
+        self.assertEqual(flipped_alleles(data).tolist(), [True, True, True, False, False])
+
+    def test_variant_codes(self):
+        """Test the variant codes are stable and 0 for missing IDs."""
+        ids = pd.Series(["1:10:A:G", "1:10:G:A", None, "1:10:A:G"], dtype="string")
+        codes = variant_codes(ids)
+        self.assertEqual(codes[0], codes[3])
+        self.assertNotEqual(codes[0], codes[1])
+        self.assertEqual(codes[2], 0)
+
+    def test_compact_mapping(self):
+        """Test the parts of the compact mapping are read as one table."""
+        data = self.data.assign(
+            EQUALS=self.data["SNPID"] == self.data["PREVIOUS_ID"], FLIPPED=flipped_alleles(self.data)
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = str(Path(tmp_dir, "table"))
+            write_compact_mapping(data.iloc[:3], prefix)
+            path = write_compact_mapping(data.iloc[3:], prefix, part=1)
+            table = ds.dataset(Path(path).parent, format="feather").to_table().to_pandas()
+            self.assertEqual(table["FLIPPED"].tolist(), data["FLIPPED"].tolist())
+            self.assertEqual(table["VARIANT"].tolist(), variant_codes(data["SNPID"]).tolist())
+            write_compact_mapping(data, prefix)
+            self.assertEqual([p.name for p in Path(path).parent.iterdir()], ["part-0.feather"])
+
+    def test_compact_mapping_chr(self):
+        """Test CHR is stored as the GWASLab numbers, or as labels when a label has no number."""
+        data = self.data.assign(EQUALS=True, FLIPPED=False)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = str(Path(tmp_dir, "table"))
+            cases = [
+                (["1", "chr2", "X", "MT", None], pa.uint8(), [1, 2, 23, 25, 0]),
+                ([1, 2, 300, 4, 5], pa.dictionary(pa.int32(), pa.string()), ["1", "2", "300", "4", "5"]),
+                (["1", "2", "chrUn_gl000220", "X", None], pa.dictionary(pa.int32(), pa.string()), None),
+            ]
+            for chrom, dtype, expected in cases:
+                with self.subTest(chrom=chrom):
+                    path = write_compact_mapping(data.assign(CHR=pd.Series(chrom, dtype=object)), prefix)
+                    column = feather.read_table(path).column("CHR")
+                    self.assertEqual(column.type, dtype)
+                    self.assertEqual(column.to_pylist(), expected if expected is not None else chrom)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import gwaslab as gl
+import pandas as pd
+
+from gwaspipe.step_cache import StepCache, base_key, parse_size, step_keys
+
+
+class TestStepKeys(unittest.TestCase):
+    """Tests for the base_key and step_keys functions."""
+
+    def setUp(self):
+        self.input_path = "tests/data/test_sumstats.tsv"
+        self.steps = {
+            "basic_check": ({"run": True}, {"normalize": True}),
+            "harmonize": ({"run": True}, {"ref_seq": "ref.fa"}),
+            "write_tsv": ({"run": True}, {"fmt": "regenie"}),
+            "sort_alphabetically": ({"run": True}, {}),
+        }
+        self.run_sequence = tuple(self.steps)
+
+    def test_parse_size(self):
+        """Test sizes with and without units."""
+        self.assertEqual(parse_size(1024), 1024)
+        self.assertEqual(parse_size("512"), 512)
+        self.assertEqual(parse_size("2KB"), 2048)
+        self.assertEqual(parse_size("1.5 GB"), 3 * 2**29)
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+    def test_base_key_options(self):
+        """Test the base key changes with the load options."""
+        key = base_key(self.input_path, "data/formatbook.json", input_file_format="regenie")
+        self.assertEqual(key, base_key(self.input_path, "data/formatbook.json", input_file_format="regenie"))
+        self.assertNotEqual(key, base_key(self.input_path, "data/formatbook.json", input_file_format="gtex"))
+
+    def test_leading_transform_steps(self):
+        """Test only the steps before the first output step are keyed."""
+        keys = step_keys("base", self.run_sequence, self.steps.get)
+        self.assertEqual([step for step, _ in keys], ["basic_check", "harmonize"])
+
+    def test_chained_keys(self):
+        """Test a change in a step configuration changes its key and the keys of the following steps."""
+        keys = dict(step_keys("base", self.run_sequence, self.steps.get))
+        self.steps["harmonize"] = ({"run": True}, {"ref_seq": "other.fa"})
+        changed = dict(step_keys("base", self.run_sequence, self.steps.get))
+        self.assertEqual(keys["basic_check"], changed["basic_check"])
+        self.assertNotEqual(keys["harmonize"], changed["harmonize"])
+
+
+class TestStepCache(unittest.TestCase):
+    """Tests for the StepCache class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name, "cache")
+        self.sumstats = gl.Sumstats("tests/data/test_sumstats.tsv", fmt="regenie", sep=" ", verbose=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_and_restore(self):
+        """Test the restored Sumstats object has the same data and metadata."""
+        cache = StepCache(self.path)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", self.sumstats)
+        restored = cache.get("a").restore()
+        pd.testing.assert_frame_equal(restored.data, self.sumstats.data)
+        self.assertEqual(restored.meta, self.sumstats.meta)
+
+    def test_longest_prefix(self):
+        """Test the last cached step of the prefix is found."""
+        cache = StepCache(self.path)
+        keys = [("basic_check", "a"), ("harmonize", "b"), ("sort_alphabetically", "c")]
+        self.assertIsNone(cache.longest_prefix(keys))
+        cache.put("a", self.sumstats)
+        cache.put("b", self.sumstats)
+        self.assertEqual(cache.longest_prefix(keys), 1)
+
+    def test_restore_skips_removed_entries(self):
+        """Test an entry removed by another run is a cache miss, the shorter prefix is restored."""
+        cache = StepCache(self.path)
+        keys = [("basic_check", "a"), ("harmonize", "b")]
+        self.assertEqual(cache.restore(keys), (None, None))
+        cache.put("a", self.sumstats)
+        cache.put("b", self.sumstats)
+        entry = cache.get("b")
+        shutil.rmtree(Path(self.path, "b"))
+        self.assertFalse(entry.load())
+        Path(self.path, "b").mkdir()
+        Path(self.path, "b", ".complete").touch()
+        index, entry = cache.restore(keys)
+        self.assertEqual(index, 0)
+        pd.testing.assert_frame_equal(entry.restore().data, self.sumstats.data)
+
+    def test_concurrent_puts(self):
+        """Test concurrent runs storing the same entry, while another one restores it."""
+        cache = StepCache(self.path)
+        cache.put("a", self.sumstats)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            puts = [executor.submit(StepCache(self.path).put, "a", self.sumstats) for _ in range(4)]
+            restores = [executor.submit(lambda: StepCache(self.path).get("a").restore()) for _ in range(4)]
+            for future in puts:
+                future.result()
+            for future in restores:
+                self.assertEqual(len(future.result().data), len(self.sumstats.data))
+        self.assertEqual(sorted(p.name for p in self.path.iterdir() if p.is_dir()), ["a"])
+
+    def test_evict_least_recently_used(self):
+        """Test the least recently used entries are evicted above the size limit."""
+        cache = StepCache(self.path)
+        cache.put("a", self.sumstats)
+        entry_size = sum(f.stat().st_size for f in Path(self.path, "a").iterdir())
+        os.utime(Path(self.path, "a"), (0, 0))
+        cache.put("b", self.sumstats)
+        os.utime(Path(self.path, "b"), (1, 1))
+        cache.get("a").restore()
+
+        cache.max_size = 2 * entry_size
+        cache.put("c", self.sumstats)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from gwaspipe.gwaspipe import SumstatsManager
+from gwaspipe.streaming import (
+    FIRST_CHUNK,
+    MATERIALIZE,
+    concat_chunks,
+    read_chunks,
+    split_run_sequence,
+    step_fallback,
+)
+
+
+def _step_config(enabled):
+    def step(step_name):
+        return {"run": step_name in enabled}, {}
+
+    return step
+
+
+class TestStepFallback(unittest.TestCase):
+    """Tests for the step_fallback function."""
+
+    def test_row_local_step(self):
+        """Test row-local steps have no fallback."""
+        self.assertIsNone(step_fallback("basic_check"))
+        self.assertIsNone(step_fallback("write_tsv"))
+
+    def test_declared_fallbacks(self):
+        """Test whole-table steps return their declared fallback."""
+        self.assertEqual(step_fallback("infer_build"), FIRST_CHUNK)
+        self.assertEqual(step_fallback("check_ambiguous_snps"), MATERIALIZE)
+        self.assertEqual(step_fallback("report_inflation_factors"), MATERIALIZE)
+
+    def test_remove_dup_materializes(self):
+        """Test basic_check materializes when it removes duplicates, which may span chunks."""
+        self.assertEqual(step_fallback("basic_check", {"remove_dup": True}), MATERIALIZE)
+        self.assertIsNone(step_fallback("basic_check", {"remove_dup": False, "remove": True}))
+
+    def test_unknown_step_materializes(self):
+        """Test steps without a declared fallback materialize the table."""
+        self.assertEqual(step_fallback("harmonize"), MATERIALIZE)
+
+
+class TestSplitRunSequence(unittest.TestCase):
+    """Tests for the split_run_sequence function."""
+
+    def test_all_steps_streamed(self):
+        """Test a run sequence of row-local steps is fully streamed."""
+        run_sequence = ("basic_check", "infer_build", "sort_alphabetically", "write_tsv")
+        streamed, materialized = split_run_sequence(run_sequence, _step_config(run_sequence))
+        self.assertEqual(streamed, run_sequence)
+        self.assertEqual(materialized, ())
+
+    def test_split_at_first_whole_table_step(self):
+        """Test the run sequence is split at the first enabled whole-table step."""
+        run_sequence = ("basic_check", "harmonize", "write_tsv")
+        streamed, materialized = split_run_sequence(run_sequence, _step_config(run_sequence))
+        self.assertEqual(streamed, ("basic_check",))
+        self.assertEqual(materialized, ("harmonize", "write_tsv"))
+
+    def test_split_at_remove_dup(self):
+        """Test the run sequence is split at a basic_check removing duplicates."""
+        run_sequence = ("basic_check", "write_tsv")
+        streamed, materialized = split_run_sequence(
+            run_sequence, lambda step: ({"run": True}, {"remove_dup": step == "basic_check"})
+        )
+        self.assertEqual(streamed, ())
+        self.assertEqual(materialized, run_sequence)
+
+    def test_disabled_whole_table_step_is_ignored(self):
+        """Test disabled whole-table steps do not split the run sequence."""
+        run_sequence = ("basic_check", "harmonize", "write_tsv")
+        streamed, materialized = split_run_sequence(run_sequence, _step_config({"basic_check", "write_tsv"}))
+        self.assertEqual(streamed, run_sequence)
+        self.assertEqual(materialized, ())
+
+
+class TestReadChunks(unittest.TestCase):
+    """Tests for reading the input in chunks."""
+
+    def setUp(self):
+        self.test_data_path = "tests/data/test_sumstats.tsv"
+
+    def test_chunk_sizes(self):
+        """Test the input is split in chunks of the requested size."""
+        chunks = list(read_chunks(self.test_data_path, "regenie", " ", 2))
+        self.assertEqual([len(c) for c in chunks], [2, 1])
+
+    def test_only_format_columns_are_read(self):
+        """Test columns not in the formatbook are not read."""
+        chunk = next(read_chunks(self.test_data_path, "regenie", " ", 2))
+        self.assertIn("GENPOS", chunk.columns)
+        self.assertNotIn("EXTRA", chunk.columns)
+
+    def test_concat_chunks_restores_categories(self):
+        """Test concatenated chunks keep categorical columns."""
+        frames = [
+            pd.DataFrame({"EA": pd.Categorical(["A"]), "POS": [1]}),
+            pd.DataFrame({"EA": pd.Categorical(["T"]), "POS": [2]}),
+        ]
+        data = concat_chunks(frames)
+        self.assertIsInstance(data["EA"].dtype, pd.CategoricalDtype)
+        self.assertEqual(data["POS"].tolist(), [1, 2])
+
+
+class TestSumstatsManagerStreaming(unittest.TestCase):
+    """Tests for the streaming mode of SumstatsManager."""
+
+    def setUp(self):
+        self.test_data_path = Path("tests/data/test_sumstats.tsv")
+        self.formatbook_path = Path("data/formatbook.json")
+
+    def _manager(self, chunk_size):
+        return SumstatsManager(
+            input_path=str(self.test_data_path),
+            input_format="regenie",
+            input_separator=" ",
+            input_study=None,
+            formatbook_path=self.formatbook_path,
+            pid=False,
+            bcfliftover=False,
+            chunk_size=chunk_size,
+        )
+
+    def test_load_is_deferred(self):
+        """Test nothing is loaded before iterating the chunks."""
+        sm = self._manager(2)
+        self.assertTrue(sm.streaming)
+        self.assertIsNone(sm.mysumstats)
+
+    def test_iter_chunks_collect(self):
+        """Test collected chunks are the same as the whole input."""
+        sm = self._manager(2)
+        chunk_rows = [len(sm.mysumstats.data) for _ in sm.iter_chunks(collect=True)]
+        self.assertEqual(chunk_rows, [2, 1])
+        self.assertFalse(sm.streaming)
+
+        whole = self._manager(None)
+        pd.testing.assert_frame_equal(sm.mysumstats.data, whole.mysumstats.data, check_categorical=False)
+
+    def test_float_decimals_running_maximum(self):
+        """Test decimals never decrease across the streamed chunks."""
+        sm = self._manager(2)
+        decimals = []
+        for _ in sm.iter_chunks():
+            sm.mysumstats.data["BETA"] = 0.123456 if sm.chunk_index == 0 else 0.1
+            decimals.append(sm.float_dict_custom({})["BETA"])
+        self.assertEqual(decimals, ["{:.6f}", "{:.6f}"])
+
+    def test_unchunkable_format_loads_whole_input(self):
+        """Test streaming is disabled for formats that cannot be read in chunks."""
+        sm = SumstatsManager(
+            input_path="tests/data/test_with_beta.pkl",
+            input_format="pickle",
+            input_separator="\t",
+            input_study=None,
+            formatbook_path=self.formatbook_path,
+            pid=False,
+            bcfliftover=False,
+            chunk_size=2,
+        )
+        self.assertFalse(sm.streaming)
+        self.assertIsNotNone(sm.mysumstats)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import gzip
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from gwaspipe.bgzf import BgzfWriter
+from gwaspipe.tabix import TabixIndexer, reg2bin
+
+
+def read_index(path):
+    """Return the header fields, the sequence names and the meta pseudo-bin of each sequence of a .tbi index."""
+    data = gzip.decompress(Path(path).read_bytes())
+    fields = struct.unpack_from("<8i", data, 4)
+    n_ref, l_nm = fields[0], fields[7]
+    names = data[36 : 36 + l_nm].split(b"\0")[:-1]
+    offset = 36 + l_nm
+    meta = []
+    for _ in range(n_ref):
+        (n_bin,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        for _ in range(n_bin):
+            bin_id, n_chunk = struct.unpack_from("<Ii", data, offset)
+            offset += 8
+            chunks = struct.unpack_from(f"<{2 * n_chunk}Q", data, offset)
+            offset += 16 * n_chunk
+            if bin_id == 37450:
+                meta.append(chunks)
+        (n_intv,) = struct.unpack_from("<i", data, offset)
+        offset += 4 + 8 * n_intv
+    return data[:4], fields, [name.decode() for name in names], meta
+
+
+def read_at(path, voffset):
+    """Return the decompressed content of a BGZF file from a virtual offset."""
+    data = Path(path).read_bytes()
+    return gzip.decompress(data[voffset >> 16 :])[voffset & 0xFFFF :]
+
+
+class TestTabix(unittest.TestCase):
+    """Tests for the tabix index."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name, "test.tsv.gz")
+        rng = np.random.default_rng(0)
+        self.names = np.repeat(["1", "2", "X"], [20000, 10000, 10])
+        self.positions = np.concatenate([np.sort(rng.integers(1, 2 * 10**8, n)) for n in (20000, 10000, 10)])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, names, positions, batch=3000):
+        indexer = TabixIndexer(1, 2)
+        with BgzfWriter(self.path) as output:
+            text = b"CHR\tPOS\tID\n"
+            output.write(text)
+            text_offset = len(text)
+            for start in range(0, len(names), batch):
+                lines = zip(names[start : start + batch], positions[start : start + batch])
+                text = "".join(f"{name}\t{pos}\tv{pos}\n" for name, pos in lines).encode()
+                indexer.add(names[start : start + batch], positions[start : start + batch], text_offset, text)
+                output.write(text)
+                text_offset += len(text)
+        indexer.write(f"{self.path}.tbi", output.block_offsets)
+
+    def test_reg2bin(self):
+        """Test the bins of the SAM specification."""
+        np.testing.assert_array_equal(
+            reg2bin([0, 16384, 0, 0, 0], [1, 16385, 16385, 2**26, 2**29]), [4681, 4682, 585, 1, 0]
+        )
+
+    def test_index(self):
+        """Test the header, the sequence names and the offsets of the first and last records."""
+        self.write(self.names, self.positions)
+        magic, fields, names, meta = read_index(f"{self.path}.tbi")
+        self.assertEqual(magic, b"TBI\1")
+        self.assertEqual(fields[:7], (3, 0, 1, 2, 2, ord("#"), 1))
+        self.assertEqual(names, ["1", "2", "X"])
+        self.assertEqual([chunks[2] for chunks in meta], [20000, 10000, 10])
+        self.assertTrue(read_at(self.path, meta[1][0]).startswith(f"2\t{self.positions[20000]}\t".encode()))
+        self.assertTrue(read_at(self.path, meta[1][1]).startswith(b"X\t"))
+
+    def test_unsorted(self):
+        """Test unsorted lines are rejected."""
+        names = np.array(["1", "2", "1"])
+        with self.assertRaises(ValueError):
+            self.write(names, np.array([1, 2, 3]))
+        with self.assertRaises(ValueError):
+            self.write(np.array(["1", "1"]), np.array([5, 4]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import pandas as pd
+
+from gwaspipe.variant_ids import GTEX_ID_FIELDS, parse_variant_ids, replace_separator
+
+
+class TestParseVariantIds(unittest.TestCase):
+    """Tests for the parse_variant_ids function."""
+
+    def test_gwaslab_ids(self):
+        """Test parsing of CHR:POS:EA:NEA IDs into typed columns."""
+        ids = pd.Series(["1:1000:A:T", "X:2000:AT:A"], index=[5, 6])
+        parsed = parse_variant_ids(ids)
+        self.assertEqual(parsed.columns.tolist(), ["CHR", "POS", "EA", "NEA"])
+        self.assertEqual(parsed.index.tolist(), [5, 6])
+        self.assertEqual(parsed["POS"].dtype, pd.Int64Dtype())
+        self.assertEqual(parsed["POS"].tolist(), [1000, 2000])
+        self.assertEqual(parsed["EA"].tolist(), ["A", "AT"])
+        self.assertEqual(parsed["NEA"].tolist(), ["T", "A"])
+
+    def test_gtex_ids_with_build_suffix(self):
+        """Test GTEx IDs, ignoring the build suffix."""
+        ids = pd.Series(["chr16_29374973_G_A_b38"], dtype="category")
+        parsed = parse_variant_ids(ids, sep="_", fields=GTEX_ID_FIELDS)
+        self.assertEqual(parsed.iloc[0].tolist(), ["chr16", 29374973, "G", "A"])
+
+    def test_skipped_fields(self):
+        """Test only the named fields are returned."""
+        parsed = parse_variant_ids(pd.Series(["1:1000:A:T"]), fields=(None, None, "EA", "NEA"))
+        self.assertEqual(parsed.columns.tolist(), ["EA", "NEA"])
+
+    def test_incomplete_ids(self):
+        """Test IDs with fewer tokens and missing IDs give missing fields."""
+        parsed = parse_variant_ids(pd.Series(["rs123", None, "1:1000:A:T"]))
+        self.assertTrue(parsed.iloc[:2].isna().all().all())
+        self.assertEqual(parsed.iloc[2]["POS"], 1000)
+
+
+class TestReplaceSeparator(unittest.TestCase):
+    """Tests for the replace_separator function."""
+
+    def test_replace(self):
+        """Test rewriting bcftools liftover IDs."""
+        result = replace_separator(pd.Series(["1_900_A_T", None]), "_", ":")
+        self.assertEqual(result.iloc[0], "1:900:A:T")
+        self.assertTrue(pd.isna(result.iloc[1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+import gwaslab as gl
+import numpy as np
+import pandas as pd
+
+from gwaspipe.fanout import SharedEncoding
+from gwaspipe.writer import unsupported_reason, write_tabular
+
+
+class TestWriteTabular(unittest.TestCase):
+    """Tests for the native delimited-text writer."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        n = 500
+        data = pd.DataFrame(
+            {
+                "SNPID": [f"1:{pos}:A:G" for pos in range(n)],
+                "rsID": pd.array([f"rs{i}" if i % 7 else None for i in range(n)], dtype="string"),
+                "CHR": rng.integers(1, 26, n),
+                "POS": rng.integers(1, 10**8, n),
+                "EA": pd.Categorical(rng.choice(["A", "C", "G", "T"], n)),
+                "NEA": rng.choice(["A", "C", "G", "T"], n),
+                "EAF": rng.random(n),
+                "BETA": rng.normal(size=n),
+                "SE": rng.random(n),
+                "P": 10 ** -rng.uniform(0, 300, n),
+                "N": pd.array(rng.integers(100, 10**6, n), dtype="Int64"),
+                "STATUS": rng.integers(1000000, 9999999, n),
+            }
+        )
+        data.loc[::50, "BETA"] = np.nan
+        data.loc[::70, "N"] = pd.NA
+        self.sumstats = gl.Sumstats(data, fmt="gwaslab", verbose=False)
+        self.sumstats.data = data
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_same_output(self, **gl_params):
+        expected = Path(self.tmp_dir.name, "gwaslab")
+        encoding = gl_params.pop("encoding", None)
+        self.sumstats.to_format(str(expected), verbose=False, **gl_params)
+        path = write_tabular(
+            self.sumstats, str(Path(self.tmp_dir.name, "native")), encoding=encoding, verbose=False, **gl_params
+        )
+        expected = next(Path(self.tmp_dir.name).glob(f"gwaslab.{gl_params['fmt']}.tsv*"))
+        read = gzip.open if path.endswith(".gz") else open
+        with read(expected, "rb") as fp, read(path, "rb") as native:
+            self.assertEqual(native.read(), fp.read())
+
+    def test_gwaslab_format(self):
+        """Test the gwaslab format with chromosome numbers."""
+        self.assert_same_output(fmt="gwaslab", xymt_number=True)
+
+    def test_chromosome_labels_and_float_formats(self):
+        """Test the chromosome labels and custom float formats."""
+        self.assert_same_output(fmt="gwaslab", float_formats={"BETA": "{:.6f}", "P": "{:.2e}", "EAF": "{:.1%}"})
+
+    def test_output_formats(self):
+        """Test output formats with their own columns, order and missing value."""
+        for fmt in ("regenie", "ldsc", "metal", "fastgwa"):
+            with self.subTest(fmt=fmt):
+                self.assert_same_output(fmt=fmt)
+
+    def test_uncompressed(self):
+        """Test an uncompressed output."""
+        self.assert_same_output(fmt="gwaslab", gzip=False)
+
+    def test_shared_encoding(self):
+        """Test outputs sharing their column encodings."""
+        encoding = SharedEncoding()
+        for fmt in ("gwaslab", "regenie", "gwaslab"):
+            with self.subTest(fmt=fmt):
+                self.assert_same_output(fmt=fmt, encoding=encoding)
+
+    def test_tabix(self):
+        """Test the rows are sorted by position and indexed."""
+        path = write_tabular(self.sumstats, str(Path(self.tmp_dir.name, "native")), tabix=True, verbose=False)
+        output = pd.read_csv(path, sep="\t")
+        expected = self.sumstats.data.sort_values(["CHR", "POS"], kind="stable")
+        np.testing.assert_array_equal(output["POS"], expected["POS"])
+        self.assertEqual(gzip.decompress(Path(f"{path}.tbi").read_bytes())[:4], b"TBI\1")
+
+    def test_tabix_uncompressed(self):
+        """Test an uncompressed output is written without index."""
+        path = write_tabular(
+            self.sumstats, str(Path(self.tmp_dir.name, "native")), gzip=False, tabix=True, verbose=False
+        )
+        self.assertFalse(Path(f"{path}.tbi").exists())
+
+    def test_unsupported(self):
+        """Test the outputs falling back to the GWASLab writer."""
+        data = self.sumstats.data
+        self.assertIsNone(unsupported_reason(data, "out", {"fmt": "gwaslab", "to_csvargs": {"compression": "gzip"}}))
+        self.assertIsNotNone(unsupported_reason(data, "out", {"fmt": "vcf"}))
+        self.assertIsNotNone(unsupported_reason(data, "out", {"fmt": "gwaslab", "tab_fmt": "parquet"}))
+        self.assertIsNotNone(unsupported_reason(data, "out", {"fmt": "gwaslab", "hapmap3": True}))
+        self.assertIsNotNone(unsupported_reason(data, "out_@", {"fmt": "gwaslab"}))
+        data.loc[0, "SNPID"] = "1:1:A,T:G\t"
+        self.assertIsNotNone(unsupported_reason(data, "out", {"fmt": "gwaslab"}))
+
+
+if __name__ == "__main__":
+    unittest.main()